@@ -1,17 +1,128 @@
-import matplotlib
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS
+import atexit
 import os
-from utils.python_parser import PythonCodeParser
-from utils.java_parser import JavaCodeParser
-from utils.cpp_parser import CppCodeParser
-from utils.visualizer import CodeVisualizer
+import tempfile
+import threading
+import time
+from utils.visualizer import CodeVisualizer, VIEWS
+from utils.cache import AnalysisCache
+from utils.store import AnalysisStore, FUNCTION_ORDERS
+from utils.executor import (AnalysisExecutor, InlineExecutor, AnalysisTimeout,
+                            AnalysisMemoryError)
+from utils.jobs import JobManager, encode_event
+from utils.incremental import AnalysisSession, SessionStore
+from utils.tracer import TraceError, TraceTimeout, SandboxUnavailable, iter_trace, sandbox_command
+from utils import metrics, pipeline, project, serialization, store
 
-matplotlib.use('Agg')
+class AnalysisJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        try:
+            return serialization.json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
 
 app = Flask(__name__, static_folder='frontend/dist', static_url_path='/')
+app.json = AnalysisJSONProvider(app)
 CORS(app)
 
+app.config.update(
+    ANALYSIS_CACHE_BYTES=int(os.environ.get('ANALYSIS_CACHE_BYTES', 64 * 1024 * 1024)),
+    ANALYSIS_CACHE_DIR=os.environ.get('ANALYSIS_CACHE_DIR'),
+    ANALYSIS_CACHE_DISK_BYTES=int(os.environ.get('ANALYSIS_CACHE_DISK_BYTES', 1024 * 1024 * 1024)),
+    # SQLite file recording every analyzed submission; unset disables the store
+    ANALYSIS_STORE=os.environ.get('ANALYSIS_STORE'),
+    ANALYSIS_STORE_BATCH=int(os.environ.get('ANALYSIS_STORE_BATCH', 256)),
+    ANALYSIS_STORE_FLUSH=float(os.environ.get('ANALYSIS_STORE_FLUSH', 1.0)),
+    ANALYSIS_STORE_QUEUE=int(os.environ.get('ANALYSIS_STORE_QUEUE', 10000)),
+    # 0 runs analysis inline in the request thread, without limits
+    ANALYSIS_WORKERS=int(os.environ.get('ANALYSIS_WORKERS', os.cpu_count() or 1)),
+    ANALYSIS_TIMEOUT=float(os.environ.get('ANALYSIS_TIMEOUT', 30)),
+    ANALYSIS_MEMORY_LIMIT=int(os.environ.get('ANALYSIS_MEMORY_LIMIT', 512 * 1024 * 1024)),
+    # Larger request bodies are refused while they are read, before any JSON parsing
+    ANALYSIS_MAX_BODY_BYTES=int(os.environ.get('ANALYSIS_MAX_BODY_BYTES', 8 * 1024 * 1024)),
+    ANALYSIS_MAX_LINES=int(os.environ.get('ANALYSIS_MAX_LINES', 100000)),
+    JOB_THREADS=int(os.environ.get('JOB_THREADS', max(2, os.cpu_count() or 1))),
+    JOB_TTL=float(os.environ.get('JOB_TTL', 300)),
+    JOB_HEARTBEAT=float(os.environ.get('JOB_HEARTBEAT', 15)),
+    SESSION_LIMIT=int(os.environ.get('SESSION_LIMIT', 256)),
+    SESSION_TTL=float(os.environ.get('SESSION_TTL', 900)),
+    # Archive uploads and JSON file lists larger than this get a 413 while being read
+    PROJECT_MAX_BODY_BYTES=int(os.environ.get('PROJECT_MAX_BODY_BYTES', 256 * 1024 * 1024)),
+    PROJECT_MAX_FILES=int(os.environ.get('PROJECT_MAX_FILES', 10000)),
+    PROJECT_MAX_FILE_BYTES=int(os.environ.get('PROJECT_MAX_FILE_BYTES', 1024 * 1024)),
+    # /traces runs submitted code, so it is off unless enabled, and then only
+    # runs it inside bubblewrap (the TRACE_SANDBOX executable)
+    TRACE_ENABLED=os.environ.get('TRACE_ENABLED', '').lower() in ('1', 'true', 'yes'),
+    TRACE_SANDBOX=os.environ.get('TRACE_SANDBOX', 'bwrap'),
+    TRACE_MAX_BYTES=int(os.environ.get('TRACE_MAX_BYTES', 16 * 1024 * 1024)),
+    TRACE_MAX_STEPS=int(os.environ.get('TRACE_MAX_STEPS', 1000)),
+    TRACE_TIMEOUT=float(os.environ.get('TRACE_TIMEOUT', 10)),
+    TRACE_CPU_SECONDS=int(os.environ.get('TRACE_CPU_SECONDS', 5)),
+    TRACE_MEMORY_LIMIT=int(os.environ.get('TRACE_MEMORY_LIMIT', 256 * 1024 * 1024)),
+    # cProfile dumps of /analyze runs slower than this; 0 disables profiling
+    PROFILE_SLOW_MS=float(os.environ.get('PROFILE_SLOW_MS', 0)),
+    PROFILE_DIR=os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'code-visualizer-profiles'))
+)
+
+if app.config['PROFILE_SLOW_MS']:
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+
+analysis_cache = AnalysisCache(
+    max_bytes=app.config['ANALYSIS_CACHE_BYTES'],
+    directory=app.config['ANALYSIS_CACHE_DIR'],
+    version=CodeVisualizer.VERSION,
+    max_disk_bytes=app.config['ANALYSIS_CACHE_DISK_BYTES']
+)
+
+analysis_store = None
+if app.config['ANALYSIS_STORE']:
+    analysis_store = AnalysisStore(
+        app.config['ANALYSIS_STORE'],
+        version=CodeVisualizer.VERSION,
+        batch_size=app.config['ANALYSIS_STORE_BATCH'],
+        flush_interval=app.config['ANALYSIS_STORE_FLUSH'],
+        max_pending=app.config['ANALYSIS_STORE_QUEUE']
+    )
+    atexit.register(analysis_store.close)
+
+jobs = JobManager(max_workers=app.config['JOB_THREADS'], ttl=app.config['JOB_TTL'])
+
+sessions = SessionStore(max_sessions=app.config['SESSION_LIMIT'], ttl=app.config['SESSION_TTL'])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    # Workers are started on first use so importing the app stays cheap
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if app.config['ANALYSIS_WORKERS'] > 0:
+                _executor = AnalysisExecutor(
+                    workers=app.config['ANALYSIS_WORKERS'],
+                    timeout=app.config['ANALYSIS_TIMEOUT'],
+                    memory_limit=app.config['ANALYSIS_MEMORY_LIMIT'] or None
+                )
+                atexit.register(_executor.shutdown)
+            else:
+                _executor = InlineExecutor()
+        return _executor
+
+def _analysis_response(body: bytes, cache_status: str, encoding: str = 'json', profile=None):
+    if profile is not None:
+        # The stage breakdown is added to JSON bodies and sent as Server-Timing for all
+        if encoding != 'msgpack':
+            body = b'{"profile":' + serialization.dumps(profile.breakdown()) + b',' + body[1:]
+    response = app.response_class(body, mimetype=serialization.MEDIA_TYPES[encoding])
+    response.headers['X-Cache'] = cache_status
+    if profile is not None:
+        response.headers['Server-Timing'] = profile.server_timing()
+    return response
+
 @app.route('/')
 def index():
     return send_from_directory(app.static_folder, 'index.html')
@@ -21,42 +132,539 @@ def serve_static(path):
     return send_from_directory(app.static_folder, path)
 
 
+def _read_json_body():
+    # Returns (dict, None) or (None, error response). Reading stops with a 413
+    # once the body passes ANALYSIS_MAX_BODY_BYTES, whatever its Content-Length says.
+    limit = app.config['ANALYSIS_MAX_BODY_BYTES']
+    request.max_content_length = limit or None
+    try:
+        data = request.get_json(silent=True)
+    except RequestEntityTooLarge:
+        return None, (jsonify({'error': f'Request body exceeds {limit} bytes'}), 413)
+    if not isinstance(data, dict):
+        return None, (jsonify({'error': 'Request body must be a JSON object'}), 400)
+    return data, None
+
+def _too_many_lines(code: str):
+    limit = app.config['ANALYSIS_MAX_LINES']
+    if limit and code.count('\n') >= limit:
+        return jsonify({'error': f'Code exceeds {limit} lines'}), 413
+    return None
+
+def _read_names(data, key):
+    # Returns (sorted unique names or None, None), or (None, error response)
+    # when the value is not a list of strings
+    names = data.get(key)
+    if names is None:
+        return None, None
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return None, (jsonify({'error': f'{key} must be a list of strings'}), 400)
+    return sorted(set(names)), None
+
+def _read_analysis_request():
+    # Returns (options, None) for a valid body, or (None, error response)
+    data, error = _read_json_body()
+    if error:
+        return None, error
+    views, error = _read_names(data, 'views')
+    if error:
+        return None, error
+    fields, error = _read_names(data, 'fields')
+    if error:
+        return None, error
+    options = {
+        'code': data.get('code', ''),
+        'language': data.get('language', 'python'),
+        'output_format': data.get('format', 'png'),
+        # None selects every view / every analysis field
+        'views': views,
+        'fields': fields,
+        'bodies': bool(data.get('bodies', True)),
+        # Row dicts by default; 'columns' and 'msgpack' send each category as arrays
+        'encoding': data.get('encoding', 'json')
+    }
+    
+    if not isinstance(options['code'], str) or not options['code']:
+        return None, (jsonify({'error': 'No code provided'}), 400)
+    
+    error = _too_many_lines(options['code'])
+    if error:
+        return None, error
+    
+    if options['language'] not in pipeline.PARSERS:
+        return None, (jsonify({'error': 'Unsupported language'}), 400)
+    
+    if options['output_format'] not in CodeVisualizer.FORMATS:
+        return None, (jsonify({'error': 'Unsupported format'}), 400)
+    
+    unknown = [name for name in options['views'] or [] if name not in VIEWS]
+    if unknown:
+        return None, (jsonify({'error': f"Unknown view: {', '.join(unknown)}"}), 400)
+    
+    if options['encoding'] not in serialization.ENCODINGS:
+        return None, (jsonify({'error': 'Unsupported encoding'}), 400)
+    
+    if options['encoding'] == 'msgpack' and serialization.msgpack is None:
+        return None, (jsonify({'error': 'MessagePack encoding is not available'}), 400)
+    
+    return options, None
+
+def _cache_key(options):
+    return analysis_cache.key(options['language'], options['code'], format=options['output_format'],
+                              views=options['views'], fields=options['fields'],
+                              bodies=options['bodies'], encoding=options['encoding'])
+
+def _store_digest(options):
+    # Submissions are recorded by content hash. Workers only build a summary
+    # for code the store has not seen from this version; (None, False) when
+    # the store is disabled.
+    if analysis_store is None:
+        return None, False
+    digest = store.digest(options['language'], options['code'])
+    return digest, not analysis_store.contains(digest)
+
 @app.route('/analyze', methods=['POST'])
 def analyze_code():
     try:
-        data = request.get_json()
-        code = data.get('code', '')
-        language = data.get('language', 'python')
+        started = time.perf_counter()
+        options, error = _read_analysis_request()
+        if error:
+            return error
         
-        if not code:
-            return jsonify({'error': 'No code provided'}), 400
+        with metrics.collect(language=options['language']) as profile:
+            profile.add('decode', time.perf_counter() - started)
+            metrics.INPUT_BYTES.observe(len(options['code'].encode('utf-8', 'surrogatepass')),
+                                        language=options['language'])
+            
+            # Serve repeated submissions straight from the cache
+            with metrics.span('cache'):
+                cache_key = _cache_key(options)
+                body = analysis_cache.get(cache_key)
+            cache_status = 'HIT' if body is not None else 'MISS'
+            
+            summary = None
+            if body is None:
+                with metrics.span('store'):
+                    digest, record = _store_digest(options)
+                # Parse and visualize in a worker process
+                try:
+                    with metrics.span('execute'):
+                        body, worker_profile, summary = get_executor().run(
+                            pipeline.analyze_profiled, **options, record=record,
+                            slow_ms=app.config['PROFILE_SLOW_MS'], profile_dir=app.config['PROFILE_DIR'])
+                except AnalysisTimeout as e:
+                    return jsonify({'error': str(e)}), 504
+                except AnalysisMemoryError as e:
+                    return jsonify({'error': str(e)}), 413
+                profile.merge(worker_profile)
+                analysis_cache.put(cache_key, body)
+            else:
+                digest = None if analysis_store is None else store.digest(options['language'], options['code'])
+            if analysis_store is not None:
+                analysis_store.record(digest, options['language'], summary)
+            
+            with metrics.span('respond'):
+                response = _analysis_response(body, cache_status, options['encoding'],
+                                              profile if request.args.get('profile') == '1' else None)
+        
+        profile.record()
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, language=options['language'],
+                                        cache=cache_status)
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _run_analysis_job(job, options):
+    cache_key = _cache_key(options)
+    cached = analysis_cache.get(cache_key)
+    digest, record = _store_digest(options)
+    if cached is not None:
+        parts = pipeline.split_json(cached)
+    else:
+        parts = get_executor().stream(pipeline.iter_analyze_json, **options, record=record)
+    
+    collected = {}
+    summary = None
+    try:
+        for name, body in parts:
+            if name == 'summary':
+                summary = body
+                continue
+            collected[name] = body
+            if name == 'analysis':
+                job.publish(encode_event('analysis', body))
+            elif name == 'truncated':
+                job.publish(encode_event('truncated', body))
+            else:
+                job.publish(encode_event('view', body, name=name))
+    except AnalysisTimeout as e:
+        job.publish(encode_event('error', error=str(e), status=504), final=True)
+        return
+    except AnalysisMemoryError as e:
+        job.publish(encode_event('error', error=str(e), status=413), final=True)
+        return
+    
+    if cached is None:
+        analysis_cache.put(cache_key, pipeline.assemble_json(collected))
+    if analysis_store is not None:
+        analysis_store.record(digest, options['language'], summary)
+    job.publish(encode_event('done'), final=True)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        options, error = _read_analysis_request()
+        if error:
+            return error
+        
+        # Events are JSON lines, so MessagePack bodies cannot be streamed
+        if options['encoding'] == 'msgpack':
+            return jsonify({'error': 'Jobs do not support MessagePack encoding'}), 400
+        
+        job = jobs.submit(lambda job: _run_analysis_job(job, options))
+        return jsonify({'job_id': job.id, 'events': f'/jobs/{job.id}/events'}), 202
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.status())
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    # Server-Sent Events for EventSource clients, NDJSON otherwise
+    sse = 'text/event-stream' in request.headers.get('Accept', '')
+    
+    def generate():
+        for event in job.iter_events(heartbeat=app.config['JOB_HEARTBEAT']):
+            if event is None:
+                yield b': keep-alive\n\n' if sse else b'\n'
+            elif sse:
+                yield b'data: ' + event + b'\n\n'
+            else:
+                yield event + b'\n'
+    
+    return Response(generate(), mimetype='text/event-stream' if sse else 'application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/sessions', methods=['POST'])
+def create_session():
+    try:
+        options, error = _read_analysis_request()
+        if error:
+            return error
+        
+        # Sessions keep their parse in this process, so edits only re-parse
+        # the top-level definitions they touch
+        if options['encoding'] == 'msgpack':
+            return jsonify({'error': 'Sessions do not support MessagePack encoding'}), 400
+        
+        # Segments are parsed and views rendered in the analysis workers
+        session = AnalysisSession(**options, max_lines=app.config['ANALYSIS_MAX_LINES'],
+                                  run=get_executor().run)
+        sessions.add(session)
+        return jsonify({'session_id': session.id, **session.initial_delta}), 201
+        
+    except AnalysisTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    except AnalysisMemoryError as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sessions/<session_id>/edits', methods=['POST'])
+def edit_session(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown session'}), 404
+    
+    data, error = _read_json_body()
+    if error:
+        return error
+    edits = data.get('edits')
+    if not isinstance(edits, list):
+        return jsonify({'error': 'No edits provided'}), 400
+    
+    try:
+        with session.lock:
+            # Edits are line ranges against a known version of the buffer
+            expected = data.get('version')
+            if expected is not None and expected != session.version:
+                return jsonify({'error': 'Session version mismatch',
+                                'version': session.version}), 409
+            delta = session.apply_edits(edits)
+        return jsonify({'session_id': session.id, **delta})
         
-        # Parse code based on language
-        if language == 'python':
-            parser = PythonCodeParser()
-        elif language == 'java':
-            parser = JavaCodeParser()
-        elif language == 'cpp':
-            parser = CppCodeParser()
+    except AnalysisTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    except AnalysisMemoryError as e:
+        return jsonify({'error': str(e)}), 413
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid edit: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    sessions.remove(session_id)
+    return '', 204
+
+def _project_fields():
+    # Every analysis category some parser collects
+    return {field for language in pipeline.PARSERS for field in pipeline.PARSERS[language].FIELDS}
+
+def _read_project_request():
+    # Returns (options, None) or (None, error response). Archives come as a
+    # multipart 'archive' upload with form options, file lists as JSON. Both
+    # stop with a 413 once the body passes PROJECT_MAX_BODY_BYTES.
+    limit = app.config['PROJECT_MAX_BODY_BYTES']
+    request.max_content_length = limit or None
+    try:
+        upload = request.files.get('archive')
+        if upload is not None:
+            data = request.form
+            fields = data.get('fields')
+            if fields is not None:
+                fields = sorted({name for name in fields.split(',') if name})
+            bodies = data.get('bodies', 'true').lower() not in ('false', '0', 'no')
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return None, (jsonify({'error': 'No archive or files provided'}), 400)
+            fields, error = _read_names(data, 'fields')
+            if error:
+                return None, error
+            bodies = bool(data.get('bodies', True))
+            if not isinstance(data.get('files'), list) or not data['files']:
+                return None, (jsonify({'error': 'No archive or files provided'}), 400)
+    except RequestEntityTooLarge:
+        return None, (jsonify({'error': f'Request body exceeds {limit} bytes'}), 413)
+    
+    unknown = [name for name in fields or [] if name not in _project_fields()]
+    if unknown:
+        return None, (jsonify({'error': f"Unknown field: {', '.join(unknown)}"}), 400)
+    
+    options = {
+        'upload': upload,
+        'files': data.get('files') if upload is None else None,
+        # Project graphs can be large, so they default to client-side rendering
+        'output_format': data.get('format', 'json'),
+        'fields': fields,
+        'bodies': bodies
+    }
+    if options['output_format'] not in CodeVisualizer.FORMATS:
+        return None, (jsonify({'error': 'Unsupported format'}), 400)
+    return options, None
+
+def _limit_files(files, job):
+    # Stops reading the project once PROJECT_MAX_FILES source files were seen
+    limit = app.config['PROJECT_MAX_FILES']
+    for count, item in enumerate(files):
+        if count >= limit:
+            job.publish(encode_event('warning', error=f'Only the first {limit} files were analyzed'))
+            return
+        yield item
+
+def _run_project_job(job, options, archive_path=None):
+    max_file_bytes = app.config['PROJECT_MAX_FILE_BYTES']
+    summaries = {}
+    archive = open(archive_path, 'rb') if archive_path else None
+    try:
+        if archive is not None:
+            files = project.iter_archive(archive, max_file_bytes)
         else:
-            return jsonify({'error': 'Unsupported language'}), 400
+            files = project.iter_file_list(options['files'], max_file_bytes)
         
-        # Parse the code
-        analysis_result = parser.parse_code(code)
+        results = project.iter_project(_limit_files(files, job), get_executor().run,
+                                       workers=max(1, app.config['ANALYSIS_WORKERS']),
+                                       fields=options['fields'], bodies=options['bodies'])
+        for kind, value in results:
+            if kind == 'file':
+                path, language, body, summary = value
+                if body is None:
+                    job.publish(encode_event('file', path=path, language=language,
+                                             error=summary['error'], status=422))
+                else:
+                    summaries[path] = summary
+                    extra = {'truncated': summary['truncated']} if summary.get('truncated') else {}
+                    job.publish(encode_event('file', body, path=path, language=language, **extra))
+            elif kind == 'skipped':
+                job.publish(encode_event('file', path=value, status=413,
+                                         error=f'File exceeds {max_file_bytes} bytes'))
+            else:
+                paths, error = value
+                status = (504 if isinstance(error, AnalysisTimeout) else
+                          413 if isinstance(error, AnalysisMemoryError) else 500)
+                for path in paths:
+                    job.publish(encode_event('file', path=path, error=str(error), status=status))
+    finally:
+        if archive is not None:
+            archive.close()
+            os.unlink(archive_path)
+    
+    body = get_executor().run(project.render_project, summaries, options['output_format'])
+    job.publish(encode_event('project', body))
+    job.publish(encode_event('done'), final=True)
+
+@app.route('/projects', methods=['POST'])
+def create_project():
+    archive_path = None
+    try:
+        options, error = _read_project_request()
+        if error:
+            return error
+        
+        # Uploads are spooled to disk so the job can stream members after the
+        # request has ended
+        upload = options.pop('upload')
+        if upload is not None:
+            with tempfile.NamedTemporaryFile(prefix='project-', delete=False) as f:
+                archive_path = f.name
+                upload.save(f)
+            if not project.is_archive(archive_path):
+                os.unlink(archive_path)
+                return jsonify({'error': 'Unsupported archive'}), 400
+        
+        job = jobs.submit(lambda job: _run_project_job(job, options, archive_path))
+        return jsonify({'job_id': job.id, 'events': f'/jobs/{job.id}/events'}), 202
+        
+    except Exception as e:
+        if archive_path and os.path.exists(archive_path):
+            os.unlink(archive_path)
+        return jsonify({'error': str(e)}), 500
+
+def _run_trace_job(job, code, max_steps, sandbox):
+    try:
+        # The tracer yields checked, re-encoded JSON events, one per line
+        for event in iter_trace(code, max_steps=max_steps, timeout=app.config['TRACE_TIMEOUT'],
+                                cpu_seconds=app.config['TRACE_CPU_SECONDS'],
+                                memory_bytes=app.config['TRACE_MEMORY_LIMIT'], sandbox=sandbox,
+                                max_bytes=app.config['TRACE_MAX_BYTES']):
+            job.publish(event)
+    except TraceTimeout as e:
+        job.publish(encode_event('error', error=str(e), status=504), final=True)
+        return
+    except TraceError as e:
+        job.publish(encode_event('error', error=str(e), status=500), final=True)
+        return
+    job.publish(encode_event('done'), final=True)
+
+@app.route('/traces', methods=['POST'])
+def create_trace():
+    if not app.config['TRACE_ENABLED']:
+        return jsonify({'error': 'Tracing is disabled'}), 404
+    try:
+        sandbox = sandbox_command(app.config['TRACE_SANDBOX'])
+    except SandboxUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    try:
+        data, error = _read_json_body()
+        if error:
+            return error
+        code = data.get('code', '')
+        if not isinstance(code, str) or not code:
+            return jsonify({'error': 'No code provided'}), 400
+        error = _too_many_lines(code)
+        if error:
+            return error
         
-        # Generate visualization data
-        visualizer = CodeVisualizer()
-        visualization_data = visualizer.generate_visualization(analysis_result, language)
+        # Only Python snippets can be executed
+        if data.get('language', 'python') != 'python':
+            return jsonify({'error': 'Tracing is only supported for Python'}), 400
         
-        return jsonify({
-            'success': True,
-            'analysis': analysis_result,
-            'visualization': visualization_data
-        })
+        limit = app.config['TRACE_MAX_STEPS']
+        try:
+            max_steps = max(1, min(int(data.get('max_steps', limit)), limit))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid max_steps'}), 400
+        
+        job = jobs.submit(lambda job: _run_trace_job(job, code, max_steps, sandbox))
+        return jsonify({'job_id': job.id, 'events': f'/jobs/{job.id}/events'}), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus text format: stage histograms plus the cache counters
+    stats = analysis_cache.stats()
+    memory = stats['memory']
+    cache_lines = []
+    for name, kind, value, documentation in (
+            ('analysis_cache_hits_total', 'counter', stats['hits'], 'Cache lookups that found a result.'),
+            ('analysis_cache_misses_total', 'counter', stats['misses'], 'Cache lookups that missed.'),
+            ('analysis_cache_disk_hits_total', 'counter', stats['disk_hits'], 'Hits served from the disk tier.'),
+            ('analysis_cache_evictions_total', 'counter', memory['evictions'], 'Entries evicted from memory.'),
+            ('analysis_cache_hit_ratio', 'gauge', stats['hit_rate'], 'Share of cache lookups that hit.'),
+            ('analysis_cache_bytes', 'gauge', memory['bytes'], 'Bytes held in the memory tier.'),
+            ('analysis_cache_disk_evictions_total', 'counter', stats['disk']['evictions'],
+             'Entries evicted from the disk tier.'),
+            ('analysis_cache_disk_bytes', 'gauge', stats['disk']['bytes'], 'Bytes held in the disk tier.')):
+        cache_lines += [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}', f'{name} {value}']
+    return Response(metrics.render(cache_lines), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(analysis_cache.stats())
+
+def _store_query_args():
+    # Returns (limit, None) or (None, error response)
+    if analysis_store is None:
+        return None, (jsonify({'error': 'The analysis store is not enabled'}), 404)
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return None, (jsonify({'error': 'Invalid limit'}), 400)
+    return max(1, min(limit, 1000)), None
+
+@app.route('/store/snippets', methods=['GET'])
+def store_snippets():
+    # Past submissions matching every given filter, most recent first
+    limit, error = _store_query_args()
+    if error:
+        return error
+    args = request.args
+    return jsonify({'snippets': analysis_store.snippets(
+        language=args.get('language'), calls=args.get('calls'), function=args.get('function'),
+        class_name=args.get('class'), limit=limit)})
+
+@app.route('/store/snippets/<digest>', methods=['GET'])
+def store_snippet(digest):
+    _, error = _store_query_args()
+    if error:
+        return error
+    snippet = analysis_store.snippet(digest)
+    if snippet is None:
+        return jsonify({'error': 'Unknown snippet'}), 404
+    return jsonify(snippet)
+
+@app.route('/store/functions', methods=['GET'])
+def store_functions():
+    limit, error = _store_query_args()
+    if error:
+        return error
+    order = request.args.get('order', 'length')
+    if order not in FUNCTION_ORDERS:
+        return jsonify({'error': f'Unknown order: {order}'}), 400
+    return jsonify({'functions': analysis_store.functions(
+        name=request.args.get('name'), language=request.args.get('language'), order=order, limit=limit)})
+
+@app.route('/store/stats', methods=['GET'])
+def store_stats():
+    _, error = _store_query_args()
+    if error:
+        return error
+    return jsonify(analysis_store.stats())
+
 @app.route('/examples/<language>', methods=['GET'])
 def get_examples(language):
     examples = {
@@ -0,0 +1,71 @@
+# Caller resolution for the call graph: the old first-match heuristic, a
+# correct linear scan over function spans, and the interval index.
+#
+#   python -m benchmarks.bench_call_graph
+
+import time
+
+from benchmarks.corpus import python_source
+from utils import records
+from utils.intervals import IntervalIndex
+from utils.python_parser import PythonCodeParser
+
+SIZES = [1000, 10000, 50000]
+
+
+def legacy_caller(line, functions):
+    # Copy of the removed CodeVisualizer._find_caller
+    for func in functions:
+        if func['line'] <= line:
+            return func['name']
+    return 'main'
+
+
+def linear_caller(line, functions):
+    # Innermost enclosing span, found by scanning every function
+    best = None
+    for func in functions:
+        if func['line'] <= line <= func['end_line'] and (best is None or func['line'] >= best['line']):
+            best = func
+    return best['name'] if best else 'main'
+
+
+def timed(resolve, calls):
+    start = time.perf_counter()
+    callers = [resolve(line) for line in calls]
+    return callers, time.perf_counter() - start
+
+
+def run(lines: int):
+    analysis = PythonCodeParser().parse_code(python_source(lines), ['functions', 'calls'])
+    functions = list(analysis['functions'])
+    calls = list(records.column(analysis['calls'], 'line'))
+
+    _, legacy = timed(lambda line: legacy_caller(line, functions), calls)
+    # The quadratic scan is only timed on a sample of calls and extrapolated
+    sample = calls[::max(1, len(calls) // 200)]
+    expected, linear = timed(lambda line: linear_caller(line, functions), sample)
+    linear *= len(calls) / len(sample)
+
+    # Includes building the index
+    start = time.perf_counter()
+    index = IntervalIndex(zip(records.column(analysis['functions'], 'line'),
+                              records.column(analysis['functions'], 'end_line'),
+                              records.column(analysis['functions'], 'name')))
+    for line in calls:
+        index.find(line, 'main')
+    indexed = time.perf_counter() - start
+    assert [index.find(line, 'main') for line in sample] == expected
+    return len(functions), len(calls), legacy, linear, indexed
+
+
+def main():
+    print(f"{'functions':>10} {'calls':>8} {'legacy ms':>10} {'linear ms':>10} {'index ms':>9}")
+    for size in SIZES:
+        functions, calls, legacy, linear, indexed = run(size)
+        print(f'{functions:>10} {calls:>8} {legacy * 1000:>10.1f} {linear * 1000:>10.1f} '
+              f'{indexed * 1000:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Control-flow graph construction cost on top of a plain parse, and the
+# effect of the per-function block cap on one very large function.
+#
+#   python -m benchmarks.bench_cfg
+
+import time
+
+from benchmarks.corpus import python_source
+from utils import cfg
+from utils.python_parser import PythonCodeParser
+
+SIZES = [1000, 10000, 50000]
+REPEAT = 3
+
+
+def best_of(fn) -> float:
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def large_function(statements: int) -> str:
+    body = ''.join(f'    if x > {i}:\n        x -= 1\n    else:\n        x += 1\n'
+                   for i in range(statements // 4))
+    return 'def big(x):\n' + body + '    return x\n'
+
+
+def main():
+    parser = PythonCodeParser()
+    print(f"{'lines':>8} {'functions ms':>13} {'with cfg ms':>12} {'blocks':>8}")
+    for size in SIZES:
+        code = python_source(size)
+        plain = best_of(lambda: parser.parse_code(code, ['functions']))
+        with_cfg = best_of(lambda: parser.parse_code(code, ['functions', 'cfg']))
+        blocks = len(parser.parse_code(code, ['cfg'])['cfg'])
+        print(f'{size:>8} {plain * 1000:>13.1f} {with_cfg * 1000:>12.1f} {blocks:>8}')
+
+    default_cap = cfg.MAX_BLOCKS
+    print()
+    print(f"{'statements':>11} {'cap':>6} {'cfg ms':>8} {'blocks':>8}")
+    for statements in (1000, 20000):
+        code = large_function(statements)
+        for cap in (default_cap, 10 ** 9):
+            cfg.MAX_BLOCKS = cap
+            elapsed = best_of(lambda: parser.parse_code(code, ['cfg']))
+            blocks = len(parser.parse_code(code, ['cfg'])['cfg'])
+            print(f"{statements:>11} {cap if cap < 10 ** 9 else 'none':>6} {elapsed * 1000:>8.1f} "
+                  f'{blocks:>8}')
+    cfg.MAX_BLOCKS = default_cap
+
+
+if __name__ == '__main__':
+    main()
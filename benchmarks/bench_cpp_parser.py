@@ -0,0 +1,73 @@
+# Time of the C++ scanner against the previous five-pass regex parser, and
+# of the libclang backend when it is installed, on large translation units.
+#
+#   python -m benchmarks.bench_cpp_parser
+
+import re
+import time
+
+from benchmarks.corpus import cpp_source
+from utils import cpp_parser
+from utils.cpp_parser import CppCodeParser
+
+SIZES = [1000, 10000, 50000]
+REPEAT = 3
+
+
+def legacy_parse(code: str):
+    # The line-by-line parser the scanner replaced, kept as the baseline
+    analysis = {'includes': [], 'functions': [], 'classes': [], 'loops': [], 'conditionals': []}
+    lines = code.split('\n')
+    analysis['includes'] = [
+        {'line': i+1, 'header': match.group(1)}
+        for i, line in enumerate(lines)
+        for match in [re.match(r'#include\s*[<"]([^>"]+)[>"]', line.strip())]
+        if match
+    ]
+    for i, line in enumerate(lines):
+        match = re.search(r'(\w+)\s+(\w+)\s*\(([^)]*)\)\s*\{', line)
+        if match:
+            analysis['functions'].append({'return_type': match.group(1), 'name': match.group(2),
+                                          'parameters': match.group(3), 'line': i+1})
+    for i, line in enumerate(lines):
+        match = re.search(r'class\s+(\w+)', line)
+        if match:
+            analysis['classes'].append({'name': match.group(1), 'line': i+1})
+    for i, line in enumerate(lines):
+        if re.search(r'\b(for|while)\s*\(', line):
+            analysis['loops'].append({'type': 'for' if 'for' in line else 'while', 'line': i+1})
+    for i, line in enumerate(lines):
+        if re.search(r'\bif\s*\(', line):
+            analysis['conditionals'].append({'line': i+1})
+    return analysis
+
+
+def best_time(fn, code: str, repeat: int = REPEAT) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(code)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    scanner = CppCodeParser('scanner')
+    clang = CppCodeParser('clang') if cpp_parser.cindex is not None else None
+    print(f"{'lines':>8} {'legacy ms':>10} {'scanner ms':>11} {'no structure ms':>16} "
+          f"{'clang ms':>9} {'functions':>10} {'calls':>7}")
+    for size in SIZES:
+        code = cpp_source(size)
+        legacy = best_time(legacy_parse, code)
+        full = best_time(scanner.parse_code, code)
+        fields = [field for field in CppCodeParser.FIELDS if field != 'code_structure']
+        partial = best_time(lambda source: scanner.parse_code(source, fields), code)
+        clang_time = best_time(clang.parse_code, code, 1) if clang is not None else float('nan')
+        analysis = scanner.parse_code(code)
+        print(f"{code.count(chr(10)):>8} {legacy * 1000:>10.1f} {full * 1000:>11.1f} "
+              f"{partial * 1000:>16.1f} {clang_time * 1000:>9.1f} "
+              f"{len(analysis['functions']):>10} {len(analysis['calls']):>7}")
+
+
+if __name__ == '__main__':
+    main()
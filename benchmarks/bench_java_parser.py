@@ -0,0 +1,98 @@
+# Time of the Java parser against the previous walk over javalang's own
+# iterator with an isinstance chain: a first parse, a repeated parse served
+# from the parse cache, and the token scanner used for large files when only
+# the fields of the project graphs are requested.
+#
+#   python -m benchmarks.bench_java_parser
+
+import os
+import time
+
+# Set before the parser module is imported, which reads it once
+os.environ.setdefault('JAVA_FAST_PATH_LINES', '0')
+
+import javalang
+
+from benchmarks.corpus import java_source
+from utils import java_parser
+from utils.java_parser import JavaCodeParser
+from utils.project import LINK_FIELDS
+
+SIZES = [1000, 10000, 50000]
+REPEAT = 3
+
+
+def legacy_parse(code: str):
+    # The parse and walk the dispatch table replaced, kept as the baseline
+    tokens = list(javalang.tokenizer.tokenize(code))
+    tree = javalang.parser.Parser(tokens).parse()
+    blocks = java_parser._Blocks(tokens)
+    analysis = {'functions': [], 'classes': [], 'variables': [], 'loops': [], 'conditionals': [],
+                'calls': []}
+    for path, node in tree:
+        if isinstance(node, javalang.tree.ClassDeclaration):
+            analysis['classes'].append({'name': node.name, 'line': node.position.line,
+                                        'methods': [m.name for m in node.methods]})
+        elif isinstance(node, (javalang.tree.MethodDeclaration, javalang.tree.ConstructorDeclaration)):
+            analysis['functions'].append({
+                'name': node.name,
+                'line': node.position.line,
+                'end_line': blocks.end_line(node.position),
+                'scope': '.'.join(p.name for p in path if isinstance(p, javalang.tree.TypeDeclaration))
+            })
+        elif isinstance(node, javalang.tree.VariableDeclaration):
+            analysis['variables'].extend({'name': d.name, 'line': node.position and node.position.line}
+                                         for d in node.declarators)
+        elif isinstance(node, (javalang.tree.ForStatement, javalang.tree.WhileStatement)):
+            analysis['loops'].append({'line': node.position.line})
+        elif isinstance(node, javalang.tree.IfStatement):
+            analysis['conditionals'].append({'line': node.position.line})
+        elif isinstance(node, javalang.tree.MethodInvocation):
+            analysis['calls'].append({'function': node.member, 'line': node.position.line})
+    return analysis
+
+
+def best_time(fn, repeat: int = REPEAT) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def cold(fn):
+    def run():
+        java_parser._parsed.clear()
+        return fn()
+    return run
+
+
+def main():
+    fields = [field for field in JavaCodeParser.FIELDS if field not in ('cfg', 'code_structure')]
+    print(f"{'lines':>8} {'legacy ms':>10} {'parse ms':>9} {'cached ms':>10} "
+          f"{'links parse ms':>15} {'links scan ms':>14} {'functions':>10} {'calls':>7}")
+    for size in SIZES:
+        code = java_source(size)
+        parser = JavaCodeParser()
+        legacy = best_time(lambda: legacy_parse(code))
+        parse = best_time(cold(lambda: parser.parse_code(code, fields)))
+        cached = best_time(lambda: parser.parse_code(code, fields))
+
+        # Fields of the project dependency and call graphs, parsed and scanned
+        links = [field for field in LINK_FIELDS if field in JavaCodeParser.FIELDS]
+        java_parser.FAST_PATH_LINES = 0
+        links_parse = best_time(cold(lambda: parser.parse_code(code, links)))
+        java_parser.FAST_PATH_LINES = 1
+        links_scan = best_time(cold(lambda: parser.parse_code(code, links)))
+        java_parser.FAST_PATH_LINES = 0
+
+        analysis = parser.parse_code(code, fields)
+        print(f"{code.count(chr(10)):>8} {legacy * 1000:>10.1f} {parse * 1000:>9.1f} "
+              f"{cached * 1000:>10.1f} {links_parse * 1000:>15.1f} {links_scan * 1000:>14.1f} "
+              f"{len(analysis['functions']):>10} {len(analysis['calls']):>7}")
+    print(f"parse cache: {java_parser._parsed.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Layout time per strategy, compared against networkx.spring_layout.
+#
+#   python -m benchmarks.bench_layout
+
+import time
+
+import networkx as nx
+import numpy as np
+
+from utils import layout
+
+
+def tree_graph(n: int) -> nx.DiGraph:
+    rng = np.random.default_rng(0)
+    G = nx.DiGraph()
+    G.add_node(0)
+    for node in range(1, n):
+        G.add_edge(int(rng.integers(max(0, node - 50), node)), node)
+    return G
+
+
+def dag_graph(n: int) -> nx.DiGraph:
+    rng = np.random.default_rng(1)
+    G = nx.DiGraph()
+    G.add_nodes_from(range(n))
+    for node in range(1, n):
+        for target in rng.integers(0, node, size=2):
+            G.add_edge(int(target), node)
+    return G
+
+
+def general_graph(n: int) -> nx.Graph:
+    return nx.gnm_random_graph(n, 2 * n, seed=2)
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    cases = [
+        ('tree', tree_graph),
+        ('layered', dag_graph),
+        ('force', general_graph)
+    ]
+    print(f"{'strategy':>10} {'nodes':>8} {'cold ms':>10} {'cached ms':>10} {'spring ms':>10}")
+    for strategy, build in cases:
+        for n in (300, 1000, 10000):
+            G = build(n)
+            layout._layout_cache.clear()
+            cold = timed(lambda: layout.compute_layout(G, strategy))
+            cached = timed(lambda: layout.compute_layout(G, strategy))
+            # spring_layout is quadratic and needs scipy above 500 nodes
+            spring = timed(lambda: nx.spring_layout(G, seed=0)) if n < 500 else float('nan')
+            print(f'{strategy:>10} {n:>8} {cold * 1000:>10.1f} {cached * 1000:>10.1f} '
+                  f'{spring * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
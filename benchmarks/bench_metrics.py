@@ -0,0 +1,52 @@
+# Code metrics cost against the parse they are derived from, per language and
+# input size, up to over 100k structure nodes; then one deeply nested
+# function and one function calling many others. The metrics should grow
+# linearly and stay a small fraction of the parse.
+#
+#   python -m benchmarks.bench_metrics
+
+import os
+import time
+
+# Repeated runs would otherwise time the Java parse cache instead of the parser
+os.environ.setdefault('JAVA_PARSE_CACHE_BYTES', '0')
+
+from benchmarks.corpus import SOURCES, nested_source, wide_source
+from utils import code_metrics
+from utils.pipeline import PARSERS
+
+SIZES = {'python': [500, 5000, 25000], 'java': [500, 5000, 35000], 'cpp': [500, 5000, 50000]}
+REPEAT = 3
+
+
+def best_of(fn) -> float:
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(language: str, label: str, code: str) -> None:
+    parser = PARSERS[language]()
+    parse = best_of(lambda: parser.parse_code(code, code_metrics.REQUIRES))
+    analysis = parser.parse_code(code, code_metrics.REQUIRES)
+    compute = best_of(lambda: code_metrics.compute(language, analysis))
+    print(f"{language:>8} {label:>12} {len(analysis['code_structure']):>8} "
+          f"{len(analysis['functions']):>10} {parse * 1000:>9.1f} {compute * 1000:>11.2f} "
+          f"{compute / parse:>7.1%}")
+
+
+def main():
+    print(f"{'language':>8} {'input':>12} {'nodes':>8} {'functions':>10} {'parse ms':>9} "
+          f"{'metrics ms':>11} {'share':>7}")
+    for language, source in SOURCES.items():
+        for size in SIZES[language]:
+            measure(language, f'{size} lines', source(size))
+        measure(language, 'nested 60', nested_source(language, 60))
+        measure(language, 'fanout 2000', wide_source(language, 2000))
+
+
+if __name__ == '__main__':
+    main()
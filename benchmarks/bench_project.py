@@ -0,0 +1,64 @@
+# Project analysis throughput: one worker round trip per file, as separate
+# /analyze requests would cost, vs batched fan-out from a streamed zip archive.
+#
+#   python -m benchmarks.bench_project
+
+import io
+import os
+import time
+import zipfile
+
+from benchmarks.corpus import python_source
+from utils import project
+from utils.executor import AnalysisExecutor
+
+SIZES = [100, 1000, 3000]
+FILE_LINES = 120
+
+
+def make_archive(files: int) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for i in range(files):
+            code = f'from pkg import mod{(i + 1) % files}\n' + python_source(FILE_LINES)
+            archive.writestr(f'pkg/mod{i}.py', code)
+    buffer.seek(0)
+    return buffer
+
+
+def run(executor: AnalysisExecutor, files: int, workers: int):
+    archive = make_archive(files)
+
+    start = time.perf_counter()
+    for path, code in project.iter_archive(archive, 1024 * 1024):
+        executor.run(project.analyze_files, [(path, code)], [], False)
+    per_file = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summaries = {}
+    for kind, value in project.iter_project(project.iter_archive(archive, 1024 * 1024),
+                                            executor.run, workers, fields=[], bodies=False):
+        summaries[value[0]] = value[3]
+    batched = time.perf_counter() - start
+
+    start = time.perf_counter()
+    executor.run(project.render_project, summaries, 'json')
+    linked = time.perf_counter() - start
+    return per_file, batched, linked
+
+
+def main():
+    workers = os.cpu_count() or 1
+    executor = AnalysisExecutor(workers=workers, timeout=600)
+    try:
+        print(f'{workers} workers')
+        print(f"{'files':>8} {'per file s':>11} {'batched s':>10} {'graphs s':>9}")
+        for files in SIZES:
+            per_file, batched, linked = run(executor, files, workers)
+            print(f'{files:>8} {per_file:>11.2f} {batched:>10.2f} {linked:>9.2f}')
+    finally:
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
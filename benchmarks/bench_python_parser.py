@@ -0,0 +1,46 @@
+# Time and peak memory of PythonCodeParser.parse_code, including serialization.
+#
+#   python -m benchmarks.bench_python_parser
+
+import json
+import time
+import tracemalloc
+
+from benchmarks.corpus import python_source
+from utils.python_parser import PythonCodeParser
+
+SIZES = [100, 1000, 10000]
+REPEAT = 3
+
+
+def run(lines: int):
+    code = python_source(lines)
+    parser = PythonCodeParser()
+
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        parser.parse_code(code)
+        best = min(best, time.perf_counter() - start)
+
+    # Peak includes the transient AST; retained is what the analysis keeps alive
+    tracemalloc.start()
+    analysis = parser.parse_code(code)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    output_bytes = len(json.dumps(analysis, default=str))
+    return code.count('\n'), best, peak, retained, len(analysis['code_structure']), output_bytes
+
+
+def main():
+    print(f"{'lines':>8} {'time ms':>10} {'peak MiB':>10} {'retained MiB':>13} {'nodes':>8} "
+          f"{'json MiB':>10}")
+    for size in SIZES:
+        lines, seconds, peak, retained, nodes, output_bytes = run(size)
+        print(f'{lines:>8} {seconds * 1000:>10.1f} {peak / 2**20:>10.2f} {retained / 2**20:>13.2f} '
+              f'{nodes:>8} {output_bytes / 2**20:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Retained memory of the Python analysis as record tables vs lists of dicts,
+# and response size of each wire encoding.
+#
+#   python -m benchmarks.bench_records
+
+import gc
+import sys
+import tracemalloc
+
+from benchmarks.corpus import python_source
+from utils import records, serialization
+from utils.python_parser import PythonCodeParser
+
+SIZES = [1000, 10000, 50000]
+
+
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def run(lines: int):
+    code = python_source(lines)
+    parser = PythonCodeParser()
+    analysis = parser.parse_code(code)
+
+    _, table_bytes = retained(lambda: parser.parse_code(code))
+    # The same rows as one dict per entry, as the parser kept them before. The
+    # dicts share their values with the tables, so add the values back once.
+    _, row_bytes = retained(lambda: {name: list(entries) for name, entries in analysis.items()})
+    columns_bytes = sum(sys.getsizeof(table.column(name))
+                        for table in analysis.values() for name in table.names)
+    row_bytes += table_bytes - columns_bytes
+
+    sizes = {
+        'json': len(serialization.dumps(analysis)),
+        'columns': len(serialization.dumps(records.columnar(analysis)))
+    }
+    if serialization.msgpack is not None:
+        sizes['msgpack'] = len(serialization.packb(records.columnar(analysis)))
+    return code.count('\n'), len(analysis['code_structure']), row_bytes, table_bytes, sizes
+
+
+def main():
+    print(f"{'lines':>8} {'nodes':>8} {'rows MiB':>10} {'tables MiB':>11} "
+          f"{'json MiB':>10} {'columns MiB':>12} {'msgpack MiB':>12}")
+    for size in SIZES:
+        lines, nodes, row_bytes, table_bytes, sizes = run(size)
+        msgpack_size = sizes.get('msgpack')
+        print(f'{lines:>8} {nodes:>8} {row_bytes / 2**20:>10.2f} {table_bytes / 2**20:>11.2f} '
+              f"{sizes['json'] / 2**20:>10.2f} {sizes['columns'] / 2**20:>12.2f} "
+              f"{(msgpack_size / 2**20 if msgpack_size else float('nan')):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
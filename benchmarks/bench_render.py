@@ -0,0 +1,86 @@
+# PNG rendering throughput with N concurrent renders. The pyplot baseline
+# holds a lock around each render, as its global current figure requires;
+# the figure-per-thread renderer runs unlocked and every image is checked
+# against a serial render. Also times whole PNG analyses with the views
+# drawn one after another and on the render pool.
+#
+#   python -m benchmarks.bench_render
+
+import base64
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import networkx as nx
+
+from benchmarks.corpus import SOURCES
+from utils import pipeline, renderers, visualizer
+from utils.layout import compute_layout
+
+CONCURRENCY = [1, 2, 4, 8]
+RENDERS = 24
+GRAPH_NODES = 30
+
+_pyplot_lock = threading.Lock()
+
+
+def graphs(count: int):
+    result = []
+    for seed in range(count):
+        G = nx.gnp_random_graph(GRAPH_NODES, 0.08, seed=seed, directed=True)
+        result.append((G, compute_layout(G, 'layered')))
+    return result
+
+
+def pyplot_render(G, pos) -> str:
+    # The renderer before figures were kept per thread
+    renderers.agg()
+    import matplotlib.pyplot as plt
+    with _pyplot_lock:
+        plt.figure(figsize=(10, 8))
+        nx.draw(G, pos, with_labels=True, node_color=['lightgray'] * len(G), node_size=2000,
+                font_size=10, font_weight='bold', arrows=True)
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+        plt.close()
+    return f'data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode()}'
+
+
+def throughput(render, work, threads: int):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        images = list(pool.map(lambda item: render(*item), work))
+    return len(work) / (time.perf_counter() - start), images
+
+
+def analyses(threads: int, repeat: int = 3) -> float:
+    visualizer.RENDER_THREADS = threads
+    code = SOURCES['python'](60)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pipeline.analyze_to_bytes('python', code, 'png')
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    work = graphs(RENDERS)
+    expected = [renderers.graph_to_png(G, pos) for G, pos in work]
+    print(f'{os.cpu_count()} CPUs, {RENDERS} renders of {GRAPH_NODES}-node graphs')
+    print(f"{'threads':>8} {'pyplot/s':>9} {'per thread/s':>13} {'identical':>10}")
+    for threads in CONCURRENCY:
+        baseline, _ = throughput(pyplot_render, work, threads)
+        rate, images = throughput(renderers.graph_to_png, work, threads)
+        print(f'{threads:>8} {baseline:>9.2f} {rate:>13.2f} {str(images == expected):>10}')
+
+    pool_threads = visualizer.RENDER_THREADS or 3
+    serial = analyses(0)
+    pooled = analyses(pool_threads)
+    print(f'\nPNG analysis, views in turn: {serial * 1000:.0f} ms, on the render pool: {pooled * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
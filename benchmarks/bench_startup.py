@@ -0,0 +1,143 @@
+# Cold-start cost: importing the app with and without the heavy modules,
+# time to the first /analyze response in a fresh process, and serve.py's
+# time to ready plus how much of each analysis worker's memory is shared.
+#
+#   python -m benchmarks.bench_startup
+
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPEAT = 5
+HEAVY = ('matplotlib', 'networkx', 'numpy', 'javalang')
+
+IMPORT_APP = '''
+import sys, time
+start = time.perf_counter()
+import app
+{extra}
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+'''
+
+FIRST_REQUEST = '''
+import time
+start = time.perf_counter()
+from app import app
+client = app.test_client()
+response = client.post('/analyze', json={{'language': {language!r}, 'code': {code!r}, 'format': 'json'}})
+assert response.status_code == 200, response.data
+print(time.perf_counter() - start, '')
+'''
+
+SAMPLES = {
+    'python': 'def f(x):\n    return g(x)\n\ndef g(x):\n    return x\n',
+    'java': 'class A {\n    int f(int x) { return g(x); }\n    int g(int x) { return x; }\n}\n',
+    'cpp': 'int g(int x) { return x; }\nint f(int x) { return g(x); }\n'
+}
+
+
+def run_python(source: str, env=None):
+    output = subprocess.run([sys.executable, '-c', source], capture_output=True, text=True,
+                            check=True, env={**os.environ, **(env or {})}).stdout.split()
+    return float(output[0]), output[1] if len(output) > 1 else ''
+
+
+def median_of(source: str, env=None):
+    runs = [run_python(source, env) for _ in range(REPEAT)]
+    return statistics.median(seconds for seconds, _ in runs), runs[-1][1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def descendants(pid: int):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+    return children + [grandchild for child in children for grandchild in descendants(child)]
+
+
+def memory_kib(pid: int):
+    # (proportional set size, private) in KiB; pages shared with the fork server count once
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    values[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        return None
+    return values.get('Pss', 0), values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+
+
+def role(pid: int, server: int) -> str:
+    # Workers are forked from the fork server, so they share its command line
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            cmdline = f.read()
+    except (OSError, ValueError, IndexError):
+        return '?'
+    if parent != server:
+        return 'worker'
+    return 'resource tracker' if b'resource_tracker' in cmdline else 'fork server'
+
+
+def serve(workers: int):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'serve.py', '--port', str(port), '--workers', str(workers)],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        process.stdout.readline()
+        ready = time.perf_counter() - start
+        request = urllib.request.Request(
+            f'http://127.0.0.1:{port}/analyze',
+            data=json.dumps({'language': 'python', 'code': SAMPLES['python'], 'format': 'png'}).encode(),
+            headers={'Content-Type': 'application/json'})
+        urllib.request.urlopen(request, timeout=60).read()
+        first = time.perf_counter() - start
+        usage = [(pid, memory_kib(pid)) for pid in descendants(process.pid)]
+        return ready, first, [(role(pid, process.pid), u) for pid, u in usage if u]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    print(f"{'import':<28} {'median s':>9}  heavy modules loaded")
+    for name, extra in (('import app', ''), ('import app + preload', 'import utils.preload')):
+        seconds, loaded = median_of(IMPORT_APP.format(extra=extra, heavy=HEAVY))
+        print(f'{name:<28} {seconds:>9.3f}  {loaded or "-"}')
+
+    print(f"\n{'first request (inline)':<28} {'median s':>9}")
+    for language, code in SAMPLES.items():
+        seconds, _ = median_of(FIRST_REQUEST.format(language=language, code=code),
+                               {'ANALYSIS_WORKERS': '0'})
+        print(f'{language:<28} {seconds:>9.3f}')
+
+    workers = min(4, os.cpu_count() or 1)
+    ready, first, usage = serve(workers)
+    print(f'\nserve.py, {workers} workers: ready in {ready:.2f}s, first PNG response at {first:.2f}s')
+    if usage:
+        # Worker pages still shared with the fork server only count towards PSS in part
+        print(f"{'process':<28} {'PSS MiB':>9} {'private MiB':>12}")
+        for name, (pss, private) in usage:
+            print(f'{name:<28} {pss / 1024:>9.1f} {private / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
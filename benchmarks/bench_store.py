@@ -0,0 +1,79 @@
+# Analysis store write throughput and query latency as it grows. Synthetic
+# summaries of 8 functions, 2 classes and 20 calls each are recorded through
+# the writer thread; each query then runs against the full store. Lookups
+# stay flat as it grows; 'calls X' grows with the snippets that match, as
+# names are drawn from a fixed vocabulary and matches are sorted by recency.
+#
+#   python -m benchmarks.bench_store
+
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from utils import serialization
+from utils.store import AnalysisStore, digest
+
+SIZES = [1000, 10000, 50000]
+NAMES = [f'name_{i}' for i in range(2000)]
+QUERIES = 200
+
+
+def summary(rng: random.Random) -> bytes:
+    functions = []
+    for _ in range(8):
+        line = rng.randint(1, 400)
+        functions.append([rng.choice(NAMES), '', line, line + rng.randint(0, 80), rng.randint(1, 20),
+                          rng.randint(0, 5), rng.randint(0, 10), rng.randint(0, 10)])
+    return serialization.dumps({
+        'lines': 500,
+        'bytes': 12000,
+        'functions': functions,
+        'classes': [[rng.choice(NAMES), rng.randint(1, 400)] for _ in range(2)],
+        'calls': [[functions[0][0], rng.choice(NAMES), rng.randint(1, 400)] for _ in range(20)]
+    })
+
+
+def fill(store: AnalysisStore, start: int, count: int, rng: random.Random) -> float:
+    began = time.perf_counter()
+    for i in range(start, start + count):
+        store.record(digest('python', str(i)), 'python', summary(rng))
+    store.flush()
+    return count / (time.perf_counter() - began)
+
+
+def latency_ms(query, rng: random.Random) -> float:
+    timings = []
+    for _ in range(QUERIES):
+        began = time.perf_counter()
+        query(rng)
+        timings.append(time.perf_counter() - began)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = AnalysisStore(os.path.join(directory, 'store.db'), batch_size=256, flush_interval=0.05,
+                              max_pending=1000000)
+        queries = {
+            'contains': lambda r: store.contains(digest('python', str(r.randrange(SIZES[0])))),
+            'calls X': lambda r: store.snippets(calls=r.choice(NAMES), limit=50),
+            'largest': lambda r: store.functions(limit=50),
+            'complex': lambda r: store.functions(order='complexity', limit=50),
+            'snippet': lambda r: store.snippet(digest('python', str(r.randrange(SIZES[0]))))
+        }
+        print(f"{'snippets':>9} {'writes/s':>9} " + ' '.join(f'{name + " ms":>11}' for name in queries))
+        stored = 0
+        for size in SIZES:
+            rate = fill(store, stored, size - stored, rng)
+            stored = size
+            store._seen.clear()
+            timings = [latency_ms(query, rng) for query in queries.values()]
+            print(f'{size:>9} {rate:>9.0f} ' + ' '.join(f'{ms:>11.3f}' for ms in timings))
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# Wall time and output size of traced snippets as loop counts grow. Both
+# should level off once sampling and the event cap take over.
+#
+#   python -m benchmarks.bench_tracer
+
+import time
+
+from utils.tracer import iter_trace
+
+LOOPS = [10, 1000, 100000, 1000000, 10000000]
+
+SNIPPET = '''
+total = 0
+items = []
+for i in range({n}):
+    total += i
+    if i % 1000 == 0:
+        items.append(total)
+print(total)
+'''
+
+
+def main():
+    print(f"{'iterations':>11} {'untraced s':>11} {'traced s':>9} {'steps':>8} {'bytes':>8}")
+    for n in LOOPS:
+        code = SNIPPET.format(n=n)
+        start = time.perf_counter()
+        exec(compile(code, '<bench>', 'exec'), {'print': lambda *args: None})
+        untraced = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # The snippets are our own, so they run without the sandbox
+        lines = list(iter_trace(code, timeout=120, cpu_seconds=120, sandbox=None))
+        traced = time.perf_counter() - start
+        steps = sum(line.count(b'"step":') for line in lines)
+        print(f'{n:>11} {untraced:>11.3f} {traced:>9.3f} {steps:>8} {sum(map(len, lines)):>8}')
+
+
+if __name__ == '__main__':
+    main()
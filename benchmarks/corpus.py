@@ -0,0 +1,205 @@
+# Synthetic source generators used by the benchmarks. Output is deterministic
+# for a given size so results can be compared across commits.
+
+PYTHON_UNIT = '''
+class Container{n}:
+    def __init__(self, items):
+        self.items = items
+        self.size = len(items)
+
+    def total(self):
+        result = 0
+        for item in self.items:
+            if item > 0:
+                result = result + item
+            else:
+                result = result - item
+        return result
+
+    def rebalance(self, threshold):
+        moved = []
+        for i in range(self.size):
+            for j in range(i + 1, self.size):
+                if self.items[i] > self.items[j] + threshold:
+                    while self.items[i] > threshold:
+                        self.items[i] = self.items[i] - 1
+                        moved.append((i, j))
+                    if len(moved) > self.size:
+                        break
+                elif self.items[j] == threshold:
+                    self.items[j] = max(
+                        self.items[i],
+                        threshold,
+                    )
+        return moved
+
+def process_{n}(values, limit):
+    count = 0
+    while count < limit:
+        values = sorted(values)
+        count = count + 1
+    helper = Container{n}(values)
+    return helper.total()
+'''
+
+
+def python_source(lines: int) -> str:
+    unit_lines = PYTHON_UNIT.count('\n')
+    units = max(1, lines // unit_lines)
+    return ''.join(PYTHON_UNIT.format(n=n) for n in range(units))
+
+CPP_UNIT = '''
+// Accumulator {n}: keeps a running total of {{ values }}
+class Accumulator{n} {{
+public:
+    Accumulator{n}(int capacity) : capacity_(capacity), size_(0) {{}}
+
+    int total() const {{
+        int result = 0;
+        for (int i = 0; i < size_; i++) {{
+            if (items_[i] > 0) {{
+                result = result + items_[i];
+            }} else {{
+                result = result - items_[i];
+            }}
+        }}
+        return result;
+    }}
+
+    void rebalance(int threshold) {{
+        int moved = 0;
+        for (int i = 0; i < size_; i++) {{
+            while (items_[i] > threshold) {{
+                items_[i] = items_[i] - 1;
+                moved = moved + 1;
+            }}
+        }}
+        /* log("moved {{ items"); */
+        report(moved, "rebalanced {{");
+    }}
+
+    void report(int count, const char* label) {{
+        last_ = count;
+    }}
+
+private:
+    int capacity_, size_;
+    int items_[64];
+    int last_;
+}};
+
+int process_{n}(int limit) {{
+    Accumulator{n} helper(limit);
+    int count = 0;
+    while (count < limit) {{
+        count = count + 1;
+    }}
+    helper.rebalance(count);
+    return helper.total();
+}}
+'''
+
+
+def cpp_source(lines: int) -> str:
+    unit_lines = CPP_UNIT.count('\n')
+    units = max(1, lines // unit_lines)
+    return '#include <cstddef>\n' + ''.join(CPP_UNIT.format(n=n) for n in range(units))
+
+JAVA_UNIT = '''
+class Accumulator{n} {{
+    private int[] items = new int[64];
+    private int size;
+    private int last;
+
+    public Accumulator{n}(int capacity) {{
+        this.size = 0;
+    }}
+
+    public int total() {{
+        int result = 0;
+        for (int i = 0; i < size; i++) {{
+            if (items[i] > 0) {{
+                result = result + items[i];
+            }} else {{
+                result = result - items[i];
+            }}
+        }}
+        return result;
+    }}
+
+    public void rebalance(int threshold) {{
+        int moved = 0;
+        for (int i = 0; i < size; i++) {{
+            while (items[i] > threshold) {{
+                items[i] = items[i] - 1;
+                moved = moved + 1;
+            }}
+        }}
+        report(moved);
+    }}
+
+    public void report(int count) {{
+        last = count;
+    }}
+
+    public static int process{n}(int limit) {{
+        Accumulator{n} helper = new Accumulator{n}(limit);
+        int count = 0;
+        while (count < limit) {{
+            count = count + 1;
+        }}
+        helper.rebalance(count);
+        return helper.total();
+    }}
+}}
+'''
+
+
+def java_source(lines: int) -> str:
+    unit_lines = JAVA_UNIT.count('\n')
+    units = max(1, lines // unit_lines)
+    return 'package bench;\n' + ''.join(JAVA_UNIT.format(n=n) for n in range(units))
+
+
+SOURCES = {'python': python_source, 'java': java_source, 'cpp': cpp_source}
+
+
+def nested_source(language: str, depth: int) -> str:
+    # One function whose body is `depth` nested ifs and loops
+    if language == 'python':
+        lines = ['def nested(x):']
+        for level in range(depth):
+            keyword = 'if x > {0}:' if level % 2 else 'for i{0} in range(x):'
+            lines.append('    ' * (level + 1) + keyword.format(level))
+        lines.append('    ' * (depth + 1) + 'x -= 1')
+        lines.append('    return x')
+        return '\n'.join(lines) + '\n'
+
+    opening = []
+    for level in range(depth):
+        indent = '    ' * (level + 2)
+        if level % 2:
+            opening.append(f'{indent}if (x > {level}) {{')
+        else:
+            opening.append(f'{indent}for (int i{level} = 0; i{level} < x; i{level}++) {{')
+    closing = ['    ' * (level + 2) + '}' for level in reversed(range(depth))]
+    body = opening + ['    ' * (depth + 2) + 'x = x - 1;'] + closing + ['        return x;']
+    if language == 'java':
+        return '\n'.join(['class Nested {', '    int nested(int x) {'] + body + ['    }', '}']) + '\n'
+    return '\n'.join(['int nested(int x) {'] + [line[4:] for line in body] + ['}']) + '\n'
+
+
+def wide_source(language: str, fanout: int) -> str:
+    # `fanout` small functions and one dispatcher that calls all of them
+    if language == 'python':
+        functions = ''.join(f'def leaf_{n}(x):\n    return x + {n}\n\n' for n in range(fanout))
+        calls = ''.join(f'    total += leaf_{n}(x)\n' for n in range(fanout))
+        return functions + 'def dispatch(x):\n    total = 0\n' + calls + '    return total\n'
+
+    functions = ''.join(f'    static int leaf{n}(int x) {{\n        return x + {n};\n    }}\n'
+                        for n in range(fanout))
+    calls = ''.join(f'        total += leaf{n}(x);\n' for n in range(fanout))
+    dispatch = '    static int dispatch(int x) {\n        int total = 0;\n' + calls + '        return total;\n    }\n'
+    if language == 'java':
+        return 'class Wide {\n' + functions + dispatch + '}\n'
+    return (functions + dispatch).replace('    static ', '').replace('\n    ', '\n')
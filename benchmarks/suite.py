@@ -0,0 +1,255 @@
+# Benchmark suite: every parser and every view against a generated corpus,
+# from the /examples snippets up to 50k-line files, deep nesting and wide
+# call graphs. Reports latency percentiles, peak traced memory and output
+# size, and writes JSON results that can be compared across commits.
+#
+#   python -m benchmarks.suite --output before.json
+#   python -m benchmarks.suite --output after.json --baseline before.json
+#   python -m benchmarks.suite --load --requests 200 --concurrency 8
+#
+# --baseline exits with status 1 when any p50 is slower than the baseline by
+# more than --threshold (and by at least --min-ms, to ignore timer noise).
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Repeated runs would otherwise time the Java parse cache instead of the parser
+os.environ.setdefault('JAVA_PARSE_CACHE_BYTES', '0')
+
+from benchmarks.corpus import SOURCES, nested_source, wide_source
+from utils import pipeline, serialization
+from utils.visualizer import VIEWS, CodeVisualizer, required_fields
+
+LANGUAGES = ('python', 'java', 'cpp')
+SIZES = (1000, 10000, 50000)
+QUICK_SIZES = (1000, 5000)
+NESTING = 60
+FANOUT = 2000
+
+
+def examples() -> Dict[str, Dict[str, str]]:
+    # The snippets served by GET /examples/<language>
+    from app import app
+    client = app.test_client()
+    return {language: client.get(f'/examples/{language}').get_json() for language in LANGUAGES}
+
+
+def corpus(quick: bool) -> List[Tuple[str, str, str]]:
+    cases = []
+    for language, snippets in examples().items():
+        for name, code in sorted(snippets.items()):
+            cases.append((language, f'example-{name}', code))
+    for language in LANGUAGES:
+        for lines in QUICK_SIZES if quick else SIZES:
+            cases.append((language, f'lines-{lines}', SOURCES[language](lines)))
+        cases.append((language, f'nested-{NESTING}', nested_source(language, NESTING)))
+        cases.append((language, f'wide-{FANOUT // 4 if quick else FANOUT}',
+                      wide_source(language, FANOUT // 4 if quick else FANOUT)))
+    return cases
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+
+    # Peak memory is taken from a separate run, since tracing slows the code down
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+        'p90_ms': round(percentile(samples, 0.9) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+        'output_bytes': len(serialization.dumps(result)),
+        'runs': repeat
+    }
+
+
+def run_case(language: str, name: str, code: str, output_format: str,
+             repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    base = {'language': language, 'case': name, 'lines': code.count('\n') + 1,
+            'input_bytes': len(code.encode())}
+    parser = pipeline.PARSERS[language]
+
+    def record(key: str, view: Optional[str], fn: Callable[[], Any]) -> None:
+        try:
+            results[key] = {**base, 'view': view, **measure(fn, repeat)}
+        except Exception as e:
+            results[key] = {**base, 'view': view, 'error': f'{type(e).__name__}: {e}'}
+
+    record(f'parse/{language}/{name}', None, lambda: parser().parse_code(code))
+
+    # Each view reads only the fields it needs, parsed once up front
+    visualizer = CodeVisualizer(output_format)
+    for view in sorted(VIEWS):
+        try:
+            analysis = parser().parse_code(code, required_fields([view]))
+        except Exception as e:
+            analysis = {'error': f'{type(e).__name__}: {e}'}
+        if 'error' in analysis:
+            results[f'view/{language}/{name}/{view}'] = {**base, 'view': view, 'error': analysis['error']}
+            continue
+        record(f'view/{language}/{name}/{view}', view,
+               lambda: VIEWS[view].method(visualizer, analysis, language))
+    return results
+
+
+def load(requests: int, concurrency: int, cached: bool, output_format: str) -> Dict[str, Dict[str, Any]]:
+    # Drives /analyze through the Flask test client from several threads. Unless
+    # cached is set every request sends distinct code, so each one is a cache miss.
+    from app import app, get_executor
+    client_lock = threading.Lock()
+    code = SOURCES['python'](1000)
+    workers = app.config['ANALYSIS_WORKERS']
+    get_executor()
+
+    latencies, failures = [], []
+    counter = iter(range(requests))
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with client_lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            body = code if cached else f'{code}# request {n}\n'
+            start = time.perf_counter()
+            response = client.post('/analyze', json={'language': 'python', 'code': body,
+                                                     'format': output_format})
+            elapsed = time.perf_counter() - start
+            with client_lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    rps = requests / elapsed
+    return {f"load/python/{'cached' if cached else 'uncached'}/c{concurrency}": {
+        'language': 'python', 'case': 'load', 'view': None, 'workers': workers,
+        'concurrency': concurrency, 'requests': requests, 'failed': len(failures),
+        'requests_per_second': round(rps, 2),
+        'requests_per_second_per_worker': round(rps / max(1, workers), 2),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3)
+    }}
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'commit': commit, 'version': CodeVisualizer.VERSION, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float, min_ms: float) -> List[str]:
+    regressions = []
+    for key, result in sorted(results.items()):
+        old = baseline.get(key)
+        if not old or 'p50_ms' not in old or 'p50_ms' not in result:
+            continue
+        before, after = old['p50_ms'], result['p50_ms']
+        if after > before * (1 + threshold) and after - before >= min_ms:
+            regressions.append(f'{key}: p50 {before:.2f} ms -> {after:.2f} ms '
+                               f'(+{(after / before - 1) * 100 if before else float("inf"):.0f}%)')
+    return regressions
+
+
+def report(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'benchmark':<58} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'out bytes':>10}")
+    for key, result in sorted(results.items()):
+        if 'error' in result:
+            print(f"{key:<58} error: {result['error'][:60]}")
+        elif 'requests_per_second' in result:
+            print(f"{key:<58} {result['p50_ms']:>9.2f} {result['p90_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+                  f"   {result['requests_per_second']:.1f} req/s, "
+                  f"{result['requests_per_second_per_worker']:.1f} per worker")
+        else:
+            print(f"{key:<58} {result['p50_ms']:>9.2f} {result['p90_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+                  f" {result['peak_kib']:>10.0f} {result['output_bytes']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parser and view benchmarks')
+    parser.add_argument('--quick', action='store_true', help='smaller corpus for a fast check')
+    parser.add_argument('--repeat', type=int, default=7, help='timed runs per benchmark')
+    parser.add_argument('--format', default='json', choices=CodeVisualizer.FORMATS,
+                        help='graph output format for the views')
+    parser.add_argument('--filter', default='', help='only run cases whose key contains this')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p50 slowdown, 0.2 = 20%%')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='ignore slowdowns smaller than this')
+    parser.add_argument('--load', action='store_true', help='run the /analyze load driver instead')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--cached', action='store_true', help='load test with repeated code')
+    args = parser.parse_args()
+
+    results = {}
+    if args.load:
+        results.update(load(args.requests, args.concurrency, args.cached, args.format))
+    else:
+        for language, name, code in corpus(args.quick):
+            if args.filter and args.filter not in f'{language}/{name}':
+                continue
+            results.update(run_case(language, name, code, args.format, args.repeat))
+    report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args.min_ms)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions over {args.threshold:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
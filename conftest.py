@@ -0,0 +1 @@
+# Lets pytest import the app's `utils` package when run from the repository root
@@ -0,0 +1,44 @@
+# Production entry point. Unlike `python app.py` (Flask's debug server), this
+# loads every parser and renderer once, starts the analysis workers from a
+# preloaded fork server and waits for them before accepting connections, then
+# serves the app from a multithreaded WSGI server.
+#
+#   python serve.py --host 0.0.0.0 --port 8000 --workers 4
+
+import argparse
+import os
+import time
+
+started = time.perf_counter()
+
+from werkzeug.serving import make_server
+
+from app import app, get_executor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the code visualizer')
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=app.config['ANALYSIS_WORKERS'],
+                        help='analysis worker processes, 0 to analyze in the server threads')
+    args = parser.parse_args()
+    app.config['ANALYSIS_WORKERS'] = args.workers
+
+    # Sessions and inline analysis run in this process, so it preloads too
+    import utils.preload  # noqa: F401
+    get_executor().wait_ready()
+
+    server = make_server(args.host, args.port, app, threaded=True)
+    print(f'Serving on http://{args.host}:{args.port} with {args.workers} analysis workers '
+          f'(ready in {time.perf_counter() - started:.2f}s)', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+import app as server
+from utils.store import AnalysisStore
+from utils.executor import AnalysisMemoryError, AnalysisTimeout
+
+
+@pytest.fixture
+def client():
+    server.app.config['ANALYSIS_WORKERS'] = 0
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize('key, value', [
+    ('views', 'call_graph'),
+    ('views', 3),
+    ('views', {'call_graph': True}),
+    ('views', ['call_graph', 1]),
+    ('fields', 'functions'),
+    ('fields', [None])
+])
+def test_analyze_rejects_names_that_are_not_string_lists(client, key, value):
+    response = client.post('/analyze', json={'code': 'x = 1', key: value})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'{key} must be a list of strings'
+
+
+def test_analyze_accepts_name_lists(client):
+    response = client.post('/analyze', json={'code': 'def f():\n    return 1\n', 'format': 'json',
+                                             'views': ['call_graph'], 'fields': ['functions']})
+    assert response.status_code == 200
+    assert set(response.get_json()['visualization']) == {'call_graph'}
+
+
+class FailingExecutor:
+    def __init__(self, error):
+        self.error = error
+
+    def run(self, fn, *args, **kwargs):
+        raise self.error
+
+
+@pytest.mark.parametrize('error, status', [
+    (AnalysisTimeout('Analysis exceeded 30s'), 504),
+    (AnalysisMemoryError('Analysis exceeded the memory limit'), 413)
+])
+def test_analyze_reports_worker_limits(client, monkeypatch, error, status):
+    monkeypatch.setattr(server, '_executor', FailingExecutor(error))
+    response = client.post('/analyze', json={'code': f'x = {status}  # limits', 'format': 'json'})
+    assert response.status_code == status
+    assert response.get_json()['error'] == str(error)
+
+
+def test_job_streams_analysis_before_views(client):
+    response = client.post('/jobs', json={'code': 'def f():\n    g()\n', 'format': 'json'})
+    assert response.status_code == 202
+    events = client.get(response.get_json()['events'])
+    assert events.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in events.data.splitlines() if line]
+    assert [line['event'] for line in lines] == ['analysis'] + ['view'] * 5 + ['done']
+    assert lines[0]['data']['calls'] == [{'function': 'g', 'line': 2}]
+    # Cheap views come first, the structure tree last
+    assert lines[-2]['name'] == 'code_structure'
+
+
+def test_job_events_as_server_sent_events(client):
+    response = client.post('/jobs', json={'code': 'x = 1\n', 'format': 'json', 'views': ['call_graph']})
+    events = client.get(response.get_json()['events'], headers={'Accept': 'text/event-stream'})
+    assert events.mimetype == 'text/event-stream'
+    messages = events.data.decode().split('\n\n')
+    assert all(message.startswith('data: ') for message in messages if message)
+    assert json.loads(messages[-2][len('data: '):]) == {'event': 'done'}
+
+
+def test_unknown_job_and_msgpack_jobs(client):
+    assert client.get('/jobs/missing').status_code == 404
+    assert client.get('/jobs/missing/events').status_code == 404
+    response = client.post('/jobs', json={'code': 'x = 1', 'encoding': 'msgpack'})
+    assert response.status_code == 400
+
+
+def test_store_endpoints(client, monkeypatch, tmp_path):
+    assert client.get('/store/snippets').status_code == 404
+    analyses = AnalysisStore(str(tmp_path / 'store.db'), version='test', flush_interval=0.01)
+    monkeypatch.setattr(server, 'analysis_store', analyses)
+    code = 'def store_caller():\n    store_callee()\n'
+    for _ in range(2):
+        assert client.post('/analyze', json={'code': code, 'format': 'json'}).status_code == 200
+    analyses.flush()
+    snippets = client.get('/store/snippets?calls=store_callee').get_json()['snippets']
+    assert len(snippets) == 1 and snippets[0]['submissions'] == 2
+    snippet = client.get(f"/store/snippets/{snippets[0]['digest']}").get_json()
+    assert [f['name'] for f in snippet['functions']] == ['store_caller']
+    functions = client.get('/store/functions?name=store_caller&order=complexity').get_json()['functions']
+    assert [f['digest'] for f in functions] == [snippets[0]['digest']]
+    assert client.get('/store/functions?order=name').status_code == 400
+    assert client.get('/store/snippets?limit=x').status_code == 400
+    assert client.get('/store/snippets/missing').status_code == 404
+    assert client.get('/store/stats').get_json()['languages']['python']['snippets'] == 1
+    analyses.close()
+
+
+def test_analyze_rejects_unknown_format(client):
+    response = client.post('/analyze', json={'code': 'x = 1', 'format': 'gif'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Unsupported format'
+
+
+def test_projects_reject_fields_that_are_not_string_lists(client):
+    response = client.post('/projects', json={'files': [{'path': 'a.py', 'code': 'x = 1'}],
+                                              'fields': 'functions'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('text', [5, ['x = 1'], {'text': 'x'}])
+def test_session_edits_reject_text_that_is_not_a_string(client, text):
+    response = client.post('/sessions', json={'code': 'x = 1\n', 'format': 'json'})
+    assert response.status_code == 201
+    session_id = response.get_json()['session_id']
+    response = client.post(f'/sessions/{session_id}/edits',
+                           json={'version': 1, 'edits': [{'start': 1, 'text': text}]})
+    assert response.status_code == 400
+
+
+def test_traces_are_disabled_by_default(client):
+    assert not server.app.config['TRACE_ENABLED']
+    response = client.post('/traces', json={'code': 'x = 1'})
+    assert response.status_code == 404
+
+
+def test_traces_require_the_sandbox(client, monkeypatch):
+    monkeypatch.setitem(server.app.config, 'TRACE_ENABLED', True)
+    monkeypatch.setitem(server.app.config, 'TRACE_SANDBOX', 'bwrap-that-does-not-exist')
+    response = client.post('/traces', json={'code': 'x = 1'})
+    assert response.status_code == 503
+
+
+def test_execution_steps_view_returns_disabled_marker(client):
+    response = client.post('/analyze', json={'code': 'x = 1\n', 'format': 'json', 'fields': [],
+                                             'views': ['execution_steps']})
+    assert response.status_code == 200
+    assert 'disabled' in response.get_json()['visualization']['execution_steps']
+
+
+def test_project_streams_files_then_graphs(client, monkeypatch):
+    monkeypatch.setitem(server.app.config, 'PROJECT_MAX_FILE_BYTES', 1000)
+    files = [{'path': 'pkg/a.py', 'code': 'from pkg import b\ndef f():\n    g()\n'},
+             {'path': 'pkg/b.py', 'code': 'def g():\n    pass\n'},
+             {'path': 'big.py', 'code': '#' * 2000}]
+    response = client.post('/projects', json={'files': files})
+    assert response.status_code == 202
+    events = [json.loads(line) for line in client.get(response.get_json()['events']).data.splitlines()]
+    assert [event['event'] for event in events] == ['file'] * 3 + ['project', 'done']
+    assert {event['path']: event.get('status') for event in events[:3]} == {
+        'big.py': 413, 'pkg/a.py': None, 'pkg/b.py': None}
+    assert events[3]['data']['call_graph']['edges'] == [{'source': 'pkg/a.py:f', 'target': 'pkg/b.py:g'}]
+
+
+def test_projects_reject_unknown_fields(client):
+    response = client.post('/projects', json={'files': [{'path': 'a.py', 'code': 'x = 1'}],
+                                              'fields': ['functions', 'nope']})
+    assert response.status_code == 400
+    assert 'nope' in response.get_json()['error']
+
+
+def test_project_archive_form_fields_are_validated(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('a.py', 'x = 1\n')
+    archive.seek(0)
+    response = client.post('/projects', data={'archive': (archive, 'p.zip'), 'fields': 'functions,nope'},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('archive', [True, False])
+def test_project_body_limit(client, monkeypatch, archive):
+    monkeypatch.setitem(server.app.config, 'PROJECT_MAX_BODY_BYTES', 1000)
+    if archive:
+        response = client.post('/projects', data={'archive': (io.BytesIO(b'x' * 5000), 'p.zip')},
+                               content_type='multipart/form-data')
+    else:
+        response = client.post('/projects', json={'files': [{'path': 'a.py', 'code': 'x' * 5000}]})
+    assert response.status_code == 413
@@ -0,0 +1,89 @@
+import os
+import threading
+
+from utils.cache import AnalysisCache
+
+
+def entry_files(directory):
+    return sorted(name for _, _, names in os.walk(directory) for name in names)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    cache = AnalysisCache(max_bytes=1024, directory=str(tmp_path), version='1')
+    key = cache.key('python', 'x = 1')
+    cache.put(key, b'result')
+    reopened = AnalysisCache(max_bytes=1024, directory=str(tmp_path), version='1')
+    assert reopened.get(key) == b'result'
+    assert reopened.stats()['disk_hits'] == 1
+    assert reopened.stats()['disk']['bytes'] == len(b'result')
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = AnalysisCache(max_bytes=0, directory=str(tmp_path), version='1', max_disk_bytes=20)
+    keys = [cache.key('python', str(i)) for i in range(3)]
+    cache.put(keys[0], b'a' * 8)
+    cache.put(keys[1], b'b' * 8)
+    assert cache.get(keys[0]) == b'a' * 8
+    cache.put(keys[2], b'c' * 8)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == b'a' * 8
+    stats = cache.stats()['disk']
+    assert stats['entries'] == 2 and stats['bytes'] == 16 and stats['evictions'] == 1
+    assert entry_files(str(tmp_path)) == sorted([keys[0], keys[2]])
+
+
+def test_restart_applies_budget(tmp_path):
+    cache = AnalysisCache(max_bytes=0, directory=str(tmp_path), version='1')
+    for i in range(4):
+        cache.put(cache.key('python', str(i)), b'x' * 10)
+    reopened = AnalysisCache(max_bytes=0, directory=str(tmp_path), version='1', max_disk_bytes=25)
+    assert reopened.stats()['disk']['entries'] == 2
+    assert len(entry_files(str(tmp_path))) == 2
+
+
+def test_old_versions_are_removed(tmp_path):
+    old = AnalysisCache(directory=str(tmp_path), version='1')
+    old.put(old.key('python', 'x'), b'old')
+    AnalysisCache(directory=str(tmp_path), version='2')
+    assert os.listdir(tmp_path / 'code-visualizer') == ['version-2']
+
+
+def test_only_the_owned_subdirectory_is_touched(tmp_path):
+    # Directories that look like cache entries but belong to someone else
+    for name in ('ab', 'version-1', 'notes'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / ('ab' + '0' * 62)).write_bytes(b'theirs')
+    AnalysisCache(directory=str(tmp_path), version='2', max_disk_bytes=1)
+    assert sorted(os.listdir(tmp_path)) == ['ab', 'code-visualizer', 'notes', 'version-1']
+    assert all((tmp_path / name / ('ab' + '0' * 62)).read_bytes() == b'theirs'
+               for name in ('ab', 'version-1', 'notes'))
+
+
+def test_failed_write_removes_temp_file(tmp_path, monkeypatch):
+    cache = AnalysisCache(max_bytes=0, directory=str(tmp_path), version='1')
+
+    def fail(source, target):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'replace', fail)
+    cache.put(cache.key('python', 'x'), b'value')
+    assert entry_files(str(tmp_path)) == []
+    assert cache.stats()['disk']['bytes'] == 0
+
+
+def test_counters_are_consistent_across_threads():
+    cache = AnalysisCache(max_bytes=1024)
+    cache.put('hit', b'value')
+
+    def lookups():
+        for _ in range(2000):
+            cache.get('hit')
+            cache.get('miss')
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats['hits'] == stats['misses'] == 16000
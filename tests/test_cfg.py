@@ -0,0 +1,145 @@
+import pytest
+
+from utils.java_parser import JavaCodeParser
+from utils.python_parser import PythonCodeParser
+
+
+def graph(parser, code, function):
+    # Edges as ((kind, line), (kind, line), edge kind), so tests do not depend
+    # on block numbering
+    rows = [row for row in parser.parse_code(code, ['cfg'])['cfg'] if row['function'] == function]
+    blocks = {row['block']: (row['kind'], row['line']) for row in rows}
+    return {(blocks[row['block']], blocks[target], kind)
+            for row in rows for target, kind in row['successors']}
+
+
+def python_graph(code, function='f'):
+    return graph(PythonCodeParser(), code, function)
+
+
+def java_graph(body, function='A.f'):
+    return graph(JavaCodeParser(), 'class A {\n  int f(int x) {\n' + body + '  }\n}\n', function)
+
+
+def test_python_if_else_joins():
+    edges = python_graph('def f(x):\n    if x:\n        a()\n    else:\n        b()\n    c()\n')
+    assert (('conditional', 2), ('block', 3), 'true') in edges
+    assert (('conditional', 2), ('block', 5), 'false') in edges
+    assert (('block', 3), ('block', 6), '') in edges
+    assert (('block', 5), ('block', 6), '') in edges
+    assert (('block', 6), ('exit', 6), '') in edges
+
+
+def test_python_if_without_else_falls_through():
+    edges = python_graph('def f(x):\n    if x:\n        return 1\n    return 2\n')
+    assert edges == {
+        (('entry', 1), ('conditional', 2), ''),
+        (('conditional', 2), ('block', 3), 'true'),
+        (('conditional', 2), ('block', 4), 'false'),
+        (('block', 3), ('exit', 4), 'return'),
+        (('block', 4), ('exit', 4), 'return')
+    }
+
+
+def test_python_loop_break_and_continue():
+    edges = python_graph('def f(xs):\n    for x in xs:\n        if x:\n            break\n'
+                         '        if x > 1:\n            continue\n        a()\n    b()\n')
+    assert (('block', 4), ('block', 8), 'break') in edges
+    assert (('block', 6), ('loop', 2), 'continue') in edges
+    assert (('block', 7), ('loop', 2), 'back') in edges
+    assert (('loop', 2), ('block', 8), 'false') in edges
+
+
+def test_python_infinite_while_only_leaves_by_break():
+    edges = python_graph('def f():\n    while True:\n        if a():\n            break\n    b()\n')
+    assert not any(source == ('loop', 2) and kind == 'false' for source, _, kind in edges)
+    assert (('block', 4), ('block', 5), 'break') in edges
+
+
+def test_python_try_handlers_start_from_try_block():
+    edges = python_graph('def f():\n    try:\n        a()\n    except ValueError:\n        b()\n    c()\n')
+    assert (('block', 2), ('handler', 4), 'except') in edges
+    assert (('handler', 4), ('block', 6), '') in edges
+
+
+def test_python_unreachable_code_has_no_predecessors():
+    rows = PythonCodeParser().parse_code('def f():\n    return 1\n    a()\n', ['cfg'])['cfg']
+    targets = {target for row in rows for target, _ in row['successors']}
+    unreachable = [row for row in rows if row['line'] == 3 and row['kind'] == 'block']
+    assert len(unreachable) == 1 and unreachable[0]['block'] not in targets
+
+
+@pytest.mark.parametrize('parser, code, function, line', [
+    (PythonCodeParser(), 'def f():\n    try:\n        return a()\n    except E:\n        raise\n'
+     '    finally:\n        b()\n    c()\n', 'f', 8),
+    (JavaCodeParser(), 'class A {\n  int f() {\n    try {\n      return 1;\n    } catch (E e) {\n'
+     '      throw e;\n    } finally {\n      b();\n    }\n    c();\n  }\n}\n', 'A.f', 10)
+])
+def test_code_after_try_finally_without_fall_through_is_unreachable(parser, code, function, line):
+    rows = [row for row in parser.parse_code(code, ['cfg'])['cfg'] if row['function'] == function]
+    targets = {target for row in rows for target, _ in row['successors']}
+    # The call after the finally body starts its own block, which nothing enters
+    unreachable = [row for row in rows if row['line'] == line and row['kind'] == 'block']
+    assert len(unreachable) == 1 and unreachable[0]['block'] not in targets
+
+
+def test_python_large_function_is_collapsed():
+    body = ''.join(f'    if x == {i}:\n        a()\n' for i in range(300))
+    rows = list(PythonCodeParser().parse_code('def f(x):\n' + body, ['cfg'])['cfg'])
+    assert any(row['kind'] == 'collapsed' for row in rows)
+    assert len(rows) < 250
+
+
+def test_java_if_else():
+    edges = java_graph('    if (x > 0) {\n      a();\n    } else {\n      b();\n    }\n    return x;\n')
+    assert (('conditional', 3), ('block', 4), 'true') in edges
+    assert (('conditional', 3), ('block', 6), 'false') in edges
+
+
+def test_java_labeled_break_and_continue():
+    edges = java_graph('    outer:\n    for (int i = 0; i < x; i++) {\n      while (true) {\n'
+                       '        if (i > 0) continue outer;\n        break outer;\n      }\n    }\n'
+                       '    return 0;\n')
+    # The labeled loop's head is on the label's line
+    assert (('block', 6), ('loop', 3), 'continue') in edges
+    assert (('block', 7), ('block', 10), 'break') in edges
+    # The inner loop is infinite, so it never falls out
+    assert not any(source == ('loop', 5) and kind == 'false' for source, _, kind in edges)
+
+
+def test_java_do_while_tests_after_body():
+    edges = java_graph('    do {\n      x--;\n    } while (x > 0);\n    return x;\n')
+    kinds = {kind for _, _, kind in edges}
+    assert {'back', 'false'} <= kinds
+    body = [target for source, target, kind in edges if kind == 'back'][0]
+    assert (('entry', 2), body, '') in edges
+
+
+def test_java_switch_falls_through_until_break():
+    edges = java_graph('    switch (x) {\n      case 1:\n        a();\n      case 2:\n        b();\n'
+                       '        break;\n      default:\n        c();\n    }\n    return x;\n')
+    assert (('conditional', 3), ('block', 5), 'case') in edges
+    assert (('conditional', 3), ('block', 10), 'default') in edges
+    # case 1 falls into case 2, which breaks to the statement after the switch
+    assert (('block', 5), ('block', 7), '') in edges
+    assert (('block', 7), ('block', 12), 'break') in edges
+    assert not any(kind == 'false' for _, _, kind in edges)
+
+
+def test_java_try_catch():
+    edges = java_graph('    try {\n      a();\n    } catch (Exception e) {\n      return 1;\n    }\n'
+                       '    return 0;\n')
+    handler = [target for _, target, kind in edges if kind == 'except']
+    assert len(handler) == 1 and handler[0][0] == 'handler'
+    assert (handler[0], ('exit', 9), 'return') in edges
+
+
+@pytest.mark.parametrize('parser, code, function', [
+    (PythonCodeParser(), 'def f():\n    pass\n', 'f'),
+    (JavaCodeParser(), 'class A {\n  void f() {}\n}\n', 'A.f')
+])
+def test_empty_function_runs_from_entry_to_exit(parser, code, function):
+    edges = graph(parser, code, function)
+    kinds = {(source[0], target[0]) for source, target, _ in edges}
+    assert ('entry', 'block') in kinds
+    assert ('block', 'exit') in kinds
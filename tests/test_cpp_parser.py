@@ -0,0 +1,71 @@
+from utils.cpp_parser import CppCodeParser
+
+CODE = '''#include <vector>
+#include "local.h"
+namespace ns {
+class Tree : public Base {
+ public:
+  int size() const { return n; }
+ private:
+  int n = 0;
+};
+void Tree::rebalance() {
+  // if (comment) { call(); }
+  const char* s = "for (;;) { x(); }";
+  /* while (block) { comment(); } */
+  for (int i = 0; i < n; ++i) {
+    if (i > 2) helper(i);
+  }
+  while (n) n--;
+}
+}
+int main() { ns::Tree t; t.size(); return 0; }
+'''
+
+
+def parse(code=CODE, fields=None):
+    return {name: list(rows) for name, rows in CppCodeParser('scanner').parse_code(code, fields).items()}
+
+
+def test_functions_and_classes_with_scopes():
+    analysis = parse()
+    assert [(f['name'], f['scope'], f['line'], f['end_line']) for f in analysis['functions']] == [
+        ('size', 'Tree', 6, 6), ('rebalance', 'Tree', 10, 18), ('main', None, 20, 20)]
+    assert [(c['name'], c['scope'], c['line'], c['end_line']) for c in analysis['classes']] == [
+        ('Tree', 'ns', 4, 9)]
+    assert analysis['functions'][0]['return_type'] == 'int'
+
+
+def test_comments_and_strings_are_skipped():
+    analysis = parse()
+    assert [(loop['type'], loop['line']) for loop in analysis['loops']] == [('for', 14), ('while', 17)]
+    assert [row['line'] for row in analysis['conditionals']] == [15]
+    assert [(call['function'], call['line'], call['scope']) for call in analysis['calls']] == [
+        ('helper', 15, 'rebalance'), ('size', 20, 'main')]
+
+
+def test_includes_and_variables():
+    analysis = parse()
+    assert [(row['line'], row['header']) for row in analysis['includes']] == [(1, 'vector'), (2, 'local.h')]
+    assert [(v['name'], v['type'], v['scope']) for v in analysis['variables']] == [
+        ('n', 'int', 'Tree'), ('s', 'const char*', 'rebalance'), ('t', 'ns::Tree', 'main')]
+
+
+def test_structure_depths_follow_nesting():
+    structure = parse()['code_structure']
+    assert [(row['type'], row['depth'], row['line']) for row in structure] == [
+        ('TranslationUnit', 0, 0), ('Include', 1, 1), ('Include', 1, 2), ('Namespace', 1, 3),
+        ('Class', 2, 4), ('Function', 3, 6), ('Function', 2, 10), ('For', 3, 14), ('If', 4, 15),
+        ('While', 3, 17), ('Function', 1, 20)]
+
+
+def test_only_requested_fields_are_collected():
+    assert set(parse(fields=['calls'])) == {'calls'}
+
+
+def test_template_arguments_and_multiline_headers():
+    code = ('std::map<int, std::vector<int>> build(\n    int a,\n    int b) {\n'
+            '  return make(a, b);\n}\n')
+    functions = parse(code)['functions']
+    assert [(f['name'], f['line'], f['end_line']) for f in functions] == [('build', 1, 5)]
+    assert parse(code)['calls'][0]['function'] == 'make'
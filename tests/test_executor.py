@@ -0,0 +1,68 @@
+import os
+import time
+
+import pytest
+
+from utils.executor import (AnalysisExecutor, AnalysisMemoryError, AnalysisTimeout,
+                            AnalysisWorkerError)
+
+
+def pid():
+    return os.getpid()
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def allocate(size):
+    return len(bytearray(size))
+
+
+def fail():
+    raise ValueError('bad input')
+
+
+def count(n):
+    yield from range(n)
+
+
+@pytest.fixture(scope='module')
+def executor():
+    pool = AnalysisExecutor(1, timeout=2.0, memory_limit=256 * 1024 * 1024)
+    pool.wait_ready()
+    yield pool
+    pool.shutdown()
+
+
+def test_jobs_run_in_a_reused_worker(executor):
+    worker = executor.run(pid)
+    assert worker != os.getpid()
+    assert executor.run(pid) == worker
+
+
+def test_streamed_items_arrive_in_order(executor):
+    assert list(executor.stream(count, 4)) == [0, 1, 2, 3]
+
+
+def test_timeout_replaces_the_worker(executor):
+    worker = executor.run(pid)
+    with pytest.raises(AnalysisTimeout):
+        executor.run(sleep, 5)
+    assert executor.run(pid) != worker
+    assert executor.run(sleep, 0) == 0
+
+
+def test_memory_limit_replaces_the_worker(executor):
+    worker = executor.run(pid)
+    with pytest.raises(AnalysisMemoryError):
+        executor.run(allocate, 1024 * 1024 * 1024)
+    assert executor.run(pid) != worker
+
+
+def test_errors_keep_the_worker(executor):
+    worker = executor.run(pid)
+    with pytest.raises(AnalysisWorkerError, match='bad input'):
+        executor.run(fail)
+    assert executor.run(pid) == worker
@@ -0,0 +1,170 @@
+import pytest
+
+from utils.executor import AnalysisTimeout
+from utils.incremental import AnalysisSession, parse_segments, render_views
+
+CODE = 'def f():\n    return g()\n\ndef g():\n    return 1\n'
+
+
+def test_parsing_and_rendering_go_through_run():
+    calls = []
+
+    def run(fn, *args, **kwargs):
+        calls.append(fn)
+        return fn(*args, **kwargs)
+
+    session = AnalysisSession('python', CODE, output_format='json', views=['call_graph'], run=run)
+    assert calls == [parse_segments, render_views]
+    session.apply_edits([{'start': 5, 'text': '    return 2'}])
+    assert calls[2:] == [parse_segments, render_views]
+
+
+def test_failed_render_leaves_session_unchanged():
+    session = AnalysisSession('python', CODE, output_format='json', views=['call_graph'])
+
+    def run(fn, *args, **kwargs):
+        if fn is render_views:
+            raise AnalysisTimeout('Analysis exceeded 1s')
+        return fn(*args, **kwargs)
+
+    before = ([(segment.id, segment.start) for segment in session.segments],
+              list(session.merged_analysis()['functions']))
+    session.run = run
+    with pytest.raises(AnalysisTimeout):
+        session.apply_edits([{'start': 1, 'end': 0, 'text': 'import os\n'}])
+    assert session.version == 1
+    assert session.lines == CODE.split('\n')
+    assert ([(segment.id, segment.start) for segment in session.segments],
+            list(session.merged_analysis()['functions'])) == before
+
+
+@pytest.mark.parametrize('text', [1, ['x'], {'a': 1}])
+def test_edit_text_must_be_a_string(text):
+    session = AnalysisSession('python', CODE, output_format='json', views=[])
+    with pytest.raises(ValueError):
+        session.apply_edits([{'start': 1, 'text': text}])
+    assert session.version == 1
+
+
+def session(code=CODE, **options):
+    options.setdefault('views', [])
+    return AnalysisSession('python', code, output_format='json', **options)
+
+
+def function_lines(session):
+    return [(row['name'], row['line'], row['end_line']) for row in session.merged_analysis()['functions']]
+
+
+def test_initial_parse_is_split_into_top_level_segments():
+    current = session()
+    assert [(segment.start, segment.end) for segment in current.segments] == [(1, 3), (4, 6)]
+    assert function_lines(current) == [('f', 1, 2), ('g', 4, 5)]
+
+
+def test_edit_reparses_only_the_changed_segment():
+    current = session()
+    untouched = current.segments[0]
+    delta = current.apply_edits([{'start': 5, 'text': '    return 2'}])
+    assert delta['version'] == 2
+    assert delta['removed'] == [1]
+    assert [(item['start'], item['end']) for item in delta['added']] == [(4, 6)]
+    assert delta['moved'] == []
+    assert current.segments[0] is untouched
+    assert current.lines[4] == '    return 2'
+
+
+def test_insert_above_shifts_following_segments():
+    current = session()
+    delta = current.apply_edits([{'start': 1, 'end': 0, 'text': 'import os\n'}])
+    assert [(item['id'], item['shift']) for item in delta['moved']] == [(0, 2), (1, 2)]
+    assert [(item['start'], item['end']) for item in delta['added']] == [(1, 2)]
+    assert delta['removed'] == []
+    assert function_lines(current) == [('f', 3, 4), ('g', 6, 7)]
+
+
+def test_delete_removes_segment():
+    current = session()
+    delta = current.apply_edits([{'start': 4, 'end': 6}])
+    assert delta['removed'] == [1]
+    assert delta['added'] == [] and delta['moved'] == []
+    assert function_lines(current) == [('f', 1, 2)]
+
+
+def test_edits_apply_in_order():
+    current = session()
+    current.apply_edits([{'start': 1, 'end': 0, 'text': 'a = 1'}, {'start': 1, 'text': 'b = 2'}])
+    assert current.lines[0] == 'b = 2'
+
+
+def test_edit_outside_document_is_rejected():
+    current = session()
+    with pytest.raises(ValueError):
+        current.apply_edits([{'start': 20, 'text': 'x'}])
+    with pytest.raises(ValueError):
+        current.apply_edits([{'start': 3, 'end': 1, 'text': 'x'}])
+    assert current.version == 1
+
+
+def test_max_lines_is_enforced():
+    current = session(max_lines=7)
+    with pytest.raises(ValueError):
+        current.apply_edits([{'start': 1, 'end': 0, 'text': 'a\nb\nc'}])
+
+
+def test_only_views_with_changed_inputs_are_redrawn():
+    current = session(views=['call_graph', 'data_structures'])
+    assert set(current.initial_delta['visualization']) == {'call_graph', 'data_structures'}
+    delta = current.apply_edits([{'start': 5, 'text': '    return h()'}])
+    assert 'call_graph' in delta['visualization']
+    assert 'data_structures' not in delta['visualization']
+
+
+def test_syntax_error_stays_in_its_segment():
+    current = session()
+    delta = current.apply_edits([{'start': 5, 'text': '    return ('}])
+    assert [error['line'] for error in delta['errors']] == [4]
+    assert function_lines(current) == [('f', 1, 2)]
+    assert not current._whole_file
+
+
+# The splitter takes `except*` for the start of a new statement, so the
+# fragments fail to parse on their own while the whole file parses
+EXCEPT_STAR = 'x = 1\ntry:\n    pass\nexcept* ValueError:\n    pass\n'
+
+
+def test_whole_file_fallback_when_fragments_do_not_parse():
+    current = session(EXCEPT_STAR)
+    assert current._whole_file
+    assert [(segment.start, segment.end, segment.error) for segment in current.segments] == [(1, 6, None)]
+    assert current.initial_delta['errors'] == []
+
+
+def test_whole_file_mode_sticks_after_fallback():
+    current = session(EXCEPT_STAR)
+    previous = current.segments[0].id
+    delta = current.apply_edits([{'start': 1, 'end': 0, 'text': 'def h():\n    return 1'}])
+    assert delta['removed'] == [previous]
+    assert [(item['start'], item['end']) for item in delta['added']] == [(1, 8)]
+    assert function_lines(current) == [('h', 1, 2)]
+
+
+def test_fallback_switches_an_existing_session_to_whole_file():
+    current = session('x = 1\ntry:\n    pass\nexcept ValueError:\n    pass\n')
+    assert not current._whole_file
+    old = [segment.id for segment in current.segments]
+    delta = current.apply_edits([{'start': 4, 'text': 'except* ValueError:'}])
+    assert current._whole_file
+    assert sorted(delta['removed']) == sorted(old)
+    assert len(delta['added']) == 1 and delta['errors'] == []
+
+
+def test_java_segments_share_one_structure_root():
+    code = 'class A {\n  void f() {}\n}\n\nclass B {\n  void g() {}\n}\n'
+    current = AnalysisSession('java', code, output_format='json', views=[])
+    assert len(current.segments) == 2
+    structure = list(current.merged_analysis()['code_structure'])
+    assert [row['type'] for row in structure if row['depth'] == 0] == ['CompilationUnit']
+    current.apply_edits([{'start': 1, 'end': 0, 'text': 'class C {}\n'}])
+    structure = current.merged_analysis()['code_structure']
+    lines = {row['line'] for row in structure if row['type'] == 'MethodDeclaration'}
+    assert lines == {4, 8}
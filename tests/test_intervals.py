@@ -0,0 +1,57 @@
+from utils.intervals import IntervalIndex
+
+
+def owners(index, lines):
+    return [index.find(line) for line in lines]
+
+
+def test_nested_spans_resolve_to_innermost():
+    index = IntervalIndex([(1, 20, 'outer'), (3, 10, 'middle'), (5, 6, 'inner')])
+    assert owners(index, range(1, 12)) == ['outer', 'outer', 'middle', 'middle', 'inner', 'inner',
+                                          'middle', 'middle', 'middle', 'middle', 'outer']
+    assert index.find(20) == 'outer'
+
+
+def test_lines_outside_every_span_use_default():
+    index = IntervalIndex([(3, 5, 'a')])
+    assert index.find(2) is None
+    assert index.find(6, default='module') == 'module'
+
+
+def test_sibling_starting_on_shared_line():
+    index = IntervalIndex([(1, 10, 'a'), (3, 5, 'b'), (5, 8, 'c')])
+    assert owners(index, range(1, 11)) == ['a', 'a', 'b', 'b', 'c', 'c', 'c', 'c', 'a', 'a']
+
+
+def test_sibling_sharing_line_with_parent_end():
+    index = IntervalIndex([(1, 5, 'a'), (3, 5, 'b'), (5, 8, 'c')])
+    assert owners(index, range(1, 10)) == ['a', 'a', 'b', 'b', 'c', 'c', 'c', 'c', None]
+
+
+def test_single_line_span_on_last_line_nests():
+    index = IntervalIndex([(1, 10, 'a'), (3, 5, 'b'), (5, 5, 'c')])
+    assert owners(index, range(3, 8)) == ['b', 'b', 'c', 'a', 'a']
+
+
+def test_adjacent_siblings():
+    index = IntervalIndex([(1, 4, 'a'), (5, 8, 'b')])
+    assert owners(index, range(1, 10)) == ['a'] * 4 + ['b'] * 4 + [None]
+
+
+def test_unsorted_input():
+    spans = [(5, 8, 'c'), (1, 10, 'a'), (3, 5, 'b'), (12, 14, 'd')]
+    index = IntervalIndex(spans)
+    assert owners(index, range(1, 16)) == ['a', 'a', 'b', 'b', 'c', 'c', 'c', 'c', 'a', 'a',
+                                          None, 'd', 'd', 'd', None]
+
+
+def test_missing_and_overlapping_ends():
+    # No end covers the first line; an end past the parent is clipped to it
+    index = IntervalIndex([(1, 6, 'a'), (2, None, 'b'), (4, 9, 'c')])
+    assert owners(index, range(1, 9)) == ['a', 'b', 'a', 'c', 'c', 'c', None, None]
+
+
+def test_boundaries_are_sorted():
+    starts, owners_ = IntervalIndex([(5, 8, 'c'), (1, 10, 'a'), (3, 5, 'b')]).boundaries()
+    assert starts == sorted(starts)
+    assert owners_ == ['a', 'b', 'c', 'a', None]
@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import javalang
+
+from utils import java_parser
+from utils.java_parser import JavaCodeParser
+
+ANNOTATED = '''class A {
+    @Foo({1, 2})
+    void f(@Bar({3}) int y) {
+        int x = 1;
+    }
+    @Baz(x = {4}) int g() { return 1; }
+    abstract void h();
+    void k() {
+        new Runnable() { public void run(@Q({1}) int a) {
+            go();
+        } };
+    }
+}
+'''
+
+
+PROGRAM = '''import java.util.List;
+class Outer {
+    int size;
+    Outer(int size) { this.size = size; }
+    void walk(List<String> items) {
+        for (int i = 0; i < size; i++) {
+            if (i > 1) { log(items.get(i)); }
+        }
+        while (size > 0) { size--; }
+    }
+    static class Inner {
+        String name() { return helper(); }
+    }
+}
+'''
+
+
+def spans(analysis):
+    return [(f['name'], f['line'], f['end_line']) for f in analysis['functions']]
+
+
+def test_end_line_skips_braces_in_annotations():
+    expected = [('f', 3, 5), ('g', 6, 6), ('h', 7, 7), ('k', 8, 12), ('run', 9, 11)]
+    assert spans(JavaCodeParser().parse_code(ANNOTATED, ['functions'])) == expected
+    assert spans(JavaCodeParser()._scanned('annotated', ANNOTATED, ['functions'])) == expected
+
+
+def test_shared_parser_is_reentrant():
+    sources = [f'class C{n} {{\n' + ''.join(f'    void m{i}() {{ call{i}(); }}\n' for i in range(n)) + '}\n'
+               for n in range(1, 30)]
+    parser = JavaCodeParser()
+    # Analyzed from the cached trees, so the threads only contend on the walk
+    expected = [spans(parser.parse_code(code)) for code in sources]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(5):
+            assert [spans(result) for result in pool.map(parser.parse_code, sources)] == expected
+    assert not hasattr(parser, 'analysis')
+
+
+def test_cfg_uses_method_end():
+    rows = JavaCodeParser().parse_code(ANNOTATED, ['cfg'])['cfg']
+    exits = {row['function']: row['line'] for row in rows if row['kind'] == 'exit'}
+    assert exits['A.f'] == 5
+
+
+def test_tree_walk_collects_every_category():
+    analysis = JavaCodeParser().parse_code(PROGRAM)
+    assert [(f['name'], f['scope'], f['line'], f['end_line'], f['return_type']) for f in analysis['functions']] == [
+        ('Outer', 'Outer', 4, 4, 'void'), ('walk', 'Outer', 5, 10, 'void'),
+        ('name', 'Outer.Inner', 12, 12, 'String')]
+    assert analysis['functions'][1]['parameters'] == [{'type': 'List', 'name': 'items'}]
+    assert [(c['name'], c['methods']) for c in analysis['classes']] == [
+        ('Outer', ['walk']), ('Inner', ['name'])]
+    assert [(loop['type'], loop['line']) for loop in analysis['loops']] == [('for', 6), ('while', 9)]
+    assert [c['line'] for c in analysis['conditionals']] == [7]
+    assert [(c['function'], c['line']) for c in analysis['calls']] == [('log', 7), ('get', 7), ('helper', 12)]
+    assert [i['module'] for i in analysis['imports']] == ['java.util.List']
+    structure = analysis['code_structure']
+    assert structure[0]['type'] == 'CompilationUnit' and structure[0]['depth'] == 0
+
+
+def test_parsed_sources_are_cached(monkeypatch):
+    code = PROGRAM.replace('Outer', 'Cached')
+    parser = JavaCodeParser()
+    expected = spans(parser.parse_code(code))
+    hits = java_parser._parsed.hits
+    # Later requests for the same source, whatever their fields, are not tokenized again
+    monkeypatch.setattr(javalang.tokenizer, 'tokenize', None)
+    assert spans(parser.parse_code(code, ['functions'])) == expected
+    assert 'loops' in parser.parse_code(code, ['loops'])
+    assert java_parser._parsed.hits == hits + 2
+
+
+def test_parse_errors_are_cached_too():
+    parser = JavaCodeParser()
+    first = parser.parse_code('class Broken {')
+    assert first['error'].startswith('Parse error')
+    assert parser.parse_code('class Broken {') == first
+
+
+def test_scanner_matches_the_tree_walk(monkeypatch):
+    fields = sorted(java_parser.SCANNED_FIELDS)
+    parsed = JavaCodeParser().parse_code(PROGRAM, fields)
+    monkeypatch.setattr(java_parser, 'FAST_PATH_LINES', 1)
+    scanned = JavaCodeParser().parse_code(PROGRAM, fields)
+    for field in fields:
+        key = 'function' if field == 'calls' else 'line'
+        assert sorted(scanned[field], key=lambda row: (row['line'], row[key])) == \
+            sorted(parsed[field], key=lambda row: (row['line'], row[key])), field
+
+
+def test_scanner_is_only_used_for_its_fields(monkeypatch):
+    monkeypatch.setattr(java_parser, 'FAST_PATH_LINES', 1)
+    analysis = JavaCodeParser().parse_code(PROGRAM, ['functions', 'variables'])
+    assert [v['name'] for v in analysis['variables']] == ['i']
+
+
+def test_scanned_results_are_copies(monkeypatch):
+    monkeypatch.setattr(java_parser, 'FAST_PATH_LINES', 1)
+    first = JavaCodeParser().parse_code(PROGRAM, ['loops'])
+    first['loops'].shift('line', 100)
+    assert [row['line'] for row in JavaCodeParser().parse_code(PROGRAM, ['loops'])['loops']] == [6, 9]
@@ -0,0 +1,58 @@
+import json
+import threading
+
+from utils.jobs import Job, JobManager, encode_event
+
+
+def test_encode_event_splices_serialized_data():
+    assert json.loads(encode_event('view', b'{"nodes":[]}', name='call_graph')) == {
+        'event': 'view', 'name': 'call_graph', 'data': {'nodes': []}}
+    assert encode_event('done') == b'{"event":"done"}'
+
+
+def test_events_are_replayed_then_followed():
+    job = Job('a')
+    job.publish(b'1')
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(job.iter_events(heartbeat=5)))
+    reader.start()
+    job.publish(b'2')
+    job.publish(b'3', final=True)
+    reader.join(5)
+    assert received == [b'1', b'2', b'3']
+    # Late readers get the whole history
+    assert list(job.iter_events()) == [b'1', b'2', b'3']
+    assert job.status() == {'id': 'a', 'done': True, 'events': 3}
+
+
+def test_heartbeat_while_waiting():
+    job = Job('a')
+    events = job.iter_events(heartbeat=0.01)
+    assert next(events) is None
+    job.publish(b'x', final=True)
+    assert list(events) == [b'x']
+
+
+def test_failed_jobs_end_with_an_error_event():
+    manager = JobManager(max_workers=1)
+
+    def run(job):
+        job.publish(encode_event('analysis', b'{}'))
+        raise RuntimeError('boom')
+
+    job = manager.submit(run)
+    events = [json.loads(event) for event in job.iter_events(heartbeat=5)]
+    assert events == [{'event': 'analysis', 'data': {}},
+                      {'event': 'error', 'error': 'boom', 'status': 500}]
+    assert manager.get(job.id) is job
+
+
+def test_finished_jobs_are_dropped_when_the_table_is_full():
+    manager = JobManager(max_workers=1, max_jobs=2)
+    first = manager.submit(lambda job: None)
+    list(first.iter_events(heartbeat=5))
+    second = manager.submit(lambda job: None)
+    list(second.iter_events(heartbeat=5))
+    manager.submit(lambda job: None)
+    assert manager.get(first.id) is None
+    assert manager.get(second.id) is second
@@ -0,0 +1,62 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from utils.layout import choose_strategy, compute_layout, layout_cache_stats
+
+
+def test_strategy_follows_graph_shape():
+    assert choose_strategy(nx.balanced_tree(2, 3, create_using=nx.DiGraph)) == 'tree'
+    assert choose_strategy(nx.DiGraph([(0, 1), (0, 2), (1, 3), (2, 3)])) == 'layered'
+    assert choose_strategy(nx.DiGraph([(0, 1), (1, 0)])) == 'force'
+    assert choose_strategy(nx.path_graph(3)) == 'force'
+
+
+def test_tree_centers_parents_over_children():
+    G = nx.DiGraph([('root', 'a'), ('root', 'b'), ('a', 'c'), ('a', 'd')])
+    pos = compute_layout(G, 'tree')
+    assert [pos[node][1] for node in ('root', 'a', 'c')] == [0.0, -1.0, -2.0]
+    assert pos['a'][0] == (pos['c'][0] + pos['d'][0]) / 2
+    assert pos['root'][0] == (pos['a'][0] + pos['b'][0]) / 2
+    # Leaves never overlap
+    assert len({pos[leaf] for leaf in ('b', 'c', 'd')}) == 3
+
+
+def test_tree_strategy_falls_back_to_layers():
+    G = nx.DiGraph([(0, 1), (0, 2), (1, 3), (2, 3)])
+    assert compute_layout(G, 'tree') == compute_layout(G, 'layered')
+
+
+def test_layered_edges_point_down_and_cycles_share_a_layer():
+    G = nx.DiGraph([('main', 'a'), ('a', 'b'), ('b', 'a'), ('b', 'c')])
+    pos = compute_layout(G, 'layered')
+    assert pos['main'][1] > pos['a'][1] > pos['c'][1]
+    assert pos['a'][1] == pos['b'][1] and pos['a'][0] != pos['b'][0]
+
+
+@pytest.mark.parametrize('n', [40, 600])
+def test_force_layout_is_seeded(n):
+    G = nx.gnm_random_graph(n, 2 * n, seed=1)
+    pos = compute_layout(G, 'force')
+    xy = np.array([pos[node] for node in G.nodes()])
+    assert np.isfinite(xy).all()
+    assert len({tuple(p) for p in xy}) == n
+    G2 = nx.Graph()
+    G2.add_nodes_from(G.nodes())
+    G2.add_edges_from(G.edges())
+    assert compute_layout(G2, 'force') == pos
+    assert compute_layout(G, 'force', seed=7) != pos
+
+
+def test_layouts_are_cached_by_fingerprint():
+    G = nx.DiGraph([('x', 'y'), ('y', 'z')])
+    first = compute_layout(G)
+    hits = layout_cache_stats()['hits']
+    assert compute_layout(nx.DiGraph([('x', 'y'), ('y', 'z')])) is first
+    assert layout_cache_stats()['hits'] == hits + 1
+
+
+def test_empty_graph_and_unknown_strategy():
+    assert compute_layout(nx.DiGraph()) == {}
+    with pytest.raises(ValueError):
+        compute_layout(nx.DiGraph([(0, 1)]), 'circular')
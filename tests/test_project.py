@@ -0,0 +1,96 @@
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from utils import project
+from utils.project import ProjectGraph
+
+FILES = {
+    'pkg/a.py': 'from pkg import b\ndef f():\n    b.g()\n    g()\n',
+    'pkg/b.py': 'def g():\n    pass\n',
+    'src/com/x/Main.java': 'package com.x;\nimport com.x.util.Helper;\nclass Main {\n'
+                           '  void run() { help(); }\n}\n',
+    'src/com/x/util/Helper.java': 'package com.x.util;\nclass Helper {\n  static void help() {}\n}\n',
+    'net/socket.cpp': '#include "socket.h"\nvoid open() { connect(); }\n',
+    'net/socket.h': 'void connect();\n',
+    'README.md': '# not source\n'
+}
+
+
+def zip_archive(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for path, code in files.items():
+            archive.writestr(path, code)
+    buffer.seek(0)
+    return buffer
+
+
+def tar_archive(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for path, code in files.items():
+            info = tarfile.TarInfo(path)
+            info.size = len(code.encode())
+            archive.addfile(info, io.BytesIO(code.encode()))
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize('build', [zip_archive, tar_archive])
+def test_archives_yield_source_files_only(build):
+    files = dict(FILES, **{'../escape.py': 'x = 1\n', 'big.py': '#' * 100})
+    members = dict(project.iter_archive(build(files), max_file_bytes=80))
+    assert set(members) == {path for path in FILES if path != 'README.md'} | {'big.py'}
+    assert members['pkg/b.py'] == FILES['pkg/b.py']
+    # Oversized files are reported without being read
+    assert members['big.py'] is None
+
+
+def test_file_lists_clean_paths():
+    files = [{'path': '/pkg/./b.py', 'code': 'x = 1'}, {'path': '../up.py', 'code': ''},
+             {'path': 'notes.txt', 'code': ''}, {'path': 'n.py', 'code': 5}]
+    assert list(project.iter_file_list(files, 100)) == [('pkg/b.py', 'x = 1')]
+
+
+def summaries():
+    results = project.analyze_files(sorted((path, code) for path, code in FILES.items()
+                                           if project.language_for(path)))
+    return {path: summary for path, _, _, summary in results}
+
+
+def test_dependencies_across_languages():
+    graph = ProjectGraph()
+    for summary in summaries().values():
+        graph.add(summary)
+    dependencies = graph.dependencies()
+    assert dependencies['pkg/a.py'] == ['pkg/b.py']
+    assert dependencies['src/com/x/Main.java'] == ['src/com/x/util/Helper.java']
+    assert dependencies['net/socket.cpp'] == ['net/socket.h']
+
+
+def test_calls_bind_to_definitions_in_dependencies():
+    graph = ProjectGraph()
+    for summary in summaries().values():
+        graph.add(summary)
+    edges = set(graph.call_graph().edges())
+    assert ('pkg/a.py:f', 'pkg/b.py:g') in edges
+    assert ('src/com/x/Main.java:Main.run', 'src/com/x/util/Helper.java:Helper.help') in edges
+
+
+def test_iter_project_batches_and_reports_skipped_files():
+    files = [('a.py', 'def f():\n    pass\n'), ('big.py', None), ('b.py', 'def g(:\n')]
+    events = list(project.iter_project(files, lambda fn, *args: fn(*args), workers=2, batch_files=1))
+    assert ('skipped', 'big.py') in events
+    results = {result[0]: result for kind, result in events if kind == 'file'}
+    assert json.loads(results['a.py'][2])['functions'][0]['name'] == 'f'
+    assert results['b.py'][2] is None and 'error' in results['b.py'][3]
+
+
+def test_render_project():
+    body = json.loads(project.render_project(summaries()))
+    assert body['files'] == 6
+    assert {'source': 'pkg/a.py', 'target': 'pkg/b.py'} in body['dependency_graph']['edges']
@@ -0,0 +1,57 @@
+import ast
+
+from utils.python_parser import PythonCodeParser
+from utils.source import SourceSpan
+
+CODE = '''import os
+from a import b, c
+
+class Node:
+    def walk(self, n):
+        for x in range(n):
+            if x:
+                print(x)
+        total = 0
+        return total
+'''
+
+
+def test_categories_from_one_pass():
+    analysis = PythonCodeParser().parse_code(CODE)
+    assert [(f['name'], f['scope'], f['line'], f['end_line'], f['args'])
+            for f in analysis['functions']] == [('walk', 'Node', 5, 10, ['self', 'n'])]
+    assert list(analysis['classes']) == [{'name': 'Node', 'line': 4, 'methods': ['walk']}]
+    assert list(analysis['variables']) == [{'name': 'total', 'line': 9, 'value': '0'}]
+    assert [(loop['type'], loop['line']) for loop in analysis['loops']] == [('for', 6)]
+    assert [(c['line'], c['test']) for c in analysis['conditionals']] == [(7, 'x')]
+    assert [(c['function'], c['line']) for c in analysis['calls']] == [('range', 6), ('print', 8)]
+    assert [(i['module'], i['names']) for i in analysis['imports']] == [('', ['os']), ('a', ['b', 'c'])]
+
+
+def test_only_requested_fields_are_collected():
+    assert list(PythonCodeParser().parse_code(CODE, ['loops', 'calls'])) == ['loops', 'calls']
+
+
+def test_structure_is_a_preorder_walk_with_depths():
+    structure = PythonCodeParser().parse_code(CODE, ['code_structure'])['code_structure']
+    assert len(structure) == sum(1 for _ in ast.walk(ast.parse(CODE)))
+    assert structure.column('type')[:8] == [
+        'Module', 'Import', 'alias', 'ImportFrom', 'alias', 'alias', 'ClassDef', 'FunctionDef']
+    assert list(structure.column('depth')[:8]) == [0, 1, 2, 1, 2, 2, 1, 2]
+
+
+def test_node_code_is_shared_with_the_source():
+    analysis = PythonCodeParser().parse_code(CODE, ['code_structure', 'functions'])
+    rows = list(analysis['code_structure'])
+    # Nodes on one line share that line's string; longer ones are lazy spans
+    assert rows[1]['code'] is rows[2]['code'] == 'import os'
+    body = analysis['functions'][0]['body']
+    assert isinstance(body, SourceSpan) and (body.start, body.end) == (5, 10)
+    assert str(body) == '\n'.join(CODE.split('\n')[4:10])
+
+
+def test_deeply_nested_code_is_analyzed():
+    code = 'def f():\n' + ''.join('    ' * (i + 1) + 'if x:\n' for i in range(90)) + '    ' * 91 + 'pass\n'
+    analysis = PythonCodeParser().parse_code(code, ['conditionals', 'code_structure'])
+    assert len(analysis['conditionals']) == 90
+    assert max(analysis['code_structure'].column('depth')) > 90
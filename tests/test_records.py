@@ -0,0 +1,67 @@
+import json
+import sys
+from array import array
+
+from utils import records
+from utils.records import RecordTable
+
+
+def table():
+    rows = RecordTable(('name', 'line', 'args'))
+    rows.append({'name': ''.join(['wa', 'lk']), 'line': 3, 'args': ['self']})
+    rows.append({'name': 'run', 'args': []})
+    return rows
+
+
+def test_rows_are_built_on_iteration():
+    rows = table()
+    assert len(rows) == 2
+    assert list(rows) == [{'name': 'walk', 'line': 3, 'args': ['self']},
+                          {'name': 'run', 'line': 0, 'args': []}]
+    assert rows[1] == {'name': 'run', 'line': 0, 'args': []}
+    assert rows == list(rows)
+
+
+def test_int_columns_are_arrays_and_names_interned():
+    rows = table()
+    assert isinstance(rows.column('line'), array)
+    assert rows.column('name')[0] is sys.intern('walk')
+
+
+def test_slices_extend_and_shift():
+    rows = table()
+    copy = rows[:]
+    copy.shift('line', 10)
+    assert list(rows.column('line')) == [3, 0]
+    # Missing lines stay 0 when shifted
+    assert list(copy.column('line')) == [13, 0]
+    copy.extend(rows)
+    assert len(copy) == 4 and copy[2]['line'] == 3
+    assert copy.drop({'args'}).names == ('name', 'line')
+
+
+def test_columnar_wire_format():
+    analysis = {'functions': table(), 'loops': [{'type': 'for', 'line': 1}, {'line': 2}],
+                'summary': {'lines': 4}}
+    assert records.columnar(analysis) == {
+        'functions': {'name': ['walk', 'run'], 'line': [3, 0], 'args': [['self'], []]},
+        'loops': {'type': ['for', None], 'line': [1, 2]},
+        'summary': {'lines': 4}
+    }
+    assert records.columnar({'error': 'bad'}) == {'error': 'bad'}
+
+
+def test_columns_encoding_is_smaller_on_large_inputs():
+    import app as server
+    server.app.config['ANALYSIS_WORKERS'] = 0
+    client = server.app.test_client()
+    code = ''.join(f'def f{i}(x):\n    for y in x:\n        g{i}(y)\n' for i in range(300))
+    sizes = {}
+    for encoding in ('json', 'columns'):
+        response = client.post('/analyze', json={'code': code, 'format': 'json', 'encoding': encoding,
+                                                 'views': ['call_graph']})
+        assert response.status_code == 200
+        sizes[encoding] = len(response.data)
+        functions = json.loads(response.data)['analysis']['functions']
+        assert len(functions if encoding == 'json' else functions['name']) == 300
+    assert sizes['columns'] < sizes['json'] * 0.8
@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import networkx as nx
+
+from utils import renderers, visualizer
+from utils.python_parser import PythonCodeParser
+from utils.visualizer import CodeVisualizer
+
+CODE = '''def a(x):
+    for i in range(x):
+        if i:
+            b(i)
+
+def b(y):
+    return a(y - 1)
+'''
+
+
+def graph(n):
+    G = nx.DiGraph()
+    for i in range(n):
+        G.add_node(i, label=f'n{i}', type='function' if i % 2 else 'loop')
+        if i:
+            G.add_edge(i - 1, i)
+    return G, {i: (float(i % 3), float(i // 3)) for i in range(n)}
+
+
+def test_concurrent_renders_match_serial_ones():
+    graphs = [graph(n) for n in range(2, 10)]
+    expected = [renderers.graph_to_png(G, pos) for G, pos in graphs]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for _ in range(3):
+            assert list(pool.map(lambda args: renderers.graph_to_png(*args), graphs)) == expected
+
+
+def test_each_thread_reuses_its_own_figure():
+    figure = renderers._figure()
+    assert renderers._figure() is figure
+    other = []
+    thread = threading.Thread(target=lambda: other.append(renderers._figure()))
+    thread.start()
+    thread.join()
+    assert other[0] is not figure
+    # Figures are cleared after each render
+    renderers.graph_to_png(*graph(3))
+    assert not figure.axes
+
+
+def test_threaded_views_match_serial_views(monkeypatch):
+    analysis = PythonCodeParser().parse_code(CODE)
+    monkeypatch.setattr(visualizer, 'RENDER_THREADS', 0)
+    serial = list(CodeVisualizer('png').iter_visualization(analysis, 'python'))
+    monkeypatch.setattr(visualizer, 'RENDER_THREADS', 3)
+    threaded = list(CodeVisualizer('png').iter_visualization(analysis, 'python'))
+    assert threaded == serial
+    costs = [visualizer.VIEWS[name].cost for name, _ in threaded]
+    assert costs == sorted(costs)
@@ -0,0 +1,62 @@
+import base64
+import os
+import subprocess
+import sys
+
+import networkx as nx
+import pytest
+
+from utils import renderers
+from utils.visualizer import CodeVisualizer
+
+
+def graph():
+    G = nx.DiGraph()
+    G.add_node('f', label='f()', type='function')
+    G.add_node('g', label='g<T>', type='loop')
+    G.add_edge('f', 'g', label='call')
+    return G, {'f': (0.0, 0.0), 'g': (2.0, 4.0)}
+
+
+def test_json_has_nodes_edges_and_unit_positions():
+    data = renderers.graph_to_json(*graph())
+    assert data['directed'] is True
+    assert data['nodes'] == [
+        {'id': 'f', 'label': 'f()', 'type': 'function', 'x': 0.0, 'y': 1.0},
+        {'id': 'g', 'label': 'g<T>', 'type': 'loop', 'x': 1.0, 'y': 0.0}
+    ]
+    assert data['edges'] == [{'source': 'f', 'target': 'g', 'label': 'call'}]
+
+
+def test_svg_is_a_data_uri_with_escaped_labels():
+    uri = renderers.graph_to_svg(*graph())
+    prefix = 'data:image/svg+xml;base64,'
+    assert uri.startswith(prefix)
+    svg = base64.b64decode(uri[len(prefix):]).decode()
+    assert svg.startswith('<svg') and svg.endswith('</svg>')
+    assert svg.count('<circle') == 2 and svg.count('<line') == 1
+    assert 'g&lt;T&gt;' in svg and renderers.NODE_COLORS['loop'] in svg
+
+
+def test_svg_and_json_do_not_load_matplotlib():
+    code = ('import sys, networkx as nx\n'
+            'from utils.visualizer import CodeVisualizer\n'
+            'from utils.python_parser import PythonCodeParser\n'
+            'analysis = PythonCodeParser().parse_code("def f():\\n    g()\\n")\n'
+            'for output_format in ("svg", "json"):\n'
+            '    CodeVisualizer(output_format).generate_visualization(analysis, "python")\n'
+            'assert "matplotlib" not in sys.modules\n')
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_png_is_the_default_format():
+    assert CodeVisualizer().output_format == 'png'
+    G, pos = graph()
+    assert renderers.graph_to_png(G, pos).startswith('data:image/png;base64,')
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        CodeVisualizer('gif')
+
@@ -0,0 +1,100 @@
+import pytest
+
+from utils import store
+from utils.python_parser import PythonCodeParser
+from utils.store import AnalysisStore
+
+SMALL = 'def helper():\n    return 1\n'
+LARGE = ('class Walker:\n    def walk(self, xs):\n        for x in xs:\n            if x:\n'
+         '                helper(x)\n        return xs\n')
+
+
+def summary(code):
+    return store.summarize(code, PythonCodeParser().parse_code(code, ['functions', 'classes', 'calls']))
+
+
+def record(target, code, language='python'):
+    target.record(store.digest(language, code), language, summary(code))
+
+
+@pytest.fixture
+def analyses(tmp_path):
+    target = AnalysisStore(str(tmp_path / 'store.db'), version='1', flush_interval=0.01)
+    yield target
+    target.close()
+
+
+def test_records_are_batched_and_queried(analyses):
+    record(analyses, SMALL)
+    record(analyses, LARGE)
+    analyses.flush()
+    assert analyses.written == 2
+    assert [s['lines'] for s in analyses.snippets(calls='helper')] == [7]
+    assert [s['lines'] for s in analyses.snippets(function='helper')] == [3]
+    assert len(analyses.snippets(class_name='Walker', language='python')) == 1
+    assert analyses.snippets(language='java') == []
+    assert [(f['name'], f['scope'], f['length']) for f in analyses.functions()] == [
+        ('walk', 'Walker', 5), ('helper', '', 2)]
+    assert [f['name'] for f in analyses.functions(order='complexity', limit=1)] == ['walk']
+    with pytest.raises(ValueError):
+        analyses.functions(order='name')
+
+
+def test_snippet_details(analyses):
+    record(analyses, LARGE)
+    analyses.flush()
+    snippet = analyses.snippet(store.digest('python', LARGE))
+    assert snippet['calls'] == [{'caller': 'Walker.walk', 'function': 'helper', 'line': 5}]
+    assert snippet['classes'] == [{'name': 'Walker', 'line': 1}]
+    assert analyses.snippet('missing') is None
+
+
+def test_repeated_submissions_are_counted_once(analyses):
+    key = store.digest('python', SMALL)
+    assert not analyses.contains(key)
+    record(analyses, SMALL)
+    analyses.record(key, 'python')
+    analyses.flush()
+    assert analyses.contains(key)
+    assert analyses.snippet(key)['submissions'] == 2
+    assert len(analyses.snippet(key)['functions']) == 1
+
+
+def test_store_persists_and_resummarizes_new_versions(tmp_path):
+    path = str(tmp_path / 'store.db')
+    key = store.digest('python', SMALL)
+    first = AnalysisStore(path, version='1')
+    record(first, SMALL)
+    first.close()
+
+    reopened = AnalysisStore(path, version='1')
+    assert reopened.contains(key)
+    reopened.close()
+    upgraded = AnalysisStore(path, version='2')
+    assert not upgraded.contains(key)
+    record(upgraded, SMALL)
+    upgraded.flush()
+    snippet = upgraded.snippet(key)
+    assert (snippet['version'], snippet['submissions'], len(snippet['functions'])) == ('2', 2, 1)
+    upgraded.close()
+
+
+def test_full_queue_drops_records(tmp_path):
+    target = AnalysisStore(str(tmp_path / 'store.db'), max_pending=1)
+    # Stands in for a writer that has fallen behind, so nothing drains the queue
+    target._writer = object()
+    target.record('a', 'python')
+    target.record('b', 'python')
+    assert target.dropped == 1
+
+
+@pytest.mark.parametrize('sql, index', [
+    ('SELECT snippet FROM calls WHERE function = ?', 'calls_function'),
+    ('SELECT * FROM functions ORDER BY length DESC LIMIT 5', 'functions_length'),
+    ('SELECT * FROM functions WHERE language = ? ORDER BY complexity DESC LIMIT 5',
+     'functions_language_complexity')
+])
+def test_queries_use_indexes(analyses, sql, index):
+    plan = ' '.join(row[-1] for row in analyses._reader.execute(
+        'EXPLAIN QUERY PLAN ' + sql, ('x',) * sql.count('?')))
+    assert index in plan
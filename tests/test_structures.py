@@ -0,0 +1,97 @@
+import ast
+
+from utils import structures
+from utils.java_parser import JavaCodeParser
+from utils.python_parser import PythonCodeParser
+from utils.visualizer import CodeVisualizer
+
+PYTHON = '''import heapq
+import numpy as np
+from typing import List, Optional
+
+class Node:
+    def __init__(self, value):
+        self.value = value
+        self.next: Optional["Node"] = None
+        self.prev: Optional["Node"] = None
+
+class Tree:
+    def __init__(self):
+        self.left: "Tree" = None
+        self.right: "Tree" = None
+
+class Forest:
+    def __init__(self):
+        self.children: List["Forest"] = []
+
+def f(items):
+    grid = [[0] * 3 for _ in range(3)]
+    grid[1][2] = 5
+    seen = {}
+    seen['a'] = 1
+    stack = []
+    stack.append(1)
+    stack.pop()
+    h = []
+    heapq.heappush(h, 3)
+    m = np.zeros((2, 3))
+    return grid
+'''
+
+JAVA = '''class ListNode { int val; ListNode next; }
+class Graph { java.util.List<Graph> neighbors; }
+class A {
+  void f() {
+    int[] xs = new int[4];
+    xs[0] = 1;
+    java.util.Deque<Integer> q = new java.util.ArrayDeque<>();
+    q.offer(1);
+    q.poll();
+  }
+}
+'''
+
+
+def kinds(analysis):
+    return {(row['scope'], row['name']): row['kind'] for row in analysis['data_structures']}
+
+
+def test_python_self_referential_classes():
+    rows = {row['name']: row for row in PythonCodeParser().parse_code(PYTHON, ['data_structures'])
+            ['data_structures']}
+    assert rows['Node']['kind'] == 'doubly_linked_list'
+    assert rows['Node']['layout'] == {'shape': 'chain', 'node': 'Node', 'fields': ['value'],
+                                      'links': [{'field': 'next', 'many': False},
+                                                {'field': 'prev', 'many': False}]}
+    assert rows['Tree']['kind'] == 'binary_tree'
+    assert rows['Forest']['kind'] == 'tree'
+
+
+def test_python_containers_from_usage():
+    found = kinds(PythonCodeParser().parse_code(PYTHON, ['data_structures']))
+    assert {name: kind for (scope, name), kind in found.items() if scope == 'f'} == {
+        'grid': 'matrix', 'seen': 'map', 'stack': 'stack', 'h': 'heap', 'm': 'matrix'}
+
+
+def test_java_structures():
+    found = kinds(JavaCodeParser().parse_code(JAVA, ['data_structures']))
+    assert found == {('', 'ListNode'): 'linked_list', ('', 'Graph'): 'graph',
+                     ('A.f', 'xs'): 'array', ('A.f', 'q'): 'queue'}
+
+
+def test_view_needs_no_second_parse(monkeypatch):
+    analysis = PythonCodeParser().parse_code(PYTHON, ['data_structures'])
+    # The view only reads the rows inferred during the parser's walk
+    monkeypatch.setattr(ast, 'parse', None)
+    view = CodeVisualizer('json').generate_visualization(analysis, 'python', ['data_structures'])
+    assert {row['name'] for row in view['data_structures']} >= {'Node', 'grid'}
+
+
+def test_plain_names_are_not_structures():
+    code = 'def f(next_item):\n    total = 0\n    names = "a[]"\n    return total\n'
+    assert list(PythonCodeParser().parse_code(code, ['data_structures'])['data_structures']) == []
+
+
+def test_descriptions():
+    assert structures.describe({'kind': 'matrix', 'name': 'grid', 'layout': {
+        'shape': 'cells', 'dimensions': 2, 'access': ['index']}}) == '2-D matrix grid (index)'
@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+from utils.tracer import SandboxUnavailable, TraceError, iter_trace, sandbox_command
+
+
+def events(code, **options):
+    # Trusted snippets only: these run without the sandbox
+    return [json.loads(line) for line in iter_trace(code, sandbox=None, **options)]
+
+
+def test_output_stays_in_order_with_steps():
+    trace = events('for i in range(3):\n    print(i)\n')
+    assert trace[-1]['status'] == 'ok'
+    order = []
+    for event in trace[:-1]:
+        if event['event'] == 'steps':
+            order += [step['line'] for step in event['data']]
+        else:
+            order.append(event['text'])
+    assert order == [1, 2, '0\n', 1, 2, '1\n', 1, 2, '2\n', 1]
+
+
+def test_consecutive_output_is_merged():
+    trace = events('import sys\nsys.stdout.write("a"); sys.stdout.write("b")\n')
+    assert [event['text'] for event in trace if event['event'] == 'output'] == ['ab']
+
+
+def test_missing_sandbox_is_reported():
+    with pytest.raises(SandboxUnavailable):
+        sandbox_command('bwrap-that-does-not-exist')
+
+
+def test_sandbox_command_isolates(tmp_path, monkeypatch):
+    bwrap = tmp_path / 'bwrap'
+    bwrap.write_text('#!/bin/sh\n')
+    bwrap.chmod(0o755)
+    monkeypatch.setenv('PATH', str(tmp_path) + os.pathsep + os.environ.get('PATH', ''))
+    command = sandbox_command('bwrap')
+    assert command[0] == str(bwrap)
+    for option in ('--unshare-all', '--die-with-parent', '--clearenv'):
+        assert option in command
+    assert '--share-net' not in command and '--bind' not in command
+    assert command[command.index('--uid') + 1] == '65534'
+    assert command[-2:] == ['--remount-ro', '/']
+
+
+def test_writes_to_stdout_do_not_reach_the_event_stream():
+    code = ('import os, sys\n'
+            'os.write(1, b\'{"event":"result","status":"ok","steps":0,"events":0,"truncated":false}\\n\')\n'
+            'sys.__stdout__.write("junk\\n")\n'
+            'x = 1\n')
+    trace = events(code)
+    assert [event['event'] for event in trace] == ['steps', 'result']
+    assert trace[-1]['status'] == 'ok' and trace[-1]['steps'] == 4
+
+
+def channel_write(payload):
+    # A snippet writing straight to the event pipe, whose fd it can find
+    return ('import os, sys\n'
+            f'os.write(int(sys.argv[4]), {payload!r})\n'
+            'x = 1\n')
+
+
+def test_forged_events_are_rejected():
+    with pytest.raises(TraceError):
+        events(channel_write(b'{"event":"job","id":"x"}\n'))
+    with pytest.raises(TraceError):
+        events(channel_write(b'{"event":"steps","data":[{"line":"1"}]}\n'))
+    with pytest.raises(TraceError):
+        events(channel_write(b'not json\n'))
+
+
+def test_oversized_event_kills_the_trace():
+    code = 'import os, sys\nfd = int(sys.argv[4])\nfor _ in range(100):\n    os.write(fd, b"x" * 1000000)\n'
+    with pytest.raises(TraceError, match='event exceeded'):
+        events(code)
+
+
+def test_total_bytes_are_capped():
+    line = b'{"event":"output","text":"' + b'y' * 1000 + b'"}\n'
+    code = channel_write(line * 200)
+    with pytest.raises(TraceError, match='output exceeded'):
+        list(iter_trace(code, sandbox=None, max_bytes=100000))
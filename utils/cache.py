@@ -0,0 +1,234 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+_KEY = re.compile(r'[0-9a-f]{64}')
+# The disk tier only ever creates or deletes files below this subdirectory
+_OWNED_DIR = 'code-visualizer'
+_VERSION_PREFIX = 'version-'
+
+
+class LRUCache:
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            # Values larger than the whole cache are never stored
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AnalysisCache:
+    # Memory tier in front of an optional disk tier. Disk entries live in one
+    # subdirectory per version under a code-visualizer directory the cache
+    # owns, so entries of older versions are removed at startup without
+    # touching anything else in the configured directory, and the tier is kept under max_disk_bytes by evicting the
+    # least recently used files (by mtime across restarts).
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, directory: Optional[str] = None,
+                 version: str = '', max_disk_bytes: int = 1024 * 1024 * 1024):
+        self.memory = LRUCache(max_bytes)
+        self.directory = None
+        self.version = version
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.disk_writes = 0
+        self.disk_bytes = 0
+        self.disk_evictions = 0
+        # Disk entry sizes, least recently used first
+        self._disk: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            owned = os.path.join(directory, _OWNED_DIR)
+            self.directory = os.path.join(owned, _VERSION_PREFIX + re.sub(r'[^A-Za-z0-9._-]', '_', version))
+            os.makedirs(self.directory, exist_ok=True)
+            self._remove_stale(owned)
+            self._scan()
+
+    def key(self, language: str, code: str, **options: Any) -> str:
+        digest = hashlib.sha256()
+        parts = [self.version, language]
+        parts.extend(f'{name}={options[name]}' for name in sorted(options))
+        parts.append(code)
+        for part in parts:
+            digest.update(part.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        from_disk = False
+        if value is None and self.directory:
+            value = self._read(key)
+            if value is not None:
+                from_disk = True
+                self.memory.put(key, value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if from_disk:
+                self.disk_hits += 1
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        self.memory.put(key, value)
+        if self.directory and len(value) <= self.max_disk_bytes:
+            self._write(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'disk_hits': self.disk_hits,
+                'disk_writes': self.disk_writes,
+                'disk': {
+                    'entries': len(self._disk),
+                    'bytes': self.disk_bytes,
+                    'max_bytes': self.max_disk_bytes if self.directory else 0,
+                    'evictions': self.disk_evictions
+                },
+                'memory': self.memory.stats()
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remove_stale(self, owned: str) -> None:
+        # Version directories other than ours hold unreachable entries
+        current = os.path.basename(self.directory)
+        for name in os.listdir(owned):
+            path = os.path.join(owned, name)
+            if name != current and name.startswith(_VERSION_PREFIX) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _scan(self) -> None:
+        entries = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    if not _KEY.fullmatch(entry.name):
+                        # Temp files left behind by an interrupted write
+                        os.unlink(entry.path)
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        for _, key, size in entries:
+            self._disk[key] = size
+            self.disk_bytes += size
+        self._evict()
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+        except OSError:
+            return None
+        try:
+            # The mtime orders entries for eviction after a restart
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _write(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.disk_writes += 1
+            self.disk_bytes += len(value) - self._disk.pop(key, 0)
+            self._disk[key] = len(value)
+            self._evict()
+
+    def _evict(self) -> None:
+        # Called with the lock held, or from __init__
+        while self.disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self.disk_bytes -= size
+            self.disk_evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
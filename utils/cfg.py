@@ -0,0 +1,328 @@
+import ast
+from typing import Any, Dict, List, Optional, Tuple
+
+# Larger functions keep their remaining compound statements as single collapsed blocks
+MAX_BLOCKS = 200
+
+COLUMNS = ('function', 'block', 'kind', 'line', 'end_line', 'successors')
+
+
+class _Loop:
+    # A break target; switches have no head, so continue skips past them
+    __slots__ = ('head', 'after', 'label')
+
+    def __init__(self, head: Optional[int], after: int, label: Optional[str] = None):
+        self.head = head
+        self.after = after
+        self.label = label
+
+
+class CFGBuilder:
+    # Builds the basic blocks of one function in a single pass over its
+    # statements. Blocks are rows of (kind, line, end_line) and successors are
+    # [block, edge kind] pairs; block 0 is the entry and block 1 the exit.
+    # Subclasses map their language's statements onto the helpers below.
+    def __init__(self, max_blocks: Optional[int] = None):
+        self.max_blocks = MAX_BLOCKS if max_blocks is None else max_blocks
+        self.kinds: List[str] = []
+        self.lines: List[int] = []
+        self.end_lines: List[int] = []
+        self.successors: List[List[List[Any]]] = []
+        self.predecessors: List[int] = []
+        self.loops: List[_Loop] = []
+
+    def build(self, line: int, end_line: int, body: List[Any]) -> 'CFGBuilder':
+        entry = self.block('entry', line)
+        self.exit = self.block('exit', end_line)
+        self.end_lines[entry] = line
+        current = self.statements(body, self.block('block'), entry)
+        if current is not None:
+            self.edge(current, self.exit)
+        return self
+
+    def rows(self, function: str) -> List[Dict[str, Any]]:
+        return [
+            {'function': function, 'block': i, 'kind': kind, 'line': line, 'end_line': end_line,
+             'successors': successors}
+            for i, (kind, line, end_line, successors) in enumerate(zip(
+                self.kinds, self.lines, self.end_lines, self.successors))
+        ]
+
+    # Blocks and edges
+
+    def block(self, kind: str = 'block', line: int = 0) -> int:
+        self.kinds.append(kind)
+        self.lines.append(line)
+        self.end_lines.append(line)
+        self.successors.append([])
+        self.predecessors.append(0)
+        return len(self.kinds) - 1
+
+    def edge(self, source: Optional[int], target: int, kind: str = '') -> None:
+        if source is not None:
+            self.successors[source].append([target, kind])
+            self.predecessors[target] += 1
+
+    def follow(self, source: Optional[int], kind: str = 'block', line: int = 0,
+               edge: str = '') -> int:
+        block = self.block(kind, line)
+        self.edge(source, block, edge)
+        return block
+
+    def start(self, current: int, kind: str, line: int) -> int:
+        # Tests and loop heads reuse the current block while it is still empty
+        if self.kinds[current] == 'block' and not self.lines[current]:
+            self.kinds[current] = kind
+            self.lines[current] = self.end_lines[current] = line
+            return current
+        return self.follow(current, kind, line)
+
+    def extend(self, block: int, line: int, end_line: int) -> None:
+        if not self.lines[block]:
+            self.lines[block] = line
+        self.end_lines[block] = max(self.end_lines[block], end_line or line)
+
+    @property
+    def full(self) -> bool:
+        return len(self.kinds) >= self.max_blocks
+
+    # Statement sequences
+
+    def statements(self, body: List[Any], current: Optional[int], entry: Optional[int] = None) -> Optional[int]:
+        # Returns the block control falls out of, or None when it cannot
+        if entry is not None:
+            self.edge(entry, current)
+        for statement in body:
+            if current is None:
+                # Unreachable code still gets a block, without predecessors
+                current = self.block()
+            current = self.statement(statement, current)
+        return current
+
+    def statement(self, statement: Any, current: int) -> Optional[int]:
+        raise NotImplementedError
+
+    def simple(self, current: int, line: int, end_line: int) -> int:
+        self.extend(current, line, end_line)
+        return current
+
+    def collapsed(self, current: int, line: int, end_line: int) -> int:
+        self.kinds[current] = 'collapsed'
+        return self.simple(current, line, end_line)
+
+    def jump(self, current: int, line: int, target: int, kind: str) -> None:
+        self.extend(current, line, line)
+        self.edge(current, target, kind)
+
+    def branch(self, current: int, line: int, arms: List[Tuple[str, List[Any]]],
+               fallthrough: bool) -> Optional[int]:
+        # An if/switch: each arm runs from the test; without an else/default
+        # the test can also fall through to the join
+        test = self.start(current, 'conditional', line)
+        join = self.block()
+        reachable = fallthrough
+        for kind, body in arms:
+            end = self.statements(body, self.follow(test, edge=kind))
+            if end is not None:
+                self.edge(end, join)
+                reachable = True
+        if fallthrough:
+            self.edge(test, join, 'false')
+        return join if reachable else None
+
+    def target(self, label: Optional[str], continuing: bool) -> Optional[_Loop]:
+        for loop in reversed(self.loops):
+            if (loop.label == label if label else not continuing or loop.head is not None):
+                return loop
+        return None
+
+    def loop(self, current: int, line: int, body: List[Any], orelse: List[Any] = (),
+             infinite: bool = False, label: Optional[str] = None) -> Optional[int]:
+        head = self.start(current, 'loop', line)
+        after = self.block()
+        self.loops.append(_Loop(head, after, label))
+        end = self.statements(body, self.follow(head, edge='true'))
+        self.loops.pop()
+        self.edge(end, head, 'back')
+        if not infinite:
+            end = self.statements(orelse, self.follow(head, edge='false')) if orelse else head
+            self.edge(end, after, '' if orelse else 'false')
+        return after if self.predecessors[after] else None
+
+
+class PythonCFGBuilder(CFGBuilder):
+    def statement(self, node: ast.stmt, current: int) -> Optional[int]:
+        line, end_line = node.lineno, node.end_lineno or node.lineno
+        node_type = type(node)
+        if node_type in (ast.Return, ast.Raise):
+            self.jump(current, line, self.exit, 'return' if node_type is ast.Return else 'raise')
+            return None
+        if node_type is ast.Break and self.loops:
+            self.jump(current, line, self.loops[-1].after, 'break')
+            return None
+        if node_type is ast.Continue and self.loops:
+            self.jump(current, line, self.loops[-1].head, 'continue')
+            return None
+        if node_type not in _PYTHON_COMPOUND:
+            return self.simple(current, line, end_line)
+        if self.full:
+            return self.collapsed(current, line, end_line)
+
+        if node_type is ast.If:
+            arms = [('true', node.body)] + ([('false', node.orelse)] if node.orelse else [])
+            return self.branch(current, line, arms, not node.orelse)
+        if node_type in (ast.For, ast.AsyncFor, ast.While):
+            infinite = (node_type is ast.While and isinstance(node.test, ast.Constant)
+                        and bool(node.test.value) and not node.orelse)
+            return self.loop(current, line, node.body, node.orelse, infinite)
+        if node_type in (ast.With, ast.AsyncWith):
+            return self.statements(node.body, self.simple(current, line, line))
+        if node_type is _MATCH:
+            arms = [('case', case.body) for case in node.cases]
+            return self.branch(current, line, arms, True)
+        return self._try(node, current, line)
+
+    def _try(self, node: ast.Try, current: int, line: int) -> Optional[int]:
+        # Handlers are entered from the start of the try body
+        body = self.start(current, 'block', line)
+        join = self.block()
+        end = self.statements(node.body, body)
+        end = self.statements(node.orelse, end) if end is not None else None
+        self.edge(end, join)
+        for handler in node.handlers:
+            end = self.statements(handler.body, self.follow(body, 'handler', handler.lineno, 'except'))
+            self.edge(end, join)
+        # The finally body is drawn even when every path above returns or
+        # raises, but control only continues past it if one falls through
+        end = self.statements(node.finalbody, join) if node.finalbody else join
+        return end if self.predecessors[join] else None
+
+
+# Match and TryStar only exist on newer Pythons
+_MATCH = getattr(ast, 'Match', None)
+
+_PYTHON_COMPOUND = frozenset(
+    [ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try]
+    + [node for node in (_MATCH, getattr(ast, 'TryStar', None)) if node]
+)
+
+
+class JavaCFGBuilder(CFGBuilder):
+    def __init__(self, max_blocks: Optional[int] = None):
+        super().__init__(max_blocks)
+        self.last_line = 0
+        self.tree, self.compound = _java_tree()
+
+    def _line(self, node: Any) -> int:
+        # Not every javalang node carries a position
+        position = getattr(node, 'position', None)
+        if position is not None:
+            self.last_line = position.line
+        return self.last_line
+
+    def _body(self, node: Any) -> List[Any]:
+        if node is None:
+            return []
+        if isinstance(node, self.tree.BlockStatement):
+            return node.statements or []
+        return [node]
+
+    def statement(self, node: Any, current: int) -> Optional[int]:
+        line = self._line(node)
+        tree = self.tree
+        if isinstance(node, (tree.ReturnStatement, tree.ThrowStatement)):
+            kind = 'return' if isinstance(node, tree.ReturnStatement) else 'raise'
+            self.jump(current, line, self.exit, kind)
+            return None
+        if isinstance(node, (tree.BreakStatement, tree.ContinueStatement)):
+            continuing = isinstance(node, tree.ContinueStatement)
+            loop = self.target(node.goto, continuing)
+            if loop is None:
+                return self.simple(current, line, line)
+            self.jump(current, line, loop.head if continuing else loop.after,
+                      'continue' if continuing else 'break')
+            return None
+        if isinstance(node, tree.BlockStatement):
+            return self.statements(node.statements or [], current)
+        if not isinstance(node, self.compound):
+            return self.simple(current, line, line)
+        if self.full:
+            return self.collapsed(current, line, line)
+
+        if isinstance(node, tree.IfStatement):
+            arms = [('true', self._body(node.then_statement))]
+            if node.else_statement is not None:
+                arms.append(('false', self._body(node.else_statement)))
+            return self.branch(current, line, arms, node.else_statement is None)
+        if isinstance(node, tree.WhileStatement):
+            infinite = isinstance(node.condition, tree.Literal) and node.condition.value == 'true'
+            return self.loop(current, line, self._body(node.body), infinite=infinite,
+                             label=node.label)
+        if isinstance(node, tree.ForStatement):
+            infinite = getattr(node.control, 'condition', True) is None
+            return self.loop(current, line, self._body(node.body), infinite=infinite,
+                             label=node.label)
+        if isinstance(node, tree.DoStatement):
+            return self._do(node, current, line)
+        if isinstance(node, tree.SwitchStatement):
+            return self._switch(node, current, line)
+        if isinstance(node, tree.SynchronizedStatement):
+            return self.statements(node.block or [], self.simple(current, line, line))
+        return self._try(node, current, line)
+
+    def _do(self, node: Any, current: int, line: int) -> Optional[int]:
+        # The condition is tested after the body, and continue jumps to it
+        body = self.start(current, 'block', line)
+        test = self.block('loop')
+        after = self.block()
+        self.loops.append(_Loop(test, after, node.label))
+        end = self.statements(self._body(node.body), body)
+        self.loops.pop()
+        self.edge(end, test)
+        self.extend(test, self.last_line, self.last_line)
+        if self.predecessors[test]:
+            self.edge(test, body, 'back')
+            self.edge(test, after, 'false')
+        return after if self.predecessors[after] else None
+
+    def _switch(self, node: Any, current: int, line: int) -> Optional[int]:
+        # Cases fall through into the next one unless they break
+        test = self.start(current, 'conditional', line)
+        join = self.block()
+        self.loops.append(_Loop(None, join, node.label))
+        end = None
+        for case in node.cases:
+            block = self.follow(test, edge='case' if case.case else 'default')
+            self.edge(end, block)
+            end = self.statements(case.statements or [], block)
+        self.loops.pop()
+        self.edge(end, join)
+        if not any(not case.case for case in node.cases):
+            self.edge(test, join, 'false')
+        return join if self.predecessors[join] else None
+
+    def _try(self, node: Any, current: int, line: int) -> Optional[int]:
+        # Catch clauses are entered from the start of the try block
+        body = self.start(current, 'block', line)
+        join = self.block()
+        self.edge(self.statements(node.block or [], body), join)
+        for catch in node.catches or []:
+            handler = self.follow(body, 'handler', self._line(catch) or line, 'except')
+            self.edge(self.statements(catch.block or [], handler), join)
+        # The finally body is drawn even when every path above returns or
+        # raises, but control only continues past it if one falls through
+        end = self.statements(node.finally_block, join) if node.finally_block else join
+        return end if self.predecessors[join] else None
+
+
+_JAVA_COMPOUND = None
+
+
+def _java_tree():
+    # javalang is only imported once Java code is analyzed
+    global _JAVA_COMPOUND
+    import javalang.tree as tree
+    if _JAVA_COMPOUND is None:
+        _JAVA_COMPOUND = (tree.IfStatement, tree.WhileStatement, tree.ForStatement, tree.DoStatement,
+                          tree.SwitchStatement, tree.TryStatement, tree.SynchronizedStatement)
+    return tree, _JAVA_COMPOUND
@@ -0,0 +1,210 @@
+from array import array
+from typing import Any, Dict, Iterable, Tuple
+
+import numpy as np
+
+from utils import records
+from utils.intervals import IntervalIndex
+from utils.records import RecordTable
+
+# Per-function metrics computed from the code_structure stream and the call
+# list, after parsing. The stream is turned into arrays of type codes and
+# depths once, and every metric is an array operation over them: no step
+# loops over nodes in Python, only over functions or distinct node types.
+COLUMNS = ('name', 'scope', 'line', 'end_line', 'length', 'complexity', 'nesting',
+           'fan_in', 'fan_out', 'centrality')
+REQUIRES = ('code_structure', 'functions', 'calls')
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 100
+PAGERANK_TOLERANCE = 1e-6
+
+_FUNCTION = 1
+_DECISION = 2
+_NESTING = 4
+
+# Structure node types by role, per language. Functions bound what the other
+# nodes count towards; decisions add one to the cyclomatic complexity;
+# nesting statements add a level to what they contain. The C++ sets hold the
+# names of both the scanner and the libclang streams.
+_ROLES = {
+    'python': {
+        _FUNCTION: ('FunctionDef', 'AsyncFunctionDef'),
+        _DECISION: ('If', 'IfExp', 'For', 'AsyncFor', 'While', 'ExceptHandler', 'BoolOp',
+                    'comprehension', 'match_case'),
+        _NESTING: ('If', 'For', 'AsyncFor', 'While', 'Try', 'TryStar', 'With', 'AsyncWith', 'Match')
+    },
+    'java': {
+        _FUNCTION: ('MethodDeclaration', 'ConstructorDeclaration'),
+        _DECISION: ('IfStatement', 'ForStatement', 'WhileStatement', 'DoStatement',
+                    'SwitchStatementCase', 'CatchClause', 'TernaryExpression'),
+        _NESTING: ('IfStatement', 'ForStatement', 'WhileStatement', 'DoStatement',
+                   'SwitchStatement', 'TryStatement', 'SynchronizedStatement')
+    },
+    'cpp': {
+        _FUNCTION: ('Function', 'FUNCTION_DECL', 'CXX_METHOD', 'CONSTRUCTOR', 'DESTRUCTOR',
+                    'FUNCTION_TEMPLATE', 'CONVERSION_FUNCTION'),
+        _DECISION: ('If', 'For', 'While', 'Do', 'IF_STMT', 'FOR_STMT', 'CXX_FOR_RANGE_STMT',
+                    'WHILE_STMT', 'DO_STMT', 'CASE_STMT', 'CXX_CATCH_STMT', 'CONDITIONAL_OPERATOR'),
+        _NESTING: ('If', 'For', 'While', 'Do', 'IF_STMT', 'FOR_STMT', 'CXX_FOR_RANGE_STMT',
+                   'WHILE_STMT', 'DO_STMT', 'SWITCH_STMT', 'CXX_TRY_STMT')
+    }
+}
+_FLAGS = {
+    language: {node_type: sum(role for role, types in roles.items() if node_type in types)
+               for types in roles.values() for node_type in types}
+    for language, roles in _ROLES.items()
+}
+
+
+def compute(language: str, analysis: Dict[str, Any]) -> RecordTable:
+    # One row per entry of analysis['functions'], in the same order
+    functions = analysis.get('functions', [])
+    names = list(records.column(functions, 'name'))
+    scopes = list(records.column(functions, 'scope'))
+    lines = _ints(records.column(functions, 'line'))
+    end_lines = np.maximum(_ints(records.column(functions, 'end_line')), lines)
+
+    complexity, nesting = _structure_metrics(_FLAGS.get(language, {}),
+                                             analysis.get('code_structure', []), lines)
+    fan_in, fan_out, centrality = _call_metrics(names, lines, end_lines, analysis.get('calls', []))
+    return RecordTable(COLUMNS, [
+        names, scopes, array('l', lines.tolist()), array('l', end_lines.tolist()),
+        (end_lines - lines + 1).tolist(),
+        complexity.tolist(), nesting.tolist(), fan_in.tolist(), fan_out.tolist(),
+        np.round(centrality, 6).tolist()
+    ])
+
+
+def _ints(column: Iterable[Any]) -> np.ndarray:
+    # Int columns are typed arrays and convert in one copy; lists may hold None
+    if isinstance(column, array):
+        return np.frombuffer(column, dtype=column.typecode).astype(np.int64) if column else np.zeros(0, np.int64)
+    return np.fromiter((value or 0 for value in column), dtype=np.int64)
+
+
+def _structure_metrics(flags: Dict[str, int], structure: Any,
+                       lines: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Cyclomatic complexity and maximum nesting per function. A node counts
+    # towards the innermost function whose subtree holds it, so the branches
+    # of a nested function are its own.
+    count = len(lines)
+    complexity = np.ones(count, np.int64)
+    nesting = np.zeros(count, np.int64)
+    size = len(structure)
+    if not count or not size:
+        return complexity, nesting
+
+    # Each distinct type is looked up once and rows take its flags by code
+    types = records.column(structure, 'type')
+    codes = {node_type: i for i, node_type in enumerate(set(types))}
+    kinds = np.zeros(len(codes), np.int8)
+    for node_type, i in codes.items():
+        kinds[i] = flags.get(node_type, 0)
+    kind = kinds[np.fromiter(map(codes.__getitem__, types), dtype=np.intp, count=size)]
+    depth = _ints(records.column(structure, 'depth'))
+
+    starts = np.flatnonzero(kind & _FUNCTION)
+    nested = np.flatnonzero(kind & _NESTING)
+    ends = _subtree_ends(depth, np.concatenate((starts, nested)))
+    function_ends, nested_ends = ends[:len(starts)], ends[len(starts):]
+
+    # Innermost function per node: outer functions are painted first
+    owner = np.full(size, -1, np.intp)
+    for i in np.argsort(depth[starts], kind='stable').tolist():
+        owner[starts[i] + 1:function_ends[i]] = i
+
+    # Rows of analysis['functions'] are matched to function nodes by line, in order
+    node_lines = _ints(records.column(structure, 'line'))[starts]
+    by_line: Dict[int, list] = {}
+    for i, line in enumerate(node_lines.tolist()):
+        by_line.setdefault(line, []).append(i)
+    node_of = np.full(count, -1, np.intp)
+    for row, line in enumerate(lines.tolist()):
+        candidates = by_line.get(line)
+        if candidates:
+            node_of[row] = candidates.pop(0)
+    matched = node_of >= 0
+
+    decisions = np.flatnonzero((kind & _DECISION).astype(bool) & (owner >= 0))
+    per_node = 1 + np.bincount(owner[decisions], minlength=len(starts))
+    complexity[matched] = per_node[node_of[matched]]
+
+    # Open nesting statements at every node, from +1/-1 marks at each
+    # statement's first child and subtree end. A statement's level inside its
+    # function is what is open around it, less what is open around the function.
+    marks = np.bincount(nested + 1, minlength=size + 1) - np.bincount(nested_ends, minlength=size + 1)
+    opened = np.cumsum(marks)[:size]
+    inside = nested[owner[nested] >= 0]
+    level = opened[inside] - opened[starts[owner[inside]]] + 1
+    deepest = np.zeros(len(starts), np.int64)
+    np.maximum.at(deepest, owner[inside], level)
+    nesting[matched] = deepest[node_of[matched]]
+    return complexity, nesting
+
+
+def _subtree_ends(depth: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    # Index after the last descendant of each row: the first later node at
+    # the same or a smaller depth. One pass per distinct depth among rows.
+    ends = np.empty(len(rows), np.intp)
+    row_depths = depth[rows]
+    for level in np.unique(row_depths).tolist():
+        closing = np.append(np.flatnonzero(depth <= level), len(depth))
+        at = row_depths == level
+        ends[at] = closing[np.searchsorted(closing, rows[at], side='right')]
+    return ends
+
+
+def _call_metrics(names: list, lines: np.ndarray, end_lines: np.ndarray,
+                  calls: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Distinct callees and distinct callers per function, and PageRank over
+    # the call graph. Callees are resolved by name, to every function of that
+    # name; code outside any function counts as one caller.
+    count = len(names)
+    if not count:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0)
+    callees = records.column(calls, 'function')
+    vocabulary = {name: i for i, name in enumerate(set(names) | set(callees))}
+    size = len(vocabulary)
+    function_codes = np.fromiter(map(vocabulary.__getitem__, names), dtype=np.int64, count=count)
+    call_codes = np.fromiter(map(vocabulary.__getitem__, callees), dtype=np.int64, count=len(callees))
+
+    # Innermost function around each call, looked up for all calls at once
+    starts, owners = IntervalIndex(zip(lines.tolist(), end_lines.tolist(), range(count))).boundaries()
+    owners = np.array([count if owner is None else owner for owner in owners], np.int64)
+    position = np.searchsorted(np.array(starts, np.int64), _ints(records.column(calls, 'line')),
+                               side='right') - 1
+    callers = np.where(position >= 0, owners[np.maximum(position, 0)], count)
+
+    pairs = np.unique(callers * size + call_codes)
+    pair_callers, pair_codes = pairs // size, pairs % size
+    fan_out = np.bincount(pair_callers, minlength=count + 1)[:count]
+    fan_in = np.bincount(pair_codes, minlength=size)[function_codes]
+
+    # The graph has one node per function name, as in the call graph view, so
+    # that functions sharing a name don't multiply its edges
+    nodes, node_of = np.unique(function_codes, return_inverse=True)
+    node_index = np.full(size, -1, np.int64)
+    node_index[nodes] = np.arange(len(nodes))
+    sources = node_index[function_codes[pair_callers[pair_callers < count]]]
+    targets = node_index[pair_codes[pair_callers < count]]
+    edges = np.unique(sources[targets >= 0] * len(nodes) + targets[targets >= 0])
+    rank = _pagerank(edges // len(nodes), edges % len(nodes), len(nodes))
+    return fan_in, fan_out, rank[node_of]
+
+
+def _pagerank(sources: np.ndarray, targets: np.ndarray, count: int) -> np.ndarray:
+    # Power iteration over the edge arrays; nodes without outgoing edges
+    # spread their rank evenly, as in networkx.pagerank
+    rank = np.full(count, 1.0 / count)
+    out_degree = np.bincount(sources, minlength=count)
+    dangling = out_degree == 0
+    weights = 1.0 / out_degree[sources]
+    for _ in range(PAGERANK_ITERATIONS):
+        spread = np.bincount(targets, weights=rank[sources] * weights, minlength=count)
+        updated = (1 - PAGERANK_DAMPING) / count + PAGERANK_DAMPING * (spread + rank[dangling].sum() / count)
+        converged = np.abs(updated - rank).sum() < count * PAGERANK_TOLERANCE
+        rank = updated
+        if converged:
+            break
+    return rank
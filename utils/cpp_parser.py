@@ -1,67 +1,462 @@
+import os
 import re
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Optional
+from utils.records import RecordTable
+from utils.source import SourceBuffer
+from utils import limits
+
+try:
+    import clang.cindex as cindex
+except ImportError:
+    cindex = None
+
+# 'scanner' (default) or 'clang'; clang falls back to the scanner when libclang is missing
+DEFAULT_BACKEND = os.environ.get('CPP_PARSER', 'scanner')
+
+# One alternation for everything the scanner cares about, preceded by a run of
+# characters that can never start a token so they are skipped in bulk. Comments
+# and string literals are consumed whole so nothing inside them is matched, and
+# preprocessor lines are consumed so braces in macros do not count.
+_TOKEN = re.compile(r'''[^\w"'/\#(){};:,=~]*(?:
+    (?P<ident>(?!(?:u8|[uUL])?R")~?[A-Za-z_]\w*(?:\s*::\s*~?[A-Za-z_]\w*)*)\s*(?P<tail>[(;,\[{]|=(?!=))?
+  | (?P<punct>[(){};:,]|(?<![!<>=+\-*/%&|^])=(?!=))
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<raw>(?:u8|[uUL])?R"(?P<delim>[^()\\\s]{0,16})\(.*?\)(?P=delim)")
+  | (?P<directive>\#(?:\\\n|[^\n])*)
+  | (?P<number>\d[\w.]*(?:'[\w.]+)+)
+)''', re.VERBOSE | re.DOTALL)
+
+_INCLUDE = re.compile(r'[ \t]*#[ \t]*include[ \t]*[<"]([^>"\n]+)[>"]')
+
+_SCOPE_KEYWORDS = {
+    'class': 'class', 'struct': 'class', 'union': 'class', 'namespace': 'namespace', 'enum': 'enum'
+}
+_CONTROL_KEYWORDS = {'for', 'while', 'do', 'if'}
+# Identifiers followed by '(' that are not calls or function names
+_NOT_CALLABLE = {
+    'if', 'for', 'while', 'switch', 'return', 'sizeof', 'alignof', 'alignas', 'decltype',
+    'catch', 'static_assert', 'typeid', 'noexcept', 'new', 'delete', 'throw', 'co_return',
+    'co_await', 'co_yield', 'operator', 'case', 'else', 'do', 'template', 'explicit'
+}
+# Statements starting with these are never declarations
+_NOT_DECLARATION = {
+    'return', 'delete', 'throw', 'goto', 'using', 'typedef', 'case', 'else', 'do', 'co_return',
+    'co_yield', 'break', 'continue', 'public', 'private', 'protected', 'friend', 'template'
+}
+_TYPE_END = re.compile(r'(?:[\w*&]|(?<!-)>)$')
+
+_CLANG_LOOPS = {
+    'FOR_STMT': 'for', 'CXX_FOR_RANGE_STMT': 'for', 'WHILE_STMT': 'while', 'DO_STMT': 'do'
+}
+_CLANG_FUNCTIONS = {'FUNCTION_DECL', 'CXX_METHOD', 'CONSTRUCTOR', 'DESTRUCTOR',
+                    'FUNCTION_TEMPLATE', 'CONVERSION_FUNCTION'}
+_CLANG_CLASSES = {'CLASS_DECL', 'STRUCT_DECL', 'UNION_DECL', 'CLASS_TEMPLATE'}
+_CLANG_SCOPES = _CLANG_CLASSES | {'NAMESPACE'}
+
+
+def _strip_template(text: str) -> str:
+    # Drops a leading template<...> parameter list from a declaration prefix
+    if not text.startswith('template'):
+        return text
+    depth = 0
+    for i, char in enumerate(text):
+        if char == '<':
+            depth += 1
+        elif char == '>':
+            depth -= 1
+            if depth == 0:
+                return text[i + 1:].strip()
+    return text
+
+
+class _Scope:
+    __slots__ = ('kind', 'name', 'row', 'structure_row', 'counted')
+
+    def __init__(self, kind: str, name: Optional[str] = None, row: Optional[int] = None,
+                 structure_row: Optional[int] = None, counted: bool = False):
+        self.kind = kind
+        self.name = name
+        self.row = row
+        self.structure_row = structure_row
+        self.counted = counted
+
 
 class CppCodeParser:
-    def parse_code(self, code: str) -> Dict[str, Any]:
-        return self._analyze_with_regex(code)
-
-    def _analyze_with_regex(self, code: str) -> Dict[str, Any]:
-        analysis = {
-            'functions': [],
-            'classes': [],
-            'variables': [],
-            'loops': [],
-            'conditionals': [],
-            'calls': [],
-            'includes': [],
-            'code_structure': []
-        }
-        
-        lines = code.split('\n')
-        
-        # Parse includes
-        analysis['includes'] = [
-            {'line': i+1, 'header': match.group(1)}
-            for i, line in enumerate(lines)
-            for match in [re.match(r'#include\s*[<"]([^>"]+)[>"]', line.strip())]
-            if match
-        ]
-        
-        # Parse functions
-        function_pattern = r'(\w+)\s+(\w+)\s*\(([^)]*)\)\s*\{'
-        for i, line in enumerate(lines):
-            match = re.search(function_pattern, line)
-            if match:
-                analysis['functions'].append({
-                    'return_type': match.group(1),
-                    'name': match.group(2),
-                    'parameters': match.group(3),
-                    'line': i+1
-                })
-        
-        # Parse classes
-        class_pattern = r'class\s+(\w+)'
-        for i, line in enumerate(lines):
-            match = re.search(class_pattern, line)
-            if match:
-                analysis['classes'].append({
-                    'name': match.group(1),
-                    'line': i+1
-                })
-        
-        # Parse loops
-        for i, line in enumerate(lines):
-            if re.search(r'\b(for|while)\s*\(', line):
-                analysis['loops'].append({
-                    'type': 'for' if 'for' in line else 'while',
-                    'line': i+1
-                })
-        
-        # Parse conditionals
-        for i, line in enumerate(lines):
-            if re.search(r'\bif\s*\(', line):
-                analysis['conditionals'].append({
-                    'line': i+1
-                })
-        
-        return analysis
\ No newline at end of file
+    FIELDS = ('functions', 'classes', 'variables', 'loops', 'conditionals', 'calls', 'includes',
+              'code_structure')
+    COLUMNS = {
+        'functions': ('return_type', 'name', 'parameters', 'line', 'end_line', 'scope'),
+        'classes': ('name', 'line', 'end_line', 'scope'),
+        'variables': ('name', 'type', 'line', 'scope'),
+        'loops': ('type', 'line'),
+        'conditionals': ('line',),
+        'calls': ('function', 'line', 'scope'),
+        'includes': ('line', 'header'),
+        'code_structure': ('type', 'depth', 'line', 'code')
+    }
+
+    def __init__(self, backend: Optional[str] = None):
+        backend = backend or DEFAULT_BACKEND
+        if backend not in ('scanner', 'clang'):
+            raise ValueError(f'Unknown C++ parser backend: {backend}')
+        self.backend = backend if backend == 'scanner' or cindex is not None else 'scanner'
+
+    def parse_code(self, code: str, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        fields = self.FIELDS if fields is None else fields
+        analysis = {field: RecordTable(self.COLUMNS[field]) for field in self.FIELDS if field in fields}
+        if self.backend == 'clang':
+            try:
+                return self._analyze_with_clang(code, analysis)
+            except cindex.LibclangError:
+                # The bindings are installed but the shared library is not
+                self.backend = 'scanner'
+            except cindex.TranslationUnitLoadError:
+                pass
+            analysis = {field: RecordTable(self.COLUMNS[field]) for field in analysis}
+        return self._analyze_with_scanner(code, analysis)
+
+    def _analyze_with_scanner(self, code: str, analysis: Dict[str, RecordTable]) -> Dict[str, Any]:
+        functions = analysis.get('functions')
+        classes = analysis.get('classes')
+        variables = analysis.get('variables')
+        loops = analysis.get('loops')
+        conditionals = analysis.get('conditionals')
+        calls = analysis.get('calls')
+        includes = analysis.get('includes')
+        structure = analysis.get('code_structure')
+        source = SourceBuffer(code)
+        count = code.count
+
+        # Line numbers are only computed for emitted items, advancing monotonically
+        line_pos = 0
+        line_no = 1
+
+        scopes: List[_Scope] = []
+        depth = 1  # structure depth of the next row; the translation unit is depth 0
+        function_depth = 0
+        paren_depth = 0
+        stmt_start = 0
+        stmt_words = 0
+        stmt_first = None
+        stmt_assign = False
+        decl_type = None
+        last_ident = None  # (name, start offset) when the previous token was an identifier
+        candidate = None   # [name, return type, line, params start, params text] of a function header
+        init_list = False
+        pending = None     # (kind, name, line[, structure row]) of what the next '{' opens
+        after_do = False
+
+        def structure_row(node_type: str, line: int) -> int:
+            structure.append({'type': node_type, 'depth': depth, 'line': line,
+                              'code': source.span(line, line)})
+            return len(structure) - 1
+
+        def add_variable(pos: int) -> None:
+            # A declaration is a type followed by the name just before '=', ';', ',', '['
+            # or '{'; later declarators of the same statement reuse the first type
+            nonlocal line_no, line_pos, decl_type
+            if stmt_words < 2 or stmt_first in _NOT_DECLARATION:
+                return
+            name, name_start = last_ident
+            type_name = decl_type or ' '.join(code[stmt_start:name_start].split())
+            if not type_name or not _TYPE_END.search(type_name):
+                return
+            line_no += count('\n', line_pos, pos)
+            line_pos = pos
+            decl_type = type_name
+            variables.append({'name': name, 'type': type_name, 'line': line_no,
+                              'scope': enclosing(('function', 'class', 'namespace'))})
+
+        def enclosing(kinds) -> Optional[str]:
+            for scope in reversed(scopes):
+                if scope.kind in kinds:
+                    return scope.name
+            return None
+
+        if structure is not None:
+            structure.append({'type': 'TranslationUnit', 'depth': 0, 'line': 0, 'code': ''})
+
+        for match in _TOKEN.finditer(code):
+            kind = match.lastgroup
+            pos = match.start('ident' if kind == 'tail' else kind)
+
+            if kind == 'punct':
+                char = match.group('punct')
+            elif kind == 'ident' or kind == 'tail':
+                word = match.group('ident')
+                if ':' in word:
+                    word = ''.join(word.split())
+                char = match.group('tail')
+
+                if after_do and word == 'while':
+                    # Trailing condition of a do-while loop
+                    after_do = False
+                    last_ident = None
+                    if char == '(':
+                        paren_depth += 1
+                    continue
+                after_do = False
+
+                if word in _SCOPE_KEYWORDS:
+                    if paren_depth == 0 and (pending is None or pending[0] != 'enum'):
+                        line_no += count('\n', line_pos, pos)
+                        line_pos = pos
+                        pending = (_SCOPE_KEYWORDS[word], None, line_no)
+                    last_ident = None
+                elif word in _CONTROL_KEYWORDS:
+                    line_no += count('\n', line_pos, pos)
+                    line_pos = pos
+                    if word == 'if':
+                        if conditionals is not None:
+                            conditionals.append({'line': line_no})
+                    elif loops is not None:
+                        loops.append({'type': word, 'line': line_no})
+                    row = structure_row(word.capitalize(), line_no) if structure is not None else None
+                    pending = ('control', word, line_no, row)
+                    last_ident = None
+                elif pending is not None and pending[1] is None and pending[0] != 'control':
+                    # Name of a class, struct, union, namespace or enum
+                    if word != 'final':
+                        pending = (pending[0], word, pending[2])
+                    last_ident = None
+                else:
+                    if stmt_words == 0:
+                        stmt_first = word
+                    stmt_words += 1
+                    last_ident = (word, pos)
+
+                if char is None:
+                    continue
+                if char == '(':
+                    paren_depth += 1
+                    if last_ident is None or word in _NOT_CALLABLE:
+                        continue
+                    if function_depth or stmt_assign or paren_depth > 1:
+                        if calls is not None:
+                            line_no += count('\n', line_pos, pos)
+                            line_pos = pos
+                            calls.append({'function': word.rpartition('::')[2], 'line': line_no,
+                                          'scope': enclosing(('function',))})
+                    elif candidate is None and not init_list and (pending is None or pending[0] == 'class'):
+                        # A pending class here was a template parameter or part of the return type
+                        pending = None
+                        line_no += count('\n', line_pos, pos)
+                        line_pos = pos
+                        return_type = _strip_template(' '.join(code[stmt_start:pos].split()))
+                        candidate = [word, return_type or None, line_no, match.end(), None]
+                    last_ident = None
+                    continue
+                # Delimiter right after the identifier, handled like punctuation below
+                pos = match.end() - 1
+            elif kind == 'comment' or kind == 'directive':
+                if kind == 'directive':
+                    include = _INCLUDE.match(match.group('directive'))
+                    if include and (includes is not None or structure is not None):
+                        line_no += count('\n', line_pos, pos)
+                        line_pos = pos
+                        if includes is not None:
+                            includes.append({'line': line_no, 'header': include.group(1)})
+                        if structure is not None:
+                            structure_row('Include', line_no)
+                if stmt_words == 0:
+                    stmt_start = match.end()
+                continue
+            else:
+                # String, raw string or number literal
+                last_ident = None
+                after_do = False
+                continue
+
+            # Punctuation
+            if char == '(':
+                paren_depth += 1
+                last_ident = None
+                after_do = False
+                continue
+            if char == ')':
+                paren_depth = max(0, paren_depth - 1)
+                if candidate is not None and candidate[4] is None and paren_depth == 0:
+                    candidate[4] = ' '.join(code[candidate[3]:pos].split())
+                last_ident = None
+                continue
+            after_do = False
+            if paren_depth:
+                last_ident = None
+                continue
+
+            if char == '{':
+                line_no += count('\n', line_pos, pos)
+                line_pos = pos
+                if init_list and last_ident is not None:
+                    # Brace initializer of a member in a constructor's init list
+                    scopes.append(_Scope('init'))
+                    last_ident = None
+                    continue
+                if candidate is not None and candidate[4] is not None:
+                    qualified, return_type, line, _, parameters = candidate
+                    qualifier, _, name = qualified.rpartition('::')
+                    row = None
+                    if functions is not None:
+                        functions.append({'return_type': return_type or 'void', 'name': name,
+                                          'parameters': parameters, 'line': line,
+                                          'scope': qualifier or enclosing(('class', 'namespace'))})
+                        row = len(functions) - 1
+                    srow = structure_row('Function', line) if structure is not None else None
+                    scopes.append(_Scope('function', name, row, srow, True))
+                    function_depth += 1
+                    depth += 1
+                elif pending is not None and pending[0] == 'control':
+                    scopes.append(_Scope('do' if pending[1] == 'do' else 'block', None, None,
+                                         pending[3], True))
+                    depth += 1
+                elif pending is not None and pending[0] in ('class', 'namespace'):
+                    _, name, line = pending
+                    row = None
+                    if pending[0] == 'class' and classes is not None:
+                        classes.append({'name': name or '', 'line': line,
+                                        'scope': enclosing(('class', 'namespace'))})
+                        row = len(classes) - 1
+                    srow = None
+                    if structure is not None:
+                        srow = structure_row('Class' if pending[0] == 'class' else 'Namespace', line)
+                    scopes.append(_Scope(pending[0], name, row, srow, True))
+                    depth += 1
+                else:
+                    if variables is not None and last_ident is not None and not stmt_assign:
+                        add_variable(pos)
+                    scopes.append(_Scope('block'))
+            elif char == '}':
+                if scopes and scopes[-1].kind == 'init':
+                    scopes.pop()
+                    last_ident = None
+                    continue
+                if scopes:
+                    scope = scopes.pop()
+                    if scope.counted:
+                        depth -= 1
+                    if scope.kind == 'do':
+                        after_do = True
+                    if scope.row is not None or scope.structure_row is not None:
+                        line_no += count('\n', line_pos, pos)
+                        line_pos = pos
+                        table = functions if scope.kind == 'function' else classes
+                        if scope.row is not None and table is not None:
+                            table.column('end_line')[scope.row] = line_no
+                        if scope.structure_row is not None:
+                            start = structure.column('line')[scope.structure_row]
+                            structure.column('code')[scope.structure_row] = source.span(start, line_no)
+                    if scope.kind == 'function':
+                        function_depth -= 1
+            elif char == ';':
+                if variables is not None and last_ident is not None and not stmt_assign:
+                    add_variable(pos)
+            elif char == ':':
+                if candidate is not None and candidate[4] is not None:
+                    init_list = True
+                elif stmt_words == 1 and stmt_first in ('public', 'private', 'protected'):
+                    stmt_words = 0
+                    stmt_start = match.end()
+                last_ident = None
+                continue
+            else:
+                # '=', ',' or '['
+                if variables is not None and last_ident is not None and not stmt_assign:
+                    add_variable(pos)
+                if char == '=':
+                    stmt_assign = True
+                elif char == ',':
+                    stmt_assign = False
+                last_ident = None
+                continue
+
+            # '{', '}' and ';' end the current statement
+            candidate = None
+            pending = None
+            init_list = False
+            stmt_assign = False
+            decl_type = None
+            stmt_words = 0
+            stmt_start = match.end()
+            last_ident = None
+
+        return analysis
+
+    def _analyze_with_clang(self, code: str, analysis: Dict[str, RecordTable]) -> Dict[str, Any]:
+        filename = 'input.cpp'
+        index = cindex.Index.create()
+        unit = index.parse(filename, args=['-x', 'c++', '-std=c++17'],
+                           unsaved_files=[(filename, code)],
+                           options=cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD)
+        source = SourceBuffer(code)
+        functions = analysis.get('functions')
+        classes = analysis.get('classes')
+        variables = analysis.get('variables')
+        loops = analysis.get('loops')
+        conditionals = analysis.get('conditionals')
+        calls = analysis.get('calls')
+        includes = analysis.get('includes')
+        structure = analysis.get('code_structure')
+        if structure is not None:
+            structure.append({'type': 'TranslationUnit', 'depth': 0, 'line': 0, 'code': ''})
+
+        # Iterative walk over cursors from the submitted file only; each stack
+        # entry carries the enclosing function and class/namespace names
+        stack = [(cursor, 1, None, None) for cursor in reversed(list(unit.cursor.get_children()))]
+        remaining = limits.MAX_NODES
+        while stack:
+            cursor, depth, function, scope = stack.pop()
+            location = cursor.location
+            if location.file is None or location.file.name != filename:
+                continue
+            remaining -= 1
+            if remaining < 0:
+                limits.note(stage='parse', limit='nodes', max=limits.MAX_NODES)
+                break
+            kind = cursor.kind.name
+            line = location.line
+            end_line = cursor.extent.end.line
+
+            if structure is not None:
+                structure.append({'type': kind, 'depth': depth, 'line': line,
+                                  'code': source.span(line, end_line)})
+            if kind == 'INCLUSION_DIRECTIVE':
+                if includes is not None:
+                    includes.append({'line': line, 'header': cursor.spelling})
+            elif kind in _CLANG_FUNCTIONS and cursor.is_definition():
+                if functions is not None:
+                    functions.append({
+                        'return_type': cursor.result_type.spelling or 'void',
+                        'name': cursor.spelling,
+                        'parameters': ', '.join(f'{arg.type.spelling} {arg.spelling}'.strip()
+                                                for arg in cursor.get_children()
+                                                if arg.kind.name == 'PARM_DECL'),
+                        'line': line,
+                        'end_line': end_line,
+                        'scope': scope
+                    })
+                function = cursor.spelling
+            elif kind in _CLANG_CLASSES and cursor.is_definition():
+                if classes is not None:
+                    classes.append({'name': cursor.spelling, 'line': line, 'end_line': end_line,
+                                    'scope': scope})
+            elif kind in ('VAR_DECL', 'FIELD_DECL'):
+                if variables is not None:
+                    variables.append({'name': cursor.spelling, 'type': cursor.type.spelling,
+                                      'line': line, 'scope': function or scope})
+            elif kind in _CLANG_LOOPS:
+                if loops is not None:
+                    loops.append({'type': _CLANG_LOOPS[kind], 'line': line})
+            elif kind == 'IF_STMT':
+                if conditionals is not None:
+                    conditionals.append({'line': line})
+            elif kind == 'CALL_EXPR' and cursor.spelling:
+                if calls is not None:
+                    calls.append({'function': cursor.spelling, 'line': line, 'scope': function})
+
+            if kind in _CLANG_SCOPES:
+                scope = cursor.spelling
+            children = list(cursor.get_children())
+            for child in reversed(children):
+                stack.append((child, depth + 1, function, scope))
+        return analysis
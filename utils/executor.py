@@ -0,0 +1,239 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Imported once in the fork server (or each spawned worker) so jobs never pay for them
+PRELOAD_MODULES = ['utils.preload']
+
+
+class AnalysisTimeout(Exception):
+    pass
+
+
+class AnalysisMemoryError(Exception):
+    pass
+
+
+class AnalysisWorkerError(Exception):
+    pass
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _address_space_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _worker_main(conn, memory_limit: Optional[int]) -> None:
+    for module in PRELOAD_MODULES:
+        __import__(module)
+
+    # The limit is headroom on top of the warmed-up process, not an absolute size
+    baseline_rss = _rss_bytes()
+    if memory_limit and resource is not None:
+        address_space = _address_space_bytes()
+        if address_space is not None:
+            limit = address_space + memory_limit
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    conn.send('ready')
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        mode, fn, args, kwargs = message
+        try:
+            if mode == 'stream':
+                # Generator jobs forward each item as soon as it is produced
+                for item in fn(*args, **kwargs):
+                    conn.send(('item', item))
+                reply = ('ok', None)
+            else:
+                reply = ('ok', fn(*args, **kwargs))
+        except MemoryError:
+            reply = ('memory', None)
+        except Exception as e:
+            reply = ('error', str(e))
+
+        # Retire the worker if the job left it over its memory budget
+        rss = _rss_bytes()
+        retire = reply[0] == 'memory' or bool(
+            memory_limit and baseline_rss and rss and rss - baseline_rss > memory_limit
+        )
+        if reply[0] == 'ok' and retire:
+            reply = ('memory', None)
+        try:
+            conn.send(reply + (retire,))
+        except MemoryError:
+            conn.send(('memory', None, True))
+        if retire:
+            break
+
+
+class _Worker:
+    def __init__(self, context, memory_limit: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_limit),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self) -> None:
+        # Warm-up time must not count against the first job's timeout
+        if not self.ready:
+            if self.conn.recv() != 'ready':
+                raise AnalysisWorkerError('Analysis worker failed to start')
+            self.ready = True
+
+    def stop(self, kill: bool = False) -> None:
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class AnalysisExecutor:
+    def __init__(self, workers: int, timeout: float = 30.0, memory_limit: Optional[int] = None,
+                 start_method: Optional[str] = None):
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = 'forkserver' if 'forkserver' in methods else 'spawn'
+        self.context = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver':
+            self.context.set_forkserver_preload(PRELOAD_MODULES)
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self._idle = queue.Queue()
+        self._all = set()
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+
+    def run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        for status, value in self._submit('call', fn, args, kwargs):
+            if status == 'ok':
+                return value
+
+    def stream(self, fn: Callable, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        for status, value in self._submit('stream', fn, args, kwargs):
+            if status == 'item':
+                yield value
+
+    def _submit(self, mode: str, fn: Callable, args: tuple, kwargs: dict):
+        worker = self._idle.get()
+        finished = False
+        try:
+            try:
+                worker.wait_ready()
+            except (EOFError, OSError):
+                self._replace(worker, kill=True)
+                worker = None
+                raise AnalysisWorkerError('Analysis worker failed to start')
+            worker.conn.send((mode, fn, args, kwargs))
+
+            # The timeout covers the whole job, including every streamed item
+            deadline = time.monotonic() + self.timeout
+            while True:
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    self._replace(worker, kill=True)
+                    worker = None
+                    raise AnalysisTimeout(f'Analysis exceeded {self.timeout:g}s')
+                try:
+                    message = worker.conn.recv()
+                except (EOFError, OSError):
+                    self._replace(worker, kill=True)
+                    worker = None
+                    raise AnalysisWorkerError('Analysis worker exited unexpectedly')
+                if message[0] == 'item':
+                    yield message
+                    continue
+
+                status, value, retire = message
+                finished = True
+                if retire:
+                    self._replace(worker)
+                    worker = None
+                break
+        finally:
+            if worker is not None:
+                if finished:
+                    self._idle.put(worker)
+                else:
+                    # The caller stopped consuming a stream mid-way
+                    self._replace(worker, kill=True)
+
+        if status == 'memory':
+            raise AnalysisMemoryError('Analysis exceeded the memory limit')
+        if status == 'error':
+            raise AnalysisWorkerError(value)
+        yield status, value
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers, self._all = self._all, set()
+        for worker in workers:
+            worker.stop()
+
+    def wait_ready(self) -> None:
+        # Blocks until every worker has finished its imports. Call it before
+        # serving requests, so the first ones do not wait for a cold pool.
+        with self._lock:
+            workers = list(self._all)
+        for worker in workers:
+            worker.wait_ready()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.context, self.memory_limit)
+        with self._lock:
+            self._all.add(worker)
+        return worker
+
+    def _replace(self, worker: _Worker, kill: bool = False) -> None:
+        with self._lock:
+            self._all.discard(worker)
+        worker.stop(kill=kill)
+        self._idle.put(self._spawn())
+
+
+class InlineExecutor:
+    # Runs jobs in the calling thread, without timeout or memory enforcement
+    def run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        return fn(*args, **kwargs)
+
+    def stream(self, fn: Callable, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        yield from fn(*args, **kwargs)
+
+    def wait_ready(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
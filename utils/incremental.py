@@ -0,0 +1,423 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.visualizer import VIEWS, CodeVisualizer, required_fields
+from utils.pipeline import PARSERS, select_analysis
+from utils.records import RecordTable
+from utils import limits
+
+# Python statements that continue the previous top-level statement
+_PYTHON_CONTINUATIONS = ('else', 'elif', 'except', 'finally')
+
+# Python and Java fragments each parse into their own root node; the merged
+# structure gets one
+_STRUCTURE_ROOTS = {
+    'python': {'type': 'Module', 'depth': 0, 'line': 0, 'code': ''},
+    'java': {'type': 'CompilationUnit', 'depth': 0, 'line': 0, 'code': ''}
+}
+
+
+def split_python_segments(lines: List[str]) -> List[Tuple[int, int]]:
+    # Top-level statements start at column 0 outside brackets, strings and
+    # line continuations. Decorators stay with the definition they decorate.
+    starts = [0]
+    bracket_depth = 0
+    string_quote = None
+    continued = False
+    after_decorator = False
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        top_level = (
+            bracket_depth == 0 and string_quote is None and not continued
+            and line[:1] not in ('', ' ', '\t', '#') and stripped[:1] not in (')', ']', '}')
+            and not any(stripped.startswith(word) and stripped[len(word):len(word) + 1] in (' ', ':', '')
+                        for word in _PYTHON_CONTINUATIONS)
+        )
+        if top_level:
+            if i > 0 and not after_decorator:
+                starts.append(i)
+            after_decorator = stripped.startswith('@')
+        bracket_depth, string_quote, continued = _scan_python_line(line, bracket_depth, string_quote)
+    return _ranges(starts, len(lines))
+
+
+def _scan_python_line(line: str, bracket_depth: int, string_quote: Optional[str]):
+    i = 0
+    length = len(line)
+    while i < length:
+        char = line[i]
+        if string_quote is not None:
+            if char == '\\':
+                i += 2
+                continue
+            if line.startswith(string_quote, i):
+                i += len(string_quote)
+                string_quote = None
+                continue
+        elif char == '#':
+            break
+        elif char in ('"', "'"):
+            string_quote = char * 3 if line.startswith(char * 3, i) else char
+            i += len(string_quote)
+            continue
+        elif char in '([{':
+            bracket_depth += 1
+        elif char in ')]}':
+            bracket_depth = max(0, bracket_depth - 1)
+        i += 1
+    # Single-quoted strings cannot span lines without a backslash
+    if string_quote in ('"', "'"):
+        string_quote = None
+    continued = line.rstrip().endswith('\\')
+    return bracket_depth, string_quote, continued
+
+
+def split_brace_segments(lines: List[str]) -> List[Tuple[int, int]]:
+    # Top-level declarations start at brace depth 0 once the previous one was
+    # closed by ';' or '}'. Preprocessor lines are segments of their own.
+    starts = [0]
+    depth = 0
+    in_comment = False
+    closed = True
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if i > 0 and depth == 0 and closed and not in_comment and stripped:
+            starts.append(i)
+            closed = False
+        if stripped.startswith('#') and depth == 0 and not in_comment:
+            closed = True
+            continue
+        depth, in_comment, last = _scan_brace_line(line, depth, in_comment)
+        if depth == 0 and not in_comment and last in (';', '}'):
+            closed = True
+    return _ranges(starts, len(lines))
+
+
+def _scan_brace_line(line: str, depth: int, in_comment: bool):
+    last = ''
+    i = 0
+    length = len(line)
+    quote = None
+    while i < length:
+        char = line[i]
+        if in_comment:
+            if line.startswith('*/', i):
+                in_comment = False
+                i += 2
+                continue
+        elif quote is not None:
+            if char == '\\':
+                i += 2
+                continue
+            if char == quote:
+                quote = None
+        elif line.startswith('//', i):
+            break
+        elif line.startswith('/*', i):
+            in_comment = True
+            i += 2
+            continue
+        elif char in ('"', "'"):
+            quote = char
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth = max(0, depth - 1)
+        if not in_comment and not char.isspace():
+            last = char
+        i += 1
+    return depth, in_comment, last
+
+
+def _ranges(starts: List[int], count: int) -> List[Tuple[int, int]]:
+    # 0-based start indexes to 1-based inclusive (start_line, end_line) pairs
+    ends = starts[1:] + [count]
+    return [(start + 1, end) for start, end in zip(starts, ends) if end > start]
+
+
+SPLITTERS = {
+    'python': split_python_segments,
+    'java': split_brace_segments,
+    'cpp': split_brace_segments
+}
+
+
+# Columns holding absolute line numbers
+LINE_KEYS = ('line', 'end_line')
+
+
+def shift_analysis(analysis: Dict[str, Any], delta: int) -> None:
+    if not delta:
+        return
+    for entries in analysis.values():
+        if isinstance(entries, RecordTable):
+            for key in LINE_KEYS:
+                entries.shift(key, delta)
+        elif isinstance(entries, list):
+            for entry in entries:
+                for key in LINE_KEYS:
+                    if entry.get(key):
+                        entry[key] += delta
+
+
+def parse_segments(language: str, texts: List[str],
+                   fields: Optional[set]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    # Runs in an analysis worker: the analysis of each fragment, and the
+    # truncation notes made while parsing them
+    parser = PARSERS[language]()
+    with limits.collect() as notes:
+        analyses = [parser.parse_code(text, fields) for text in texts]
+    return analyses, notes
+
+
+def render_views(analysis: Dict[str, Any], language: str, views: List[str],
+                 output_format: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    # Runs in an analysis worker, like parse_segments
+    with limits.collect() as notes:
+        visualization = CodeVisualizer(output_format).generate_visualization(analysis, language, views)
+    return visualization, notes
+
+
+def _call(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    return fn(*args, **kwargs)
+
+
+def _relay(notes: List[Dict[str, Any]]) -> None:
+    # Adds notes returned by a worker to the notes collected for this update
+    for info in notes:
+        limits.note(**info)
+
+
+class Segment:
+    __slots__ = ('id', 'start', 'end', 'text', 'analysis', 'error')
+
+    def __init__(self, segment_id: int, start: int, end: int, text: str):
+        self.id = segment_id
+        self.start = start
+        self.end = end
+        self.text = text
+        self.analysis: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {'id': self.id, 'start': self.start, 'end': self.end}
+
+
+class AnalysisSession:
+    def __init__(self, language: str, code: str, output_format: str = 'json',
+                 views: Optional[List[str]] = None, fields: Optional[List[str]] = None,
+                 bodies: bool = True, encoding: str = 'json', max_lines: Optional[int] = None,
+                 run: Optional[Callable] = None):
+        # Parsing and rendering go through run(fn, *args), e.g. an analysis
+        # executor's, so they get its time and memory limits; by default they
+        # run in the calling thread
+        self.id = uuid.uuid4().hex
+        self.language = language
+        self.parser = PARSERS[language]()
+        self.output_format = output_format
+        self.run = run or _call
+        self.views = list(VIEWS) if views is None else list(views)
+        self.fields = fields
+        self.bodies = bodies
+        self.columns = encoding == 'columns'
+        self.max_lines = max_lines
+        self.parse_fields = None if fields is None else set(fields) | required_fields(views)
+        self.version = 0
+        self.lines: List[str] = []
+        self.segments: List[Segment] = []
+        self.touched_at = time.monotonic()
+        self.lock = threading.Lock()
+        self._next_id = 0
+        self._whole_file = False
+        self.initial_delta = self._update(code.split('\n'))
+
+    def apply_edits(self, edits: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        # Each edit replaces the 1-based inclusive line range [start, end] with
+        # text; end = start - 1 inserts before start and text None deletes.
+        lines = list(self.lines)
+        for edit in edits:
+            start = int(edit['start'])
+            end = int(edit.get('end', start))
+            if not 1 <= start <= len(lines) + 1 or not start - 1 <= end <= len(lines):
+                raise ValueError(f'Edit range {start}-{end} is outside the document')
+            text = edit.get('text')
+            if text is not None and not isinstance(text, str):
+                raise ValueError('Edit text must be a string or null')
+            lines[start - 1:end] = [] if text is None else text.split('\n')
+        if self.max_lines and len(lines) > self.max_lines:
+            raise ValueError(f'Document would exceed {self.max_lines} lines')
+        return self._update(lines)
+
+    def merged_analysis(self) -> Dict[str, Any]:
+        merged = {name: RecordTable(self.parser.COLUMNS[name]) for name in self._collected_fields()}
+        root = _STRUCTURE_ROOTS.get(self.language)
+        if root is not None and 'code_structure' in merged:
+            merged['code_structure'].append(root)
+        for segment in self.segments:
+            for name, entries in segment.analysis.items():
+                merged[name].extend(entries)
+        return merged
+
+    def errors(self) -> List[Dict[str, Any]]:
+        return [{'line': segment.start, 'error': segment.error}
+                for segment in self.segments if segment.error]
+
+    def _collected_fields(self) -> Iterable[str]:
+        fields = self.parser.FIELDS
+        return fields if self.parse_fields is None else [f for f in fields if f in self.parse_fields]
+
+    def _update(self, lines: List[str]) -> Dict[str, Any]:
+        with limits.collect() as notes:
+            delta = self._apply(lines)
+        if notes:
+            delta['truncated'] = notes
+        return delta
+
+    def _apply(self, lines: List[str]) -> Dict[str, Any]:
+        ranges = [(1, len(lines))] if self._whole_file else SPLITTERS[self.language](lines)
+
+        # Unchanged segments are matched by their text and only shifted; the
+        # rest are parsed together in one call. Nothing is changed until that
+        # call returned, so a timeout leaves the session as it was.
+        reusable = defaultdict(deque)
+        for segment in self.segments:
+            reusable[segment.text].append(segment)
+        planned = []
+        for start, end in ranges:
+            text = '\n'.join(lines[start - 1:end])
+            candidates = reusable.get(text)
+            planned.append((start, end, text, candidates.popleft() if candidates else None))
+        dropped = [segment for queue in reusable.values() for segment in queue]
+        parsed = iter(self._parse_segments([(start, end, text) for start, end, text, segment in planned
+                                            if segment is None]))
+
+        segments, added, shifts = [], [], []
+        for start, end, text, segment in planned:
+            if segment is None:
+                segment = next(parsed)
+                added.append(segment)
+            elif segment.start != start:
+                shifts.append((segment, start, end))
+            segments.append(segment)
+
+        # Fall back to one whole-file segment if splitting produced fragments
+        # that do not parse on their own but the full source does
+        whole_file = self._whole_file
+        if not whole_file and any(segment.error for segment in added) and len(ranges) > 1:
+            whole, = self._parse_segments([(1, len(lines), '\n'.join(lines))])
+            if not whole.error:
+                whole_file = True
+                dropped = list(self.segments)
+                segments, added, shifts = [whole], [whole], []
+
+        previous = (self.lines, self.segments, self.version, self._whole_file)
+        moved, undo = [], []
+        for segment, start, end in shifts:
+            undo.append((segment, segment.start, segment.end))
+            shift_analysis(segment.analysis, start - segment.start)
+            moved.append({**segment.describe(), 'start': start, 'end': end,
+                          'shift': start - segment.start})
+            segment.start, segment.end = start, end
+        self.lines = lines
+        self.segments = segments
+        self._whole_file = whole_file
+        self.version += 1
+
+        # Only views reading a field that gained, lost or moved entries are redrawn
+        changed = {name for segment in added + dropped for name, entries in segment.analysis.items()
+                   if entries}
+        moved_ids = {item['id'] for item in moved}
+        changed.update(name for segment in segments if segment.id in moved_ids
+                       for name, entries in segment.analysis.items() if entries)
+        if self.version == 1:
+            stale = self.views
+        else:
+            stale = [name for name in self.views if changed & set(VIEWS[name].requires)]
+
+        visualization = {}
+        if stale:
+            try:
+                visualization, notes = self.run(render_views, self.merged_analysis(), self.language,
+                                                stale, self.output_format)
+            except Exception:
+                # Undo the update so the client can retry against the same version
+                for segment, old_start, old_end in undo:
+                    shift_analysis(segment.analysis, old_start - segment.start)
+                    segment.start, segment.end = old_start, old_end
+                self.lines, self.segments, self.version, self._whole_file = previous
+                raise
+            _relay(notes)
+        self.touched_at = time.monotonic()
+        return {
+            'version': self.version,
+            'lines': len(lines),
+            'removed': [segment.id for segment in dropped],
+            'moved': moved,
+            'added': [
+                {**segment.describe(),
+                 'analysis': select_analysis(segment.analysis, self.fields, self.bodies,
+                                             self.columns)}
+                for segment in added
+            ],
+            'errors': self.errors(),
+            'visualization': visualization
+        }
+
+    def _parse_segments(self, ranges: List[Tuple[int, int, str]]) -> List[Segment]:
+        if not ranges:
+            return []
+        analyses, notes = self.run(parse_segments, self.language, [text for _, _, text in ranges],
+                                   self.parse_fields)
+        _relay(notes)
+        segments = []
+        for (start, end, text), analysis in zip(ranges, analyses):
+            segment = Segment(self._next_id, start, end, text)
+            self._next_id += 1
+            segments.append(segment)
+            if 'error' in analysis:
+                segment.error = analysis['error']
+                continue
+            if self.language in _STRUCTURE_ROOTS and analysis.get('code_structure'):
+                # The fragment's own root is always the first structure row
+                analysis['code_structure'] = analysis['code_structure'][1:]
+            shift_analysis(analysis, start - 1)
+            segment.analysis = analysis
+        return segments
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = 256, ttl: float = 900.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: 'OrderedDict[str, AnalysisSession]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session: AnalysisSession) -> None:
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> Optional[AnalysisSession]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.touched_at <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
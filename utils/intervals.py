@@ -0,0 +1,53 @@
+from bisect import bisect_right
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class IntervalIndex:
+    # Resolves the innermost span containing a line in O(log n). Nested spans
+    # are flattened into sorted boundaries, each naming the span that owns the
+    # lines up to the next boundary.
+    __slots__ = ('_starts', '_owners')
+
+    def __init__(self, spans: Iterable[Tuple[int, int, Any]]):
+        self._starts: List[int] = []
+        self._owners: List[Any] = []
+        stack = []
+        # Outer spans first when two start on the same line
+        for start, end, owner in sorted(spans, key=lambda span: (span[0], -(span[1] or 0))):
+            # Spans without an end cover their first line; overlaps are clipped to the parent
+            end = max(end or start, start)
+            self._close(stack, start, end)
+            if stack:
+                end = min(end, stack[-1][0])
+            stack.append((end, owner))
+            self._add(start, owner)
+        self._close(stack, None, None)
+
+    def _add(self, start: int, owner: Any) -> None:
+        if self._starts and self._starts[-1] == start:
+            self._owners[-1] = owner
+        else:
+            self._starts.append(start)
+            self._owners.append(owner)
+
+    def _close(self, stack: list, line: Optional[int], end: Optional[int]) -> None:
+        # Ends the spans that stop before line, handing their lines back to the
+        # parent. A span ending on line itself is a sibling of the new span
+        # unless the new span fits on that line, and the shared line goes to
+        # the new span.
+        while stack and (line is None or stack[-1][0] < line or
+                         (stack[-1][0] == line and end > line)):
+            closed, _ = stack.pop()
+            if line is None or closed < line:
+                self._add(closed + 1, stack[-1][1] if stack else None)
+
+    def boundaries(self) -> Tuple[List[int], List[Any]]:
+        # The sorted starts and their owners, for lookups of many lines at once
+        return self._starts, self._owners
+
+    def find(self, line: int, default: Any = None) -> Any:
+        i = bisect_right(self._starts, line) - 1
+        if i < 0:
+            return default
+        owner = self._owners[i]
+        return default if owner is None else owner
@@ -1,74 +1,606 @@
+import hashlib
+import os
 import javalang
-from typing import Dict, List, Any
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from utils.cache import LRUCache
+from utils.records import RecordTable
+from utils.source import SourceBuffer
+from utils import cfg, limits, structures
+
+# Parsed sources are kept per source hash, so resubmitted and project files
+# are tokenized and parsed once per worker. Entries are sized by estimate.
+PARSE_CACHE_BYTES = int(os.environ.get('JAVA_PARSE_CACHE_BYTES', 64 * 1024 * 1024))
+# Files with at least this many lines are scanned from their tokens instead of
+# parsed when only SCANNED_FIELDS are requested; 0 always parses
+FAST_PATH_LINES = int(os.environ.get('JAVA_FAST_PATH_LINES', 5000))
+SCANNED_FIELDS = frozenset(('functions', 'classes', 'loops', 'conditionals', 'calls', 'imports'))
+
+# Estimated bytes held per source character, measured on the benchmark corpus
+_TREE_BYTES_PER_CHAR = 45
+_SCAN_BYTES_PER_CHAR = 3
+
+_Identifier = javalang.tokenizer.Identifier
+_Keyword = javalang.tokenizer.Keyword
+_Modifier = javalang.tokenizer.Modifier
+_Annotation = javalang.tokenizer.Annotation
+_Separator = javalang.tokenizer.Separator
+_BasicType = javalang.tokenizer.BasicType
+_TYPE_KEYWORDS = {'class', 'interface', 'enum'}
+_MEMBER_ENDS = (';', '{', '}')
+_PARENS = ('paren', 'creator')
+
+# Node types handled by the tree walk, first match wins
+_HANDLED = (
+    (javalang.tree.Import, 'imports'),
+    (javalang.tree.ClassDeclaration, 'classes'),
+    ((javalang.tree.MethodDeclaration, javalang.tree.ConstructorDeclaration), 'functions'),
+    (javalang.tree.VariableDeclaration, 'variables'),
+    ((javalang.tree.ForStatement, javalang.tree.WhileStatement), 'loops'),
+    (javalang.tree.IfStatement, 'conditionals'),
+    (javalang.tree.MethodInvocation, 'calls')
+)
+
+
+def _node_kinds() -> Dict[type, str]:
+    # Every javalang node class with a handler, subclasses included
+    kinds = {}
+    for node_type in vars(javalang.tree).values():
+        if isinstance(node_type, type) and issubclass(node_type, javalang.ast.Node):
+            for handled, kind in _HANDLED:
+                if issubclass(node_type, handled):
+                    kinds[node_type] = kind
+                    break
+    return kinds
+
+
+_NODE_KINDS = _node_kinds()
+
+
+class _Parsed:
+    __slots__ = ('tree', 'blocks', 'tables', 'error', 'size')
+
+    def __init__(self, size: int, tree=None, blocks: Optional['_Blocks'] = None,
+                 tables: Optional[Dict[str, RecordTable]] = None, error: Optional[str] = None):
+        self.tree = tree
+        self.blocks = blocks
+        self.tables = tables
+        self.error = error
+        self.size = size
+
+
+_parsed = LRUCache(PARSE_CACHE_BYTES, sizeof=lambda parsed: parsed.size)
+
 
 class JavaCodeParser:
-    def parse_code(self, code: str) -> Dict[str, Any]:
+    FIELDS = ('functions', 'classes', 'variables', 'loops', 'conditionals', 'calls', 'imports',
+              'code_structure', 'cfg', 'data_structures')
+    COLUMNS = {
+        'functions': ('name', 'line', 'end_line', 'scope', 'return_type', 'parameters'),
+        'classes': ('name', 'line', 'methods'),
+        'variables': ('name', 'type', 'line'),
+        'loops': ('type', 'line'),
+        'conditionals': ('line',),
+        'calls': ('function', 'line'),
+        'imports': ('module', 'line'),
+        'code_structure': ('type', 'depth', 'line', 'code'),
+        'cfg': cfg.COLUMNS,
+        'data_structures': structures.COLUMNS
+    }
+
+    def parse_code(self, code: str, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        fields = self.FIELDS if fields is None else fields
+        digest = hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+        if FAST_PATH_LINES and SCANNED_FIELDS.issuperset(fields) and code.count('\n') >= FAST_PATH_LINES:
+            return self._scanned(digest, code, fields)
+        parsed = _parsed.get(digest)
+        if parsed is None:
+            try:
+                # Tokenized here so method bodies can be matched to their closing braces
+                tokens = list(javalang.tokenizer.tokenize(code))
+                tree = javalang.parser.Parser(tokens).parse()
+                parsed = _Parsed(len(code) * _TREE_BYTES_PER_CHAR, tree=tree, blocks=_Blocks(tokens))
+            except RecursionError:
+                parsed = _Parsed(len(code), error='Code is nested too deeply to analyze')
+            except Exception as e:
+                parsed = _Parsed(len(code), error=f'Parse error: {e}')
+            _parsed.put(digest, parsed)
+        if parsed.error is not None:
+            return {'error': parsed.error}
         try:
-            tree = javalang.parse.parse(code)
-            return self._analyze_tree(tree, code)
+            return self._analyze_tree(parsed.tree, code, fields, blocks=parsed.blocks)
+        except RecursionError:
+            return {'error': 'Code is nested too deeply to analyze'}
         except Exception as e:
             return {'error': f'Parse error: {e}'}
 
-    def _analyze_tree(self, tree, code: str) -> Dict[str, Any]:
-        analysis = {
-            'methods': [],
-            'classes': [],
-            'variables': [],
-            'loops': [],
-            'conditionals': [],
-            'calls': [],
-            'imports': [],
-            'code_structure': []
+    def _scanned(self, digest: str, code: str, fields: Iterable[str]) -> Dict[str, Any]:
+        # The scanner fills all of its fields at once; callers get copies
+        # because sessions shift the line numbers of what they are given
+        key = digest + ':scan'
+        parsed = _parsed.get(key)
+        if parsed is None:
+            try:
+                tables = {field: RecordTable(self.COLUMNS[field]) for field in self.FIELDS
+                          if field in SCANNED_FIELDS}
+                self._scan(list(javalang.tokenizer.tokenize(code)), tables)
+                parsed = _Parsed(len(code) * _SCAN_BYTES_PER_CHAR, tables=tables)
+            except Exception as e:
+                parsed = _Parsed(len(code), error=f'Parse error: {e}')
+            _parsed.put(key, parsed)
+        if parsed.error is not None:
+            return {'error': parsed.error}
+        return {field: parsed.tables[field][:] for field in self.FIELDS if field in fields}
+
+    def _analyze_tree(self, tree, code: str, fields: Optional[Iterable[str]] = None,
+                      tokens: Optional[List[Any]] = None,
+                      blocks: Optional['_Blocks'] = None) -> Dict[str, Any]:
+        fields = self.FIELDS if fields is None else fields
+        analysis = {field: RecordTable(self.COLUMNS[field]) for field in self.FIELDS if field in fields}
+        if blocks is None:
+            blocks = _Blocks(tokens if tokens is not None else javalang.tokenizer.tokenize(code))
+        # Handlers write to a walker made per call, so one parser can analyze
+        # several sources at once
+        walker = _TreeWalk(analysis, blocks)
+        handlers = {
+            'imports': walker.imports,
+            'classes': walker.classes,
+            'functions': walker.functions,
+            'variables': walker.variables,
+            'loops': walker.loops,
+            'conditionals': walker.conditionals,
+            'calls': walker.calls
         }
-        
-        lines = code.split('\n')
-        
-        for path, node in tree:
-            # Classes
-            if isinstance(node, javalang.tree.ClassDeclaration):
-                analysis['classes'].append({
-                    'name': node.name,
-                    'line': node.position.line if node.position else 0,
-                    'methods': [m.name for m in node.methods] if node.methods else []
-                })
-            
-            # Methods
-            elif isinstance(node, javalang.tree.MethodDeclaration):
-                analysis['methods'].append({
-                    'name': node.name,
-                    'line': node.position.line if node.position else 0,
-                    'return_type': node.return_type.name if node.return_type else 'void',
-                    'parameters': [{'type': param.type.name, 'name': param.name} 
-                                 for param in node.parameters] if node.parameters else []
-                })
-            
-            # Variables
-            elif isinstance(node, javalang.tree.VariableDeclaration):
-                for declarator in node.declarators:
-                    analysis['variables'].append({
-                        'name': declarator.name,
-                        'type': node.type.name,
-                        'line': node.position.line if node.position else 0
-                    })
-            
-            # Loops
-            elif isinstance(node, (javalang.tree.ForStatement, javalang.tree.WhileStatement)):
-                analysis['loops'].append({
-                    'type': 'for' if isinstance(node, javalang.tree.ForStatement) else 'while',
-                    'line': node.position.line if node.position else 0
-                })
-            
-            # Conditionals
-            elif isinstance(node, javalang.tree.IfStatement):
-                analysis['conditionals'].append({
-                    'line': node.position.line if node.position else 0
-                })
-            
-            # Method calls
-            elif isinstance(node, javalang.tree.MethodInvocation):
-                analysis['calls'].append({
-                    'method': node.member,
-                    'line': node.position.line if node.position else 0
-                })
-        
-        return analysis
\ No newline at end of file
+        wanted = {kind for kind in handlers if kind in analysis}
+        if 'cfg' in analysis:
+            wanted.add('functions')
+        dispatch = {node_type: (handlers[kind],) for node_type, kind in _NODE_KINDS.items()
+                    if kind in wanted}
+        # Data structures are inferred from the same walk and classified at its end
+        inference = structures.JavaInference() if 'data_structures' in analysis else None
+        if inference is not None:
+            for node_type, handler in inference.handlers.items():
+                dispatch[node_type] = dispatch.get(node_type, ()) + (handler,)
+
+        # The structure gets one row per node, so its columns are appended to directly
+        structure = analysis.get('code_structure')
+        if structure is not None:
+            types, depths, lines, codes = (structure.column(name) for name in self.COLUMNS['code_structure'])
+            source = SourceBuffer(code)
+
+        # Preorder walk with an explicit stack, in the order of javalang's own
+        # iteration; each entry carries the names of the enclosing type
+        # declarations, the qualified name of the enclosing method and the
+        # node depth, which lists pass through unchanged
+        type_declaration = javalang.tree.TypeDeclaration
+        method_declaration = (javalang.tree.MethodDeclaration, javalang.tree.ConstructorDeclaration)
+        node_type = javalang.ast.Node
+        stack: List[Tuple[Any, Tuple[str, ...], Optional[str], int]] = [(tree, (), None, 0)]
+        remaining = limits.MAX_NODES
+        while stack:
+            item, scope, owner, depth = stack.pop()
+            if not isinstance(item, node_type):
+                stack.extend((child, scope, owner, depth) for child in reversed(item)
+                             if isinstance(child, (node_type, list, tuple)))
+                continue
+            remaining -= 1
+            if remaining < 0:
+                limits.note(stage='parse', limit='nodes', max=limits.MAX_NODES)
+                break
+
+            if structure is not None:
+                position = item.position
+                line = position.line if position is not None else 0
+                types.append(type(item).__name__)
+                depths.append(depth)
+                lines.append(line)
+                codes.append(source.span(line, line) if line else '')
+
+            for handler in dispatch.get(type(item), ()):
+                handler(item, scope, owner)
+
+            if isinstance(item, type_declaration):
+                scope, owner = scope + (item.name,), None
+            elif isinstance(item, method_declaration):
+                owner = '.'.join(scope + (item.name,))
+            depth += 1
+            stack.extend((child, scope, owner, depth) for child in reversed(item.children)
+                         if isinstance(child, (node_type, list, tuple)))
+
+        if inference is not None:
+            analysis['data_structures'].extend(inference.rows())
+        return analysis
+
+    def _scan(self, tokens: List[Any], analysis: Dict[str, RecordTable]) -> None:
+        # One pass over the tokens that recognizes declarations by their shape,
+        # without building a tree. Rows match the full parse for ordinary code,
+        # except that calls within one statement may come in a different order.
+        functions = analysis['functions']
+        classes = analysis['classes']
+        loops = analysis['loops']
+        conditionals = analysis['conditionals']
+        calls = analysis['calls']
+        imports = analysis['imports']
+        blocks = _Blocks(tokens)
+
+        stack: List[_Block] = []  # open '(' and '{'
+        declared = None  # (keyword, name, methods) of the type whose body comes next
+        creator = False  # between 'new' and its arguments
+        do_depths: List[int] = []
+
+        count = len(tokens)
+        i = 0
+        while i < count:
+            token = tokens[i]
+            kind = type(token)
+            value = token.value
+            top = stack[-1] if stack else None
+            # Directly inside a class body, reading the declaration of a member
+            member = top if top is not None and top.kind == 'body' and not top.constants else None
+
+            if kind is _Annotation:
+                if i + 1 < count and tokens[i + 1].value == 'interface':
+                    # @interface declares an annotation type
+                    if i + 2 < count and type(tokens[i + 2]) is _Identifier:
+                        declared = ('@interface', tokens[i + 2].value, None)
+                    i += 3
+                    continue
+                i = _skip_annotation(tokens, i)
+                continue
+
+            if member is not None and member.start is None and kind is not _Modifier \
+                    and value not in _MEMBER_ENDS:
+                member.start = i
+
+            if kind is _Keyword:
+                if value == 'import' and top is None:
+                    j = i + 1
+                    path = []
+                    while j < count and tokens[j].value != ';':
+                        if type(tokens[j]) is not _Modifier:
+                            path.append(tokens[j].value)
+                        j += 1
+                    module = ''.join(path)
+                    imports.append({'module': module[:-2] if module.endswith('.*') else module,
+                                    'line': token.position.line})
+                    i = j
+                    continue
+                if value in _TYPE_KEYWORDS and i + 1 < count and type(tokens[i + 1]) is _Identifier \
+                        and not (i and tokens[i - 1].value == '.'):
+                    name = tokens[i + 1].value
+                    methods = None
+                    if value == 'class':
+                        methods = []
+                        classes.append({'name': name, 'line': token.position.line, 'methods': methods})
+                    declared = (value, name, methods)
+                    i += 2
+                    continue
+                if value == 'new':
+                    creator = not (i and tokens[i - 1].value == '::')
+                elif value == 'for':
+                    loops.append({'type': 'for', 'line': token.position.line})
+                elif value == 'while':
+                    # The while of a do loop is not a loop of its own
+                    if do_depths and do_depths[-1] == len(stack):
+                        do_depths.pop()
+                    else:
+                        loops.append({'type': 'while', 'line': token.position.line})
+                elif value == 'do':
+                    do_depths.append(len(stack))
+                elif value == 'if':
+                    conditionals.append({'line': token.position.line})
+
+            elif kind is _Separator:
+                if value == '(':
+                    named = i and type(tokens[i - 1]) is _Identifier
+                    if creator:
+                        creator = False
+                        stack.append(_Block('creator'))
+                    elif named and member is not None and not member.assigned and not member.declared \
+                            and not member.annotation:
+                        i = self._declare(tokens, member, i, stack, blocks, functions)
+                        continue
+                    else:
+                        # Calls are in code, arguments and field initializers
+                        if named and (top is None or top.kind != 'body' or member is not None
+                                      and member.assigned):
+                            line = _call_line(tokens, i - 1)
+                            if line:
+                                calls.append({'function': tokens[i - 1].value, 'line': line})
+                        stack.append(_Block('paren'))
+                elif value == ')':
+                    closed = stack.pop() if stack and stack[-1].kind in _PARENS else None
+                    if closed is not None and closed.kind == 'creator' and i + 1 < count \
+                            and tokens[i + 1].value == '{':
+                        # Anonymous class body
+                        stack.append(_Block('body'))
+                        i += 2
+                        continue
+                elif value == '{':
+                    if declared is not None:
+                        block = _Block('body', declared[1], declared[2], constants=declared[0] == 'enum')
+                        # Elements of annotation types are not methods
+                        block.annotation = declared[0] == '@interface'
+                        block.ends_member = True
+                        declared = None
+                    elif top is not None and top.kind == 'body' and top.constants and i and (
+                            tokens[i - 1].value == ')' or type(tokens[i - 1]) is _Identifier):
+                        # Body of an enum constant
+                        block = _Block('body')
+                    else:
+                        block = _Block('code')
+                        # Method bodies and initializer blocks end the member,
+                        # array initializers and lambdas belong to a field
+                        block.ends_member = member is not None and not member.assigned
+                    creator = False
+                    stack.append(block)
+                elif value == '}':
+                    # Parentheses the scanner could not match end with their block
+                    while stack and stack[-1].kind in _PARENS:
+                        stack.pop()
+                    closed = stack.pop() if stack else None
+                    if closed is not None and closed.ends_member and stack and stack[-1].kind == 'body':
+                        stack[-1].reset()
+                elif value == ';':
+                    creator = False
+                    if top is not None and top.kind == 'body':
+                        top.constants = False
+                        top.reset()
+                elif value == '[':
+                    creator = False
+
+            elif value == '=' and member is not None:
+                member.assigned = True
+
+            i += 1
+
+    @staticmethod
+    def _declare(tokens: List[Any], member: '_Block', i: int, stack: List['_Block'],
+                 blocks: '_Blocks', functions: RecordTable) -> int:
+        # Method or constructor declared in member's body; tokens[i] is the '('
+        # of its parameters. Returns the index after the parameter list.
+        member.declared = True
+        name = tokens[i - 1].value
+        start = tokens[member.start]
+        constructor = name == member.name
+        if not constructor and member.methods is not None:
+            member.methods.append(name)
+
+        end = _skip_parens(tokens, i)
+        parameters = []
+        for param in _split_parameters(tokens, i + 1, end - 1):
+            param_type = _type_name(param)
+            names = [token.value for token in param if type(token) is _Identifier]
+            if param_type and names:
+                parameters.append({'type': param_type, 'name': names[-1]})
+
+        j = end
+        while j < len(tokens) and tokens[j].value not in _MEMBER_ENDS:
+            j += 1
+        line = start.position.line
+        functions.append({
+            'name': name,
+            'line': line,
+            'end_line': blocks.end_line(tokens[j].position) if j < len(tokens) and tokens[j].value == '{'
+            else line,
+            'scope': '.'.join(block.name for block in stack if block.name),
+            'return_type': 'void' if constructor else _type_name(tokens[member.start:i - 1]) or 'void',
+            'parameters': parameters
+        })
+        return end
+
+
+class _TreeWalk:
+    # Rows collected by one tree walk; a method per handled node kind
+    def __init__(self, analysis: Dict[str, RecordTable], blocks: '_Blocks'):
+        self.analysis = analysis
+        self.blocks = blocks
+
+    def imports(self, node, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        self.analysis['imports'].append({
+            'module': node.path,
+            'line': node.position.line if node.position else 0
+        })
+
+    def classes(self, node, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        self.analysis['classes'].append({
+            'name': node.name,
+            'line': node.position.line if node.position else 0,
+            'methods': [m.name for m in node.methods] if node.methods else []
+        })
+
+    # Methods and constructors, with their control-flow graphs
+    def functions(self, node, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        line = node.position.line if node.position else 0
+        end_line = self.blocks.method_end(node.position) if node.body is not None else line
+        scope = '.'.join(scope)
+        if 'cfg' in self.analysis:
+            builder = cfg.JavaCFGBuilder().build(line, end_line, node.body or [])
+            self.analysis['cfg'].extend(builder.rows(f'{scope}.{node.name}' if scope else node.name))
+        if 'functions' in self.analysis:
+            return_type = getattr(node, 'return_type', None)
+            self.analysis['functions'].append({
+                'name': node.name,
+                'line': line,
+                'end_line': end_line,
+                'scope': scope,
+                'return_type': return_type.name if return_type else 'void',
+                'parameters': [{'type': param.type.name, 'name': param.name}
+                               for param in node.parameters] if node.parameters else []
+            })
+
+    def variables(self, node, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        for declarator in node.declarators:
+            self.analysis['variables'].append({
+                'name': declarator.name,
+                'type': node.type.name,
+                'line': node.position.line if node.position else 0
+            })
+
+    def loops(self, node, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        self.analysis['loops'].append({
+            'type': 'for' if isinstance(node, javalang.tree.ForStatement) else 'while',
+            'line': node.position.line if node.position else 0
+        })
+
+    def conditionals(self, node, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        self.analysis['conditionals'].append({
+            'line': node.position.line if node.position else 0
+        })
+
+    def calls(self, node, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        self.analysis['calls'].append({
+            'function': node.member,
+            'line': node.position.line if node.position else 0
+        })
+
+
+class _Block:
+    # An open '(' or '{' seen by the scanner. Class bodies ('body') also hold
+    # the state of the member declaration being read.
+    __slots__ = ('kind', 'name', 'methods', 'constants', 'annotation', 'ends_member', 'start',
+                 'assigned', 'declared')
+
+    def __init__(self, kind: str, name: Optional[str] = None, methods: Optional[List[str]] = None,
+                 constants: bool = False):
+        self.kind = kind
+        self.name = name
+        self.methods = methods
+        self.constants = constants  # enum constants come before the first ';'
+        self.annotation = False
+        self.ends_member = False
+        self.reset()
+
+    def reset(self) -> None:
+        self.start = None  # index of the member's first token after modifiers
+        self.assigned = False  # an '=' started a field initializer
+        self.declared = False  # the parameter list of a method was read
+
+
+def _skip_parens(tokens: List[Any], i: int) -> int:
+    # Index after the ')' matching the '(' at i
+    depth = 0
+    for j in range(i, len(tokens)):
+        value = tokens[j].value
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+            if depth == 0:
+                return j + 1
+    return len(tokens)
+
+
+def _skip_annotation(tokens: List[Any], i: int) -> int:
+    # Index after the annotation starting with the '@' at i
+    i += 2
+    while i + 1 < len(tokens) and tokens[i].value == '.' and type(tokens[i + 1]) is _Identifier:
+        i += 2
+    if i < len(tokens) and tokens[i].value == '(':
+        i = _skip_parens(tokens, i)
+    return i
+
+
+def _split_parameters(tokens: List[Any], start: int, end: int) -> Iterator[List[Any]]:
+    # Tokens of each parameter without annotations and modifiers, split at
+    # commas outside type arguments
+    param = []
+    depth = 0
+    i = start
+    while i < end:
+        token = tokens[i]
+        value = token.value
+        if type(token) is _Annotation:
+            i = _skip_annotation(tokens, i)
+            continue
+        if value == '<':
+            depth += 1
+        elif value == '>':
+            depth -= 1
+        elif value == ',' and depth == 0:
+            yield param
+            param = []
+            i += 1
+            continue
+        if type(token) is not _Modifier:
+            param.append(token)
+        i += 1
+    if param:
+        yield param
+
+
+def _type_name(tokens: List[Any]) -> Optional[str]:
+    # Name of the type the tokens start with, after any type parameters. For
+    # qualified names this is the first part, as in javalang's Type.name.
+    depth = 0
+    for token in tokens:
+        value = token.value
+        if value == '<':
+            depth += 1
+        elif value == '>':
+            depth -= 1
+        elif depth == 0:
+            if value == 'void':
+                return None
+            if type(token) in (_Identifier, _BasicType):
+                return value
+    return None
+
+
+def _call_line(tokens: List[Any], i: int) -> int:
+    # Line javalang gives the invocation of the method named at i: the start
+    # of its qualifier, or the '.' when it is called on a more complex
+    # expression. 0 for super.method(), which is a different node type.
+    j = i
+    while j >= 2 and tokens[j - 1].value == '.' and type(tokens[j - 2]) is _Identifier:
+        j -= 2
+    if j and tokens[j - 1].value == '.':
+        if j >= 2 and tokens[j - 2].value == 'super':
+            return 0
+        return tokens[j - 1].position.line
+    return tokens[j].position.line
+
+
+class _Blocks:
+    # Line of the closing brace for every opening brace, looked up by position
+    # and the closing parenthesis for every opening one
+    def __init__(self, tokens: Iterable[Any]):
+        self.starts: List[Tuple[int, int]] = []
+        self.ends: List[int] = []
+        self.opens: List[Tuple[int, int]] = []
+        self.closes: List[Any] = []
+        stack = []
+        parens = []
+        for token in tokens:
+            if not isinstance(token, javalang.tokenizer.Separator):
+                continue
+            if token.value == '{':
+                stack.append(len(self.starts))
+                self.starts.append(tuple(token.position))
+                self.ends.append(token.position.line)
+            elif token.value == '}' and stack:
+                self.ends[stack.pop()] = token.position.line
+            elif token.value == '(':
+                parens.append(len(self.opens))
+                self.opens.append(tuple(token.position))
+                self.closes.append(token.position)
+            elif token.value == ')' and parens:
+                self.closes[parens.pop()] = token.position
+
+    def end_line(self, position) -> int:
+        # End of the first block opened at or after position
+        if position is None:
+            return 0
+        i = bisect_left(self.starts, tuple(position))
+        return self.ends[i] if i < len(self.ends) else position.line
+
+    def method_end(self, position) -> int:
+        # End of the body of the method named at position. The body is the
+        # first block after the parameter list, which skips any braces in
+        # annotations on the parameters.
+        if position is None:
+            return 0
+        i = bisect_left(self.opens, tuple(position))
+        if i == len(self.opens):
+            return position.line
+        return self.end_line(self.closes[i])
@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+def encode_event(event: str, data: Optional[bytes] = None, **fields: Any) -> bytes:
+    # data is already-serialized JSON and is spliced in without re-encoding
+    head = json.dumps({'event': event, **fields}, sort_keys=True, separators=(',', ':')).encode()
+    if data is None:
+        return head
+    return head[:-1] + b',"data":' + data + b'}'
+
+
+class Job:
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.events: List[bytes] = []
+        self.done = False
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self._condition = threading.Condition()
+
+    def publish(self, event: bytes, final: bool = False) -> None:
+        with self._condition:
+            self.events.append(event)
+            if final:
+                self.done = True
+                self.finished_at = time.monotonic()
+            self._condition.notify_all()
+
+    def iter_events(self, heartbeat: float = 15.0) -> Iterator[Optional[bytes]]:
+        # Replays published events, then follows new ones until the job is done.
+        # None is yielded whenever nothing arrived within the heartbeat interval.
+        index = 0
+        while True:
+            with self._condition:
+                if index >= len(self.events) and not self.done:
+                    self._condition.wait(heartbeat)
+                pending = self.events[index:]
+                done = self.done
+            if not pending and not done:
+                yield None
+            index += len(pending)
+            yield from pending
+            if done and index >= len(self.events):
+                return
+
+    def status(self) -> Dict[str, Any]:
+        return {'id': self.id, 'done': self.done, 'events': len(self.events)}
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 4, ttl: float = 300.0, max_jobs: int = 1000):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, run: Callable[[Job], None]) -> Job:
+        job = Job(uuid.uuid4().hex)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, run)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, run: Callable[[Job], None]) -> None:
+        try:
+            run(job)
+        except Exception as e:
+            job.publish(encode_event('error', error=str(e), status=500), final=True)
+        finally:
+            if not job.done:
+                job.publish(encode_event('done'), final=True)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished:
+            if now - job.finished_at > self.ttl:
+                del self._jobs[job.id]
+        # Drop the oldest finished jobs once the table is full
+        if len(self._jobs) >= self.max_jobs:
+            finished = sorted((job for job in self._jobs.values() if job.done),
+                              key=lambda job: job.finished_at)
+            for job in finished[:len(self._jobs) - self.max_jobs + 1]:
+                del self._jobs[job.id]
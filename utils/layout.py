@@ -0,0 +1,207 @@
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from utils.cache import LRUCache
+
+STRATEGIES = ('tree', 'layered', 'force')
+
+# Graphs up to this size get exact pairwise repulsion in the force layout;
+# larger ones use a grid (Barnes-Hut style) approximation
+EXACT_FORCE_LIMIT = 300
+BARYCENTER_SWEEPS = 4
+DEFAULT_SEED = 42
+
+_layout_cache = LRUCache(max_bytes=32 * 1024 * 1024, sizeof=lambda pos: 64 + 96 * len(pos))
+
+
+def compute_layout(G: nx.Graph, strategy: Optional[str] = None,
+                   seed: int = DEFAULT_SEED) -> Dict[Any, Tuple[float, float]]:
+    if strategy is not None and strategy not in STRATEGIES:
+        raise ValueError(f'Unknown layout strategy: {strategy}')
+    if G.number_of_nodes() == 0:
+        return {}
+    if strategy is None:
+        strategy = choose_strategy(G)
+
+    key = _fingerprint(G, strategy, seed)
+    pos = _layout_cache.get(key)
+    if pos is None:
+        nodes = list(G.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+
+        if strategy == 'tree' and not nx.is_branching(G):
+            strategy = 'layered'
+        if strategy == 'tree':
+            xy = _tree_layout(len(nodes), edges)
+        elif strategy == 'layered':
+            xy = _layered_layout(G, nodes, index, edges)
+        else:
+            xy = _force_layout(len(nodes), edges, seed)
+
+        pos = {node: (float(x), float(y)) for node, (x, y) in zip(nodes, xy)}
+        _layout_cache.put(key, pos)
+    return pos
+
+
+def choose_strategy(G: nx.Graph) -> str:
+    if G.is_directed():
+        if nx.is_branching(G):
+            return 'tree'
+        if nx.is_directed_acyclic_graph(G):
+            return 'layered'
+    return 'force'
+
+
+def layout_cache_stats() -> Dict[str, int]:
+    return _layout_cache.stats()
+
+
+def _fingerprint(G: nx.Graph, strategy: str, seed: int) -> str:
+    digest = hashlib.sha1(f'{strategy}:{seed}:{G.is_directed()}'.encode())
+    digest.update(repr(list(G.nodes())).encode())
+    digest.update(repr(list(G.edges())).encode())
+    return digest.hexdigest()
+
+
+def _tree_layout(n: int, edges: np.ndarray) -> np.ndarray:
+    # Leaves take consecutive x slots, parents sit centered over their children
+    children = [[] for _ in range(n)]
+    has_parent = np.zeros(n, dtype=bool)
+    for parent, child in edges:
+        children[parent].append(child)
+        has_parent[child] = True
+
+    x = np.zeros(n)
+    y = np.zeros(n)
+    next_slot = 0.0
+    for root in np.flatnonzero(~has_parent):
+        stack = [(int(root), 0, False)]
+        while stack:
+            node, depth, expanded = stack.pop()
+            if expanded:
+                kids = children[node]
+                x[node] = (x[kids[0]] + x[kids[-1]]) / 2
+                continue
+            y[node] = -depth
+            if not children[node]:
+                x[node] = next_slot
+                next_slot += 1
+                continue
+            stack.append((node, depth, True))
+            for child in reversed(children[node]):
+                stack.append((int(child), depth + 1, False))
+    return np.column_stack((x, y))
+
+
+def _layered_layout(G: nx.Graph, nodes: list, index: Dict[Any, int], edges: np.ndarray) -> np.ndarray:
+    n = len(nodes)
+    # Longest-path layering over the condensation, so cycles share a layer
+    dag = nx.condensation(G) if G.is_directed() else nx.condensation(G.to_directed())
+    mapping = dag.graph['mapping']
+    component_layer = {}
+    for component in nx.topological_sort(dag):
+        preds = [component_layer[p] + 1 for p in dag.predecessors(component)]
+        component_layer[component] = max(preds, default=0)
+    layer = np.array([component_layer[mapping[node]] for node in nodes], dtype=np.int64)
+
+    # Barycenter ordering within layers, alternating predecessor and successor sweeps
+    rank = _rank_within_layers(layer, np.arange(n, dtype=float))
+    if len(edges):
+        src, dst = edges[:, 0], edges[:, 1]
+        for sweep in range(BARYCENTER_SWEEPS):
+            if sweep % 2 == 0:
+                anchor, moving = src, dst
+            else:
+                anchor, moving = dst, src
+            total = np.bincount(moving, weights=rank[anchor], minlength=n)
+            count = np.bincount(moving, minlength=n)
+            bary = np.where(count > 0, total / np.maximum(count, 1), rank)
+            rank = _rank_within_layers(layer, bary)
+
+    width = np.bincount(layer)
+    x = rank - (width[layer] - 1) / 2
+    return np.column_stack((x, -layer.astype(float)))
+
+
+def _rank_within_layers(layer: np.ndarray, key: np.ndarray) -> np.ndarray:
+    order = np.lexsort((key, layer))
+    sorted_layers = layer[order]
+    starts = np.searchsorted(sorted_layers, sorted_layers, side='left')
+    rank = np.empty(len(layer))
+    rank[order] = np.arange(len(layer)) - starts
+    return rank
+
+
+def _force_layout(n: int, edges: np.ndarray, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2))
+    if n == 1:
+        return pos
+
+    k = np.sqrt(1.0 / n)
+    iterations = 50 if n <= EXACT_FORCE_LIMIT else 30 if n <= 2000 else 20
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    src, dst = (edges[:, 0], edges[:, 1]) if len(edges) else (None, None)
+
+    for _ in range(iterations):
+        if n <= EXACT_FORCE_LIMIT:
+            displacement = _exact_repulsion(pos, k)
+        else:
+            displacement = _grid_repulsion(pos, k)
+
+        if src is not None:
+            delta = pos[src] - pos[dst]
+            distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 0.01)
+            pull = delta * (distance / k)[:, None]
+            for axis in range(2):
+                displacement[:, axis] -= np.bincount(src, weights=pull[:, axis], minlength=n)
+                displacement[:, axis] += np.bincount(dst, weights=pull[:, axis], minlength=n)
+
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 0.01)
+        pos += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+    return pos
+
+
+def _exact_repulsion(pos: np.ndarray, k: float) -> np.ndarray:
+    dx = pos[:, 0, None] - pos[None, :, 0]
+    dy = pos[:, 1, None] - pos[None, :, 1]
+    weight = k * k / np.maximum(dx * dx + dy * dy, 1e-4)
+    np.fill_diagonal(weight, 0.0)
+    return np.column_stack(((dx * weight).sum(axis=1), (dy * weight).sum(axis=1)))
+
+
+def _grid_repulsion(pos: np.ndarray, k: float) -> np.ndarray:
+    # Bucket nodes into a grid and repel from each cell's centroid, weighted by
+    # its mass. A node's own cell is corrected to exclude the node itself.
+    n = len(pos)
+    cells_per_side = int(min(12, max(2, np.sqrt(n / 8))))
+    low = pos.min(axis=0)
+    extent = np.maximum(pos.max(axis=0) - low, 1e-9)
+    cell_xy = np.minimum((pos - low) / extent * cells_per_side, cells_per_side - 1).astype(np.int64)
+    cell = cell_xy[:, 0] * cells_per_side + cell_xy[:, 1]
+    num_cells = cells_per_side * cells_per_side
+
+    mass = np.bincount(cell, minlength=num_cells).astype(float)
+    safe_mass = np.maximum(mass, 1)
+    cx = np.bincount(cell, weights=pos[:, 0], minlength=num_cells) / safe_mass
+    cy = np.bincount(cell, weights=pos[:, 1], minlength=num_cells) / safe_mass
+
+    dx = pos[:, 0, None] - cx[None, :]
+    dy = pos[:, 1, None] - cy[None, :]
+    weight = mass[None, :] * (k * k) / np.maximum(dx * dx + dy * dy, 1e-4)
+    weight[np.arange(n), cell] = 0.0
+    displacement = np.column_stack(((dx * weight).sum(axis=1), (dy * weight).sum(axis=1)))
+
+    own_mass = mass[cell] - 1
+    own_dx = pos[:, 0] - (cx[cell] * mass[cell] - pos[:, 0]) / np.maximum(own_mass, 1)
+    own_dy = pos[:, 1] - (cy[cell] * mass[cell] - pos[:, 1]) / np.maximum(own_mass, 1)
+    own_weight = own_mass * k * k / np.maximum(own_dx * own_dx + own_dy * own_dy, 1e-4)
+    displacement[:, 0] += own_dx * own_weight
+    displacement[:, 1] += own_dy * own_weight
+    return displacement
@@ -0,0 +1,50 @@
+import contextvars
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Limits applied inside the parsers and renderers. They are read from the
+# environment, like CPP_PARSER, so analysis workers use the same values as
+# the app without them being passed along with every job.
+
+# Parsers stop walking the syntax tree after this many nodes
+MAX_NODES = int(os.environ.get('ANALYSIS_MAX_NODES', 200000))
+# Larger graphs are collapsed, clustered or cut down before layout
+MAX_GRAPH_NODES = int(os.environ.get('ANALYSIS_MAX_GRAPH_NODES', 1000))
+# Longest expression text kept for variables and conditionals
+MAX_TEXT = int(os.environ.get('ANALYSIS_MAX_TEXT', 1000))
+
+_notes: contextvars.ContextVar = contextvars.ContextVar('truncation notes', default=None)
+_labels: contextvars.ContextVar = contextvars.ContextVar('truncation labels', default={})
+
+
+@contextmanager
+def collect(notes: Optional[List[Dict[str, Any]]] = None) -> Iterator[List[Dict[str, Any]]]:
+    # Gathers a note for everything cut short while the block runs, into
+    # notes if given. Generators collect around each step, not across yields.
+    notes = [] if notes is None else notes
+    token = _notes.set(notes)
+    try:
+        yield notes
+    finally:
+        _notes.reset(token)
+
+
+@contextmanager
+def context(**labels: Any) -> Iterator[None]:
+    # Labels added to the notes made inside the block, e.g. the view
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def note(**info: Any) -> None:
+    notes = _notes.get()
+    if notes is not None:
+        notes.append({**_labels.get(), **info})
+
+
+def clip(text: str) -> str:
+    return text if len(text) <= MAX_TEXT else text[:MAX_TEXT] + '...'
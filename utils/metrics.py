@@ -0,0 +1,166 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 64 B .. 16 MiB
+SIZE_BUCKETS = tuple(float(4 ** i) for i in range(3, 13))
+COUNT_BUCKETS = (1.0, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 10000.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str],
+                 buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                labels = _format_labels(self.labels, key, 'le="' + le + '"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {total:.6f}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('analysis_stage_seconds', 'Time spent in each analysis stage.',
+                          ('stage', 'language', 'view'), LATENCY_BUCKETS)
+REQUEST_SECONDS = Histogram('analysis_request_seconds', 'End-to-end /analyze latency.',
+                            ('language', 'cache'), LATENCY_BUCKETS)
+INPUT_BYTES = Histogram('analysis_input_bytes', 'Size of submitted code.',
+                        ('language',), SIZE_BUCKETS)
+GRAPH_NODES = Histogram('analysis_graph_nodes', 'Nodes per rendered graph.',
+                        ('language', 'view'), COUNT_BUCKETS)
+GRAPH_EDGES = Histogram('analysis_graph_edges', 'Edges per rendered graph.',
+                        ('language', 'view'), COUNT_BUCKETS)
+
+HISTOGRAMS = [STAGE_SECONDS, REQUEST_SECONDS, INPUT_BYTES, GRAPH_NODES, GRAPH_EDGES]
+
+# Observations made inside a profile, by name
+_OBSERVED = {'graph_nodes': GRAPH_NODES, 'graph_edges': GRAPH_EDGES}
+
+
+class Profile:
+    # Stage timings and observations of one analysis. It is filled wherever
+    # the work runs, including analysis workers, and recorded by the app.
+    def __init__(self, **labels: Any):
+        self.labels = labels
+        self.stages: List[Tuple[str, Dict[str, Any], float]] = []
+        self.observations: List[Tuple[str, Dict[str, Any], float]] = []
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages.append((stage, self.labels, seconds))
+
+    def merge(self, other: 'Profile') -> None:
+        self.stages.extend(other.stages)
+        self.observations.extend(other.observations)
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        return [{'stage': stage, **{name: value for name, value in labels.items() if name == 'view'},
+                 'ms': round(seconds * 1000, 3)}
+                for stage, labels, seconds in self.stages]
+
+    def server_timing(self) -> str:
+        # Server-Timing header value, e.g. "parse;dur=1.2, view.call_graph;dur=3.4"
+        entries = []
+        for stage, labels, seconds in self.stages:
+            name = f"{stage}.{labels['view']}" if labels.get('view') else stage
+            entries.append(f'{name};dur={seconds * 1000:.3f}')
+        return ', '.join(entries)
+
+    def record(self) -> None:
+        for stage, labels, seconds in self.stages:
+            STAGE_SECONDS.observe(seconds, stage=stage, **labels)
+        for name, labels, value in self.observations:
+            _OBSERVED[name].observe(value, **labels)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar('profile', default=None)
+# Labels of the innermost span. They are kept per context rather than on the
+# profile, so views running on other threads each keep their own.
+_labels: contextvars.ContextVar = contextvars.ContextVar('span labels', default={})
+
+
+@contextmanager
+def collect(**labels: Any) -> Iterator[Profile]:
+    profile = Profile(**labels)
+    token = _current.set(profile)
+    labels_token = _labels.set(profile.labels)
+    try:
+        yield profile
+    finally:
+        _labels.reset(labels_token)
+        _current.reset(token)
+
+
+@contextmanager
+def span(stage: str, **labels: Any) -> Iterator[None]:
+    # Times the block into the active profile; nested spans and observations
+    # inherit its labels. Without an active profile this does nothing.
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    outer = _labels.get()
+    inner = {**outer, **labels} if labels else outer
+    token = _labels.set(inner)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.stages.append((stage, inner, time.perf_counter() - start))
+        _labels.reset(token)
+
+
+def observe(name: str, value: float) -> None:
+    profile = _current.get()
+    if profile is not None:
+        profile.observations.append((name, _labels.get(), value))
+
+
+def render(extra: Optional[List[str]] = None) -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(extra or [])
+    return '\n'.join(lines) + '\n'
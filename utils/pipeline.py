@@ -0,0 +1,192 @@
+import cProfile
+import importlib
+import json
+import os
+import time
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.visualizer import CodeVisualizer, required_fields
+from utils import limits, metrics, records, serialization, store
+
+
+class _Parsers(Mapping):
+    # Parser classes by language. Each parser module, and the libraries it
+    # needs (javalang, clang), is imported the first time its language is used.
+    def __init__(self, paths: Dict[str, str]):
+        self._paths = paths
+        self._loaded: Dict[str, type] = {}
+
+    def __getitem__(self, language: str) -> type:
+        parser = self._loaded.get(language)
+        if parser is None:
+            module, name = self._paths[language].split(':')
+            parser = self._loaded[language] = getattr(importlib.import_module(module), name)
+        return parser
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+PARSERS = _Parsers({
+    'python': 'utils.python_parser:PythonCodeParser',
+    'java': 'utils.java_parser:JavaCodeParser',
+    'cpp': 'utils.cpp_parser:CppCodeParser'
+})
+
+
+BODY_KEYS = ('body', 'code')
+
+
+def _parse(language: str, code: str, views: Optional[List[str]],
+           fields: Optional[List[str]], record: bool = False) -> Dict[str, Any]:
+    # Parsers only collect what the response, the selected views and, when the
+    # result is recorded, the store summary need
+    parser = PARSERS[language]()
+    needed = None if fields is None else set(fields) | required_fields(views)
+    if needed is not None and record:
+        needed |= set(store.SUMMARY_FIELDS)
+    # Code metrics are derived from other categories once they are parsed;
+    # numpy loads with the first request that needs them
+    code_metrics = None
+    if needed is None or 'metrics' in needed:
+        from utils import code_metrics
+        if needed is not None:
+            needed |= set(code_metrics.REQUIRES)
+    with metrics.span('parse'):
+        analysis = parser.parse_code(code, needed)
+    if code_metrics is not None and 'error' not in analysis:
+        with metrics.span('metrics'):
+            analysis['metrics'] = code_metrics.compute(language, analysis)
+    return analysis
+
+
+def select_analysis(analysis: Dict[str, Any], fields: Optional[List[str]],
+                    bodies: bool, columns: bool = False) -> Dict[str, Any]:
+    if 'error' in analysis:
+        return analysis
+    if fields is not None:
+        analysis = {name: value for name, value in analysis.items() if name in fields}
+    if not bodies:
+        analysis = {
+            name: entries.drop(BODY_KEYS) if isinstance(entries, records.RecordTable) else
+            [{key: value for key, value in entry.items() if key not in BODY_KEYS}
+             for entry in entries]
+            for name, entries in analysis.items()
+        }
+    if columns:
+        analysis = records.columnar(analysis)
+    return analysis
+
+
+def analyze(language: str, code: str, output_format: str = 'png', views: Optional[List[str]] = None,
+            fields: Optional[List[str]] = None, bodies: bool = True,
+            encoding: str = 'json') -> Dict[str, Any]:
+    return _analyze(language, code, output_format, views, fields, bodies, encoding)[0]
+
+
+def _analyze(language: str, code: str, output_format: str, views: Optional[List[str]],
+             fields: Optional[List[str]], bodies: bool, encoding: str,
+             record: bool = False) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    # The payload, and the store summary when record is set
+    with limits.collect() as notes:
+        analysis_result = _parse(language, code, views, fields, record)
+        visualizer = CodeVisualizer(output_format)
+        visualization_data = visualizer.generate_visualization(analysis_result, language, views)
+    payload = {
+        'success': True,
+        'analysis': select_analysis(analysis_result, fields, bodies, columns=encoding != 'json'),
+        'visualization': visualization_data
+    }
+    # Whatever the limits cut short, so clients can tell a partial result apart
+    if notes:
+        payload['truncated'] = notes
+    return payload, store.summarize(code, analysis_result) if record else None
+
+
+def analyze_to_bytes(language: str, code: str, output_format: str = 'png',
+                     views: Optional[List[str]] = None, fields: Optional[List[str]] = None,
+                     bodies: bool = True, encoding: str = 'json') -> bytes:
+    # Serializing in the worker keeps both the encoding cost and the pickling
+    # of large result objects out of the web process
+    payload = analyze(language, code, output_format, views, fields, bodies, encoding)
+    with metrics.span('serialize'):
+        return serialization.encode(payload, encoding)
+
+
+def analyze_profiled(language: str, code: str, output_format: str = 'png',
+                     views: Optional[List[str]] = None, fields: Optional[List[str]] = None,
+                     bodies: bool = True, encoding: str = 'json', slow_ms: float = 0,
+                     profile_dir: Optional[str] = None,
+                     record: bool = False) -> Tuple[bytes, metrics.Profile, Optional[bytes]]:
+    # analyze_to_bytes plus its stage timings and, with record set, the store
+    # summary. With slow_ms and profile_dir set, the run is also profiled and
+    # dumped when it takes at least slow_ms.
+    profiler = cProfile.Profile() if slow_ms and profile_dir else None
+    with metrics.collect(language=language) as profile:
+        with metrics.span('analyze'):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                payload, summary = _analyze(language, code, output_format, views, fields, bodies,
+                                            encoding, record)
+                with metrics.span('serialize'):
+                    body = serialization.encode(payload, encoding)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    if profiler is not None and profile.stages[-1][2] * 1000 >= slow_ms:
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{language}-{os.getpid()}-{id(profiler):x}.prof"
+        profiler.dump_stats(os.path.join(profile_dir, name))
+    return body, profile, summary
+
+
+def iter_analyze_json(language: str, code: str, output_format: str = 'png',
+                      views: Optional[List[str]] = None, fields: Optional[List[str]] = None,
+                      bodies: bool = True, encoding: str = 'json',
+                      record: bool = False) -> Iterator[Tuple[str, bytes]]:
+    # Yields ('analysis', json) first, then (view name, json) per visualization,
+    # ('truncated', json) if any limit was hit and finally ('summary', json)
+    # for the store when record is set
+    notes = []
+    with limits.collect(notes):
+        analysis_result = _parse(language, code, views, fields, record)
+    analysis = select_analysis(analysis_result, fields, bodies, columns=encoding == 'columns')
+    yield 'analysis', serialization.dumps(analysis)
+    visualizer = CodeVisualizer(output_format)
+    visualizations = visualizer.iter_visualization(analysis_result, language, views)
+    while True:
+        with limits.collect(notes):
+            item = next(visualizations, None)
+        if item is None:
+            break
+        name, data = item
+        yield name, serialization.dumps(data)
+    if notes:
+        yield 'truncated', serialization.dumps(notes)
+    if record:
+        yield 'summary', store.summarize(code, analysis_result)
+
+
+def assemble_json(parts: Dict[str, bytes]) -> bytes:
+    # Builds the same body as analyze_to_bytes from the parts of iter_analyze_json
+    views = b','.join(
+        b'"' + name.encode() + b'":' + parts[name]
+        for name in sorted(parts) if name not in ('analysis', 'truncated')
+    )
+    truncated = b'"truncated":' + parts['truncated'] + b',' if 'truncated' in parts else b''
+    return (b'{"analysis":' + parts['analysis'] + b',"success":true,' + truncated +
+            b'"visualization":{' + views + b'}}')
+
+
+def split_json(body: bytes) -> Iterator[Tuple[str, bytes]]:
+    # Inverse of assemble_json, used to replay cached results as a stream
+    payload = json.loads(body)
+    yield 'analysis', serialization.dumps(payload['analysis'])
+    for name, data in payload['visualization'].items():
+        yield name, serialization.dumps(data)
+    if 'truncated' in payload:
+        yield 'truncated', serialization.dumps(payload['truncated'])
@@ -0,0 +1,13 @@
+import gc
+
+from utils import code_metrics, cpp_parser, java_parser, layout, pipeline, project, python_parser, renderers
+
+# The app imports parsers, networkx and matplotlib lazily, on first use. The
+# analysis fork server (and serve.py) import this module instead, loading all
+# of them once before forking so the workers share those pages.
+
+renderers.agg()
+
+# Preloaded objects are never collected; freezing them keeps the collector in
+# forked workers from writing to, and so copying, their pages
+gc.freeze()
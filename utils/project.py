@@ -0,0 +1,306 @@
+import posixpath
+import tarfile
+import zipfile
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils import limits, pipeline, records, serialization
+from utils.intervals import IntervalIndex
+from utils.visualizer import CodeVisualizer
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+LANGUAGES = {
+    '.py': 'python',
+    '.java': 'java',
+    '.cpp': 'cpp', '.cc': 'cpp', '.cxx': 'cpp', '.c': 'cpp',
+    '.hpp': 'cpp', '.hh': 'cpp', '.hxx': 'cpp', '.h': 'cpp'
+}
+
+# Categories the project graphs are built from, parsed even when not returned
+LINK_FIELDS = ('functions', 'calls', 'imports', 'includes')
+
+
+def language_for(path: str) -> Optional[str]:
+    return LANGUAGES.get(posixpath.splitext(path)[1].lower())
+
+
+def _clean_path(name: str) -> Optional[str]:
+    path = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+    if path.startswith('..') or path == '.':
+        return None
+    return path
+
+
+def _decode(data: bytes) -> str:
+    return data.decode('utf-8', errors='replace')
+
+
+def is_archive(path: str) -> bool:
+    return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+
+
+def iter_archive(fileobj: BinaryIO, max_file_bytes: int) -> Iterator[Tuple[str, Optional[str]]]:
+    # Yields (path, code) for every source file, one member at a time. Files
+    # over the size limit are yielded with code None instead of being read.
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                path = _clean_path(info.filename)
+                if info.is_dir() or path is None or language_for(path) is None:
+                    continue
+                if info.file_size > max_file_bytes:
+                    yield path, None
+                    continue
+                with archive.open(info) as member:
+                    data = member.read(max_file_bytes + 1)
+                yield path, _decode(data) if len(data) <= max_file_bytes else None
+        return
+
+    fileobj.seek(0)
+    try:
+        # Stream mode reads members in order without seeking back
+        with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+            for member in archive:
+                path = _clean_path(member.name)
+                if not member.isfile() or path is None or language_for(path) is None:
+                    continue
+                if member.size > max_file_bytes:
+                    yield path, None
+                    continue
+                yield path, _decode(archive.extractfile(member).read())
+    except tarfile.ReadError as e:
+        raise ValueError(f'Unsupported archive: {e}')
+
+
+def iter_file_list(files: Iterable[Dict[str, Any]],
+                   max_file_bytes: int) -> Iterator[Tuple[str, Optional[str]]]:
+    for entry in files:
+        path = _clean_path(str(entry.get('path', '')))
+        code = entry.get('code')
+        if path is None or language_for(path) is None or not isinstance(code, str):
+            continue
+        yield path, code if len(code.encode()) <= max_file_bytes else None
+
+
+def _module_parts(path: str) -> Tuple[str, ...]:
+    # C++ headers are included by file name, other languages import modules
+    if language_for(path) != 'cpp':
+        path = posixpath.splitext(path)[0]
+    parts = tuple(part for part in path.split('/') if part)
+    if parts and parts[-1] == '__init__':
+        parts = parts[:-1]
+    return parts
+
+
+def _qualified(scope: str, name: str) -> str:
+    return f'{scope}.{name}' if scope else name
+
+
+def _summarize(path: str, language: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    # The parts of a file's analysis that the project graphs need
+    functions = analysis.get('functions', [])
+    names = records.column(functions, 'name')
+    scopes = records.column(functions, 'scope')
+    qualified = [_qualified(scope or '', name) for scope, name in zip(scopes, names)]
+    callers = IntervalIndex(zip(records.column(functions, 'line'),
+                                records.column(functions, 'end_line'), qualified))
+
+    calls = analysis.get('calls', [])
+    call_pairs = sorted({
+        (callers.find(line, ''), function)
+        for function, line in zip(records.column(calls, 'function'), records.column(calls, 'line'))
+        if function
+    })
+
+    imports = []
+    for entry in analysis.get('imports', []):
+        module = entry.get('module') or ''
+        imports.append(module)
+        # from package import module
+        imports.extend(f'{module}.{name}' if module else name for name in entry.get('names') or [])
+    imports.extend(records.column(analysis.get('includes', []), 'header'))
+
+    return {
+        'path': path,
+        'language': language,
+        'functions': sorted(set(zip(names, qualified))),
+        'calls': call_pairs,
+        'imports': [name for name in dict.fromkeys(imports) if name]
+    }
+
+
+def analyze_files(files: List[Tuple[str, str]], fields: Optional[List[str]] = None,
+                  bodies: bool = True) -> List[Tuple[str, str, Optional[bytes], Dict[str, Any]]]:
+    # Runs in an analysis worker. Returns (path, language, analysis JSON, summary)
+    # per file; the analysis is None and the summary holds the error for files
+    # that fail to parse.
+    results = []
+    parse_fields = None if fields is None else set(fields) | set(LINK_FIELDS)
+    for path, code in files:
+        language = language_for(path)
+        with limits.collect() as notes:
+            analysis = pipeline.PARSERS[language]().parse_code(code, parse_fields)
+        if 'error' in analysis:
+            results.append((path, language, None, {'error': analysis['error']}))
+            continue
+        selected = pipeline.select_analysis(analysis, fields, bodies)
+        summary = _summarize(path, language, analysis)
+        if notes:
+            summary['truncated'] = notes
+        results.append((path, language, serialization.dumps(selected), summary))
+    return results
+
+
+def _batches(files: Iterable[Tuple[str, Optional[str]]], max_files: int, max_bytes: int,
+             skipped: Callable[[str], None]) -> Iterator[List[Tuple[str, str]]]:
+    batch, size = [], 0
+    for path, code in files:
+        if code is None:
+            skipped(path)
+            continue
+        batch.append((path, code))
+        size += len(code)
+        if len(batch) >= max_files or size >= max_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def iter_project(files: Iterable[Tuple[str, Optional[str]]], run: Callable, workers: int,
+                 fields: Optional[List[str]] = None, bodies: bool = True,
+                 batch_files: int = 64, batch_bytes: int = 1024 * 1024
+                 ) -> Iterator[Tuple[str, Any]]:
+    # Fans batches of files out to run (an executor's run method) and yields
+    # ('file', result) as batches finish, ('skipped', path) for oversized files
+    # and ('failed', (paths, error)) for batches the executor rejected. At most
+    # two batches per worker are read ahead, so memory stays bounded.
+    skipped = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='project') as pool:
+        pending = {}
+
+        def drain(block: bool):
+            done, _ = wait(pending, return_when=FIRST_COMPLETED, timeout=None if block else 0)
+            for future in done:
+                batch = pending.pop(future)
+                try:
+                    for result in future.result():
+                        yield 'file', result
+                except Exception as e:
+                    yield 'failed', ([path for path, _ in batch], e)
+
+        for batch in _batches(files, batch_files, batch_bytes, skipped.append):
+            while skipped:
+                yield 'skipped', skipped.pop(0)
+            if len(pending) >= 2 * workers:
+                yield from drain(True)
+            pending[pool.submit(run, analyze_files, batch, fields, bodies)] = batch
+            yield from drain(False)
+        while skipped:
+            yield 'skipped', skipped.pop(0)
+        while pending:
+            yield from drain(True)
+
+
+class ProjectGraph:
+    # Links per-file summaries into a file dependency graph and a cross-file call graph
+    def __init__(self):
+        self.summaries: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, summary: Dict[str, Any]) -> None:
+        self.summaries[summary['path']] = summary
+
+    def _module_index(self) -> Dict[Tuple[str, ...], List[str]]:
+        # Every path suffix of every file, so 'pkg.mod', 'com.x.Foo' and
+        # 'net/socket.h' all resolve regardless of the project root
+        index = defaultdict(list)
+        for path in sorted(self.summaries):
+            parts = _module_parts(path)
+            for i in range(len(parts)):
+                index[parts[i:]].append(path)
+        return index
+
+    def _resolve(self, index, importer: str, name: str) -> Optional[str]:
+        if self.summaries[importer]['language'] == 'cpp':
+            # Header paths are relative to the including file first
+            parts = _module_parts(posixpath.normpath(name))
+            local = _module_parts(posixpath.join(posixpath.dirname(importer), name))
+            candidates = index.get(local) or index.get(parts)
+        else:
+            candidates = index.get(tuple(part for part in name.split('.') if part))
+        if not candidates:
+            return None
+        # Prefer the candidate closest to the importing file
+        return max(candidates, key=lambda path: len(posixpath.commonprefix([path, importer])))
+
+    def dependencies(self) -> Dict[str, List[str]]:
+        index = self._module_index()
+        result = {}
+        for path, summary in self.summaries.items():
+            targets = (self._resolve(index, path, name) for name in summary['imports'])
+            result[path] = sorted({target for target in targets if target and target != path})
+        return result
+
+    def dependency_graph(self) -> 'nx.DiGraph':
+        import networkx as nx
+        G = nx.DiGraph()
+        for path, targets in self.dependencies().items():
+            G.add_node(path, type='file', language=self.summaries[path]['language'],
+                       group=posixpath.dirname(path) or '.')
+            for target in targets:
+                G.add_edge(path, target)
+        return G
+
+    def call_graph(self) -> 'nx.DiGraph':
+        # A call binds to a definition in the same file, then in a file it
+        # depends on, then to the only definition in the project. Anything
+        # else is left out as external or ambiguous.
+        definitions = defaultdict(list)
+        for path, summary in self.summaries.items():
+            for name, qualified in summary['functions']:
+                definitions[name].append((path, qualified))
+        dependencies = self.dependencies()
+
+        import networkx as nx
+        G = nx.DiGraph()
+        for path, summary in self.summaries.items():
+            for name, qualified in summary['functions']:
+                G.add_node(f'{path}:{qualified}', type='function', label=qualified, file=path,
+                           group=path)
+            nearby = set(dependencies[path])
+            for caller, callee in summary['calls']:
+                candidates = definitions.get(callee)
+                if not candidates:
+                    continue
+                target = (next((c for c in candidates if c[0] == path), None)
+                          or next((c for c in candidates if c[0] in nearby), None)
+                          or (candidates[0] if len(candidates) == 1 else None))
+                if target is None:
+                    continue
+                source = f'{path}:{caller or "<module>"}'
+                if source not in G:
+                    G.add_node(source, type='module', label=caller or '<module>', file=path,
+                               group=path)
+                G.add_edge(source, f'{target[0]}:{target[1]}')
+        return G
+
+
+def render_project(summaries: Dict[str, Dict[str, Any]], output_format: str = 'json') -> bytes:
+    # Runs in an analysis worker: links the summaries and renders both graphs
+    graph = ProjectGraph()
+    for summary in summaries.values():
+        graph.add(summary)
+    visualizer = CodeVisualizer(output_format)
+    result = {'files': len(summaries)}
+    with limits.collect() as notes:
+        for name, build in (('dependency_graph', graph.dependency_graph),
+                            ('call_graph', graph.call_graph)):
+            with limits.context(view=name):
+                result[name] = visualizer.render_graph(build(), 'layered')
+    if notes:
+        result['truncated'] = notes
+    return serialization.dumps(result)
@@ -1,113 +1,206 @@
 import ast
-import javalang
-import re
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Optional, Union
+from utils.source import SourceBuffer, SourceSpan
+from utils.records import RecordTable
+from utils import cfg, limits, structures
 
 class PythonCodeParser:
-    def parse_code(self, code: str) -> Dict[str, Any]:
+    FIELDS = ('functions', 'classes', 'variables', 'loops', 'conditionals', 'calls', 'imports',
+              'code_structure', 'cfg', 'data_structures')
+    COLUMNS = {
+        'functions': ('name', 'line', 'end_line', 'scope', 'args', 'body'),
+        'classes': ('name', 'line', 'methods'),
+        'variables': ('name', 'line', 'value'),
+        'loops': ('type', 'line', 'body'),
+        'conditionals': ('line', 'test', 'body'),
+        'calls': ('function', 'line'),
+        'imports': ('module', 'names', 'line'),
+        'code_structure': ('type', 'depth', 'line', 'code'),
+        'cfg': cfg.COLUMNS,
+        'data_structures': structures.COLUMNS
+    }
+
+    def parse_code(self, code: str, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         try:
             tree = ast.parse(code)
-            return self._analyze_ast(tree, code)
+            return self._analyze_ast(tree, code, fields)
         except SyntaxError as e:
             return {'error': f'Syntax error: {e}'}
+        except RecursionError:
+            return {'error': 'Code is nested too deeply to analyze'}
+
+    def _analyze_ast(self, tree: ast.AST, code: str,
+                     fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        visitor = _AnalysisVisitor(SourceBuffer(code), self.FIELDS if fields is None else fields)
+        visitor.visit(tree)
+        return visitor.analysis
+
+
+# Node types whose handlers fill each analysis category
+_FIELD_NODES = {
+    'functions': (ast.FunctionDef,),
+    'cfg': (ast.FunctionDef,),
+    'classes': (ast.ClassDef,),
+    'variables': (ast.Assign,),
+    'loops': (ast.For, ast.While),
+    'conditionals': (ast.If,),
+    'calls': (ast.Call,),
+    'imports': (ast.Import, ast.ImportFrom)
+}
+
+# Nodes that open a named scope
+_SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
 
-    def _analyze_ast(self, tree: ast.AST, code: str) -> Dict[str, Any]:
-        analysis = {
-            'functions': [],
-            'classes': [],
-            'variables': [],
-            'loops': [],
-            'conditionals': [],
-            'calls': [],
-            'imports': [],
-            'code_structure': []
+
+class _AnalysisVisitor(ast.NodeVisitor):
+    # Collects the requested analysis categories and the code structure in one
+    # traversal. Node code is kept as spans into a shared line buffer.
+    def __init__(self, source: SourceBuffer, fields: Iterable[str]):
+        self.source = source
+        # Names of the enclosing classes and functions
+        self.scopes: List[str] = []
+        self.analysis = {
+            field: RecordTable(PythonCodeParser.COLUMNS[field])
+            for field in PythonCodeParser.FIELDS if field in fields
         }
-        
-        lines = code.split('\n')
-        
-        for node in ast.walk(tree):
-            # Functions
-            if isinstance(node, ast.FunctionDef):
-                analysis['functions'].append({
-                    'name': node.name,
-                    'line': node.lineno,
-                    'args': [arg.arg for arg in node.args.args],
-                    'body': self._get_node_code(node, lines)
-                })
-            
-            # Classes
-            elif isinstance(node, ast.ClassDef):
-                analysis['classes'].append({
-                    'name': node.name,
-                    'line': node.lineno,
-                    'methods': [n.name for n in node.body if isinstance(n, ast.FunctionDef)]
-                })
-            
-            # Variables
-            elif isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name):
-                        analysis['variables'].append({
-                            'name': target.id,
-                            'line': node.lineno,
-                            'value': ast.unparse(node.value) if hasattr(ast, 'unparse') else 'N/A'
-                        })
-            
-            # Loops
-            elif isinstance(node, (ast.For, ast.While)):
-                analysis['loops'].append({
-                    'type': 'for' if isinstance(node, ast.For) else 'while',
-                    'line': node.lineno,
-                    'body': self._get_node_code(node, lines)
-                })
-            
-            # Conditionals
-            elif isinstance(node, ast.If):
-                analysis['conditionals'].append({
+        # The structure gets one row per node, so its columns are appended to directly
+        structure = self.analysis.get('code_structure')
+        self._structure = None if structure is None else (
+            structure.column('type'), structure.column('depth'),
+            structure.column('line'), structure.column('code')
+        )
+        self._handlers = {
+            node_type: getattr(self, 'visit_' + node_type.__name__)
+            for field, node_types in _FIELD_NODES.items() if field in self.analysis
+            for node_type in node_types
+        }
+        # Data structures are inferred from the same walk and classified at its end
+        self._inference = structures.PythonInference() if 'data_structures' in self.analysis else None
+
+    def visit(self, root: ast.AST) -> None:
+        # Depth-first with an explicit stack, so deeply nested code cannot
+        # exhaust the interpreter stack. A None entry closes a named scope.
+        stack = [(root, 0)]
+        remaining = limits.MAX_NODES
+        inference = {} if self._inference is None else self._inference.handlers
+        while stack:
+            node, depth = stack.pop()
+            if node is None:
+                self.scopes.pop()
+                continue
+            remaining -= 1
+            if remaining < 0:
+                limits.note(stage='parse', limit='nodes', max=limits.MAX_NODES)
+                break
+
+            node_type = type(node)
+            if self._structure is not None:
+                types, depths, lines, codes = self._structure
+                line = getattr(node, 'lineno', None)
+                types.append(node_type.__name__)
+                depths.append(depth)
+                lines.append(line or 0)
+                codes.append(self._span(node) if line is not None else '')
+
+            handler = self._handlers.get(node_type)
+            if handler is not None:
+                handler(node)
+            infer = inference.get(node_type)
+            if infer is not None:
+                infer(node, self.scopes)
+
+            if node_type in _SCOPE_NODES:
+                self.scopes.append(node.name)
+                stack.append((None, depth))
+            children = list(ast.iter_child_nodes(node))
+            stack.extend((child, depth + 1) for child in reversed(children))
+        if self._inference is not None:
+            self.analysis['data_structures'].extend(self._inference.rows())
+
+    def _span(self, node: ast.AST) -> Union[str, SourceSpan]:
+        return self.source.span(node.lineno, node.end_lineno or node.lineno)
+
+    def _unparse(self, node: ast.AST) -> str:
+        try:
+            return limits.clip(ast.unparse(node))
+        except RecursionError:
+            return '...'
+
+    # Functions and their control-flow graphs
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        graph = self.analysis.get('cfg')
+        if graph is not None:
+            builder = cfg.PythonCFGBuilder().build(node.lineno, node.end_lineno or node.lineno, node.body)
+            graph.extend(builder.rows('.'.join(self.scopes + [node.name])))
+        if 'functions' not in self.analysis:
+            return
+        self.analysis['functions'].append({
+            'name': node.name,
+            'line': node.lineno,
+            'end_line': node.end_lineno or node.lineno,
+            'scope': '.'.join(self.scopes),
+            'args': [arg.arg for arg in node.args.args],
+            'body': self._span(node)
+        })
+
+    # Classes
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self.analysis['classes'].append({
+            'name': node.name,
+            'line': node.lineno,
+            'methods': [n.name for n in node.body if isinstance(n, ast.FunctionDef)]
+        })
+
+    # Variables
+    def visit_Assign(self, node: ast.Assign) -> None:
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                self.analysis['variables'].append({
+                    'name': target.id,
                     'line': node.lineno,
-                    'test': ast.unparse(node.test) if hasattr(ast, 'unparse') else 'N/A',
-                    'body': self._get_node_code(node, lines)
-                })
-            
-            # Function calls
-            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-                analysis['calls'].append({
-                    'function': node.func.id,
-                    'line': node.lineno
-                })
-            
-            # Imports
-            elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                analysis['imports'].append({
-                    'module': node.module if isinstance(node, ast.ImportFrom) else '',
-                    'names': [alias.name for alias in node.names],
-                    'line': node.lineno
+                    'value': self._unparse(node.value) if hasattr(ast, 'unparse') else 'N/A'
                 })
-        
-        # Build code structure
-        analysis['code_structure'] = self._build_structure(tree, lines)
-        return analysis
 
-    def _get_node_code(self, node: ast.AST, lines: List[str]) -> str:
-        try:
-            return '\n'.join(lines[node.lineno-1:node.end_lineno])
-        except:
-            return ''
-
-    def _build_structure(self, tree: ast.AST, lines: List[str]) -> List[Dict[str, Any]]:
-        structure = []
-        
-        def traverse(node, depth=0):
-            node_type = type(node).__name__
-            structure.append({
-                'type': node_type,
-                'depth': depth,
-                'line': getattr(node, 'lineno', 0),
-                'code': self._get_node_code(node, lines) if hasattr(node, 'lineno') else ''
+    # Loops
+    def visit_For(self, node: ast.For) -> None:
+        self._add_loop('for', node)
+
+    def visit_While(self, node: ast.While) -> None:
+        self._add_loop('while', node)
+
+    def _add_loop(self, loop_type: str, node: ast.AST) -> None:
+        self.analysis['loops'].append({
+            'type': loop_type,
+            'line': node.lineno,
+            'body': self._span(node)
+        })
+
+    # Conditionals
+    def visit_If(self, node: ast.If) -> None:
+        self.analysis['conditionals'].append({
+            'line': node.lineno,
+            'test': self._unparse(node.test) if hasattr(ast, 'unparse') else 'N/A',
+            'body': self._span(node)
+        })
+
+    # Function calls
+    def visit_Call(self, node: ast.Call) -> None:
+        if isinstance(node.func, ast.Name):
+            self.analysis['calls'].append({
+                'function': node.func.id,
+                'line': node.lineno
             })
-            
-            for child in ast.iter_child_nodes(node):
-                traverse(child, depth + 1)
-        
-        traverse(tree)
-        return structure
\ No newline at end of file
+
+    # Imports
+    def visit_Import(self, node: ast.Import) -> None:
+        self._add_import('', node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        self._add_import(node.module, node)
+
+    def _add_import(self, module: str, node: ast.AST) -> None:
+        self.analysis['imports'].append({
+            'module': module,
+            'names': [alias.name for alias in node.names],
+            'line': node.lineno
+        })
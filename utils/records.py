@@ -0,0 +1,108 @@
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+# Columns holding line numbers, depths and block ids are stored in typed arrays
+INT_COLUMNS = frozenset(('line', 'end_line', 'depth', 'block'))
+
+# Columns with few distinct values share one string object per value
+INTERNED_COLUMNS = frozenset(('type', 'name', 'function', 'method', 'module', 'header',
+                              'return_type', 'scope', 'kind'))
+
+
+class RecordTable:
+    # Column-oriented store for one analysis category. Rows are only built as
+    # dicts when iterated, so consumers can treat a table like a list of dicts.
+    __slots__ = ('names', '_columns', '_index', '_layout')
+
+    def __init__(self, names: Sequence[str], columns: Sequence[Any] = None):
+        self.names = tuple(names)
+        if columns is None:
+            columns = [array('l') if name in INT_COLUMNS else [] for name in self.names]
+        self._columns = list(columns)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        # (name, column, is int, is interned) for append
+        self._layout = [(name, column, name in INT_COLUMNS, name in INTERNED_COLUMNS)
+                        for name, column in zip(self.names, self._columns)]
+
+    def __len__(self) -> int:
+        return len(self._columns[0]) if self._columns else 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        names = self.names
+        for values in zip(*self._columns):
+            yield dict(zip(names, values))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RecordTable(self.names, [column[index] for column in self._columns])
+        return dict(zip(self.names, (column[index] for column in self._columns)))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (RecordTable, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'RecordTable({list(self.names)}, rows={len(self)})'
+
+    def column(self, name: str):
+        return self._columns[self._index[name]]
+
+    def append(self, row: Dict[str, Any]) -> None:
+        get = row.get
+        for name, column, is_int, interned in self._layout:
+            value = get(name)
+            if is_int:
+                value = value or 0
+            elif interned and type(value) is str:
+                value = sys.intern(value)
+            column.append(value)
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> None:
+        if isinstance(rows, RecordTable) and rows.names == self.names:
+            for column, other in zip(self._columns, rows._columns):
+                column.extend(other)
+            return
+        for row in rows:
+            self.append(row)
+
+    def shift(self, name: str, delta: int) -> None:
+        # Moves every non-zero value of an int column, e.g. line numbers
+        i = self._index.get(name)
+        if i is not None and delta:
+            column = self._columns[i]
+            column[:] = array('l', (value + delta if value else 0 for value in column))
+
+    def drop(self, names: Iterable[str]) -> 'RecordTable':
+        keep = [i for i, name in enumerate(self.names) if name not in names]
+        return RecordTable([self.names[i] for i in keep], [self._columns[i][:] for i in keep])
+
+    def to_columns(self) -> Dict[str, List[Any]]:
+        return {name: list(column) for name, column in zip(self.names, self._columns)}
+
+
+def column(entries: Iterable[Dict[str, Any]], name: str) -> Sequence[Any]:
+    if isinstance(entries, RecordTable):
+        return entries.column(name) if name in entries.names else [None] * len(entries)
+    return [entry.get(name) for entry in entries]
+
+
+def to_columns(entries: Iterable[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    # Dict of equal-length arrays; rows missing a key get None in that column
+    if isinstance(entries, RecordTable):
+        return entries.to_columns()
+    entries = list(entries)
+    names = list(dict.fromkeys(name for entry in entries for name in entry))
+    return {name: [entry.get(name) for entry in entries] for name in names}
+
+
+def columnar(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    if 'error' in analysis:
+        return analysis
+    return {
+        name: to_columns(entries) if isinstance(entries, (RecordTable, list)) else entries
+        for name, entries in analysis.items()
+    }
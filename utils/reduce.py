@@ -0,0 +1,79 @@
+from collections import defaultdict, deque
+from typing import Any, Dict, Optional, Tuple
+
+import networkx as nx
+
+# Shrinks graphs that are too large to lay out and read. The steps are tried
+# in order, and each keeps more of the structure than the next:
+#   collapsed   trees keep their top levels; cut nodes show how much they hide
+#   clustered   nodes with a 'group' attribute merge into one node per group
+#   top_degree  only the best connected nodes are kept
+
+
+def reduce_graph(G: nx.Graph, max_nodes: int) -> Tuple[nx.Graph, Optional[str]]:
+    # Returns the graph to draw and the step used, or None if G already fits
+    if G.number_of_nodes() <= max_nodes:
+        return G, None
+    if G.is_directed() and nx.is_branching(G):
+        return collapse_tree(G, max_nodes), 'collapsed'
+    groups = nx.get_node_attributes(G, 'group')
+    if len(groups) == G.number_of_nodes():
+        clustered = cluster(G, groups)
+        if clustered.number_of_nodes() <= max_nodes:
+            return clustered, 'clustered'
+        G = clustered
+    return top_degree(G, max_nodes), 'top_degree'
+
+
+def collapse_tree(G: nx.DiGraph, max_nodes: int) -> nx.DiGraph:
+    # Keeps the first max_nodes nodes in breadth-first order
+    roots = [node for node, degree in G.in_degree() if degree == 0]
+    kept = set()
+    queue = deque(roots)
+    while queue and len(kept) < max_nodes:
+        node = queue.popleft()
+        kept.add(node)
+        queue.extend(G.successors(node))
+
+    # Subtree sizes, children before parents
+    sizes: Dict[Any, int] = {}
+    for root in roots:
+        for node in nx.dfs_postorder_nodes(G, root):
+            sizes[node] = 1 + sum(sizes[child] for child in G.successors(node))
+
+    reduced = G.subgraph(kept).copy()
+    for node in kept:
+        hidden = sum(sizes[child] for child in G.successors(node) if child not in kept)
+        if hidden:
+            data = reduced.nodes[node]
+            data['label'] = f"{data.get('label', node)} (+{hidden})"
+            data['type'] = 'collapsed'
+    return reduced
+
+
+def cluster(G: nx.Graph, groups: Dict[Any, Any]) -> nx.Graph:
+    # One node per group, labelled with its size; edges count the links between groups
+    sizes = defaultdict(int)
+    for group in groups.values():
+        sizes[group] += 1
+    weights = defaultdict(int)
+    for u, v in G.edges():
+        if groups[u] != groups[v]:
+            weights[groups[u], groups[v]] += 1
+
+    reduced = G.__class__()
+    for group, size in sizes.items():
+        reduced.add_node(group, type='cluster', label=f'{group} ({size})', group=group)
+    for (u, v), weight in weights.items():
+        if weight > 1:
+            reduced.add_edge(u, v, label=str(weight))
+        else:
+            reduced.add_edge(u, v)
+    return reduced
+
+
+def top_degree(G: nx.Graph, max_nodes: int) -> nx.Graph:
+    # Ties keep the graph's own node order, so the result is deterministic
+    order = {node: i for i, node in enumerate(G.nodes())}
+    ranked = sorted(G.nodes(), key=lambda node: (-G.degree(node), order[node]))
+    return G.subgraph(ranked[:max_nodes]).copy()
@@ -0,0 +1,162 @@
+import base64
+import io
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+from xml.sax.saxutils import escape
+
+from utils import metrics
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+NODE_COLORS = {
+    'function': 'lightblue',
+    'loop': 'lightgreen',
+    'conditional': 'lightcoral',
+    'entry': 'khaki',
+    'exit': 'khaki',
+    'handler': 'plum',
+    'collapsed': 'wheat',
+    'cluster': 'lightsteelblue',
+    'default': 'lightgray'
+}
+
+SVG_WIDTH = 800
+SVG_HEIGHT = 640
+SVG_MARGIN = 40
+SVG_NODE_RADIUS = 18
+
+
+_local = threading.local()
+
+
+def agg():
+    # matplotlib is imported on the first PNG render, not when the app starts.
+    # Rendering only uses the object-oriented API: pyplot's current figure is
+    # global state that renders on several threads would share. networkx's
+    # drawing functions still import pyplot, hence the backend.
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    return Figure, FigureCanvasAgg
+
+
+def _figure():
+    # Each thread draws on its own figure, cleared after every render and
+    # reused, which also keeps the canvas' renderer between renders
+    figure = getattr(_local, 'figure', None)
+    if figure is None:
+        Figure, FigureCanvasAgg = agg()
+        figure = Figure(figsize=(10, 8))
+        FigureCanvasAgg(figure)
+        _local.figure = figure
+    return figure
+
+
+def normalize_positions(pos: Dict[Any, Tuple[float, float]]) -> Dict[Any, Tuple[float, float]]:
+    # Scale layout coordinates into the unit square, y pointing down
+    if not pos:
+        return {}
+    xs = [p[0] for p in pos.values()]
+    ys = [p[1] for p in pos.values()]
+    min_x, min_y = min(xs), min(ys)
+    span_x = (max(xs) - min_x) or 1.0
+    span_y = (max(ys) - min_y) or 1.0
+    return {
+        node: ((float(x) - min_x) / span_x, 1.0 - (float(y) - min_y) / span_y)
+        for node, (x, y) in pos.items()
+    }
+
+
+def graph_to_json(G: 'nx.Graph', pos: Dict[Any, Tuple[float, float]]) -> Dict[str, Any]:
+    unit = normalize_positions(pos)
+    return {
+        'directed': G.is_directed(),
+        'nodes': [
+            {
+                'id': str(node),
+                'label': str(data.get('label', node)),
+                'type': data.get('type', 'default'),
+                'x': round(unit[node][0], 4),
+                'y': round(unit[node][1], 4)
+            }
+            for node, data in G.nodes(data=True)
+        ],
+        'edges': [
+            {'source': str(u), 'target': str(v), 'label': data['label']} if data.get('label') else
+            {'source': str(u), 'target': str(v)}
+            for u, v, data in G.edges(data=True)
+        ]
+    }
+
+
+def graph_to_svg(G: 'nx.Graph', pos: Dict[Any, Tuple[float, float]]) -> str:
+    unit = normalize_positions(pos)
+    inner_w = SVG_WIDTH - 2 * SVG_MARGIN
+    inner_h = SVG_HEIGHT - 2 * SVG_MARGIN
+    coords = {
+        node: (SVG_MARGIN + x * inner_w, SVG_MARGIN + y * inner_h)
+        for node, (x, y) in unit.items()
+    }
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{SVG_HEIGHT}" '
+        f'viewBox="0 0 {SVG_WIDTH} {SVG_HEIGHT}" font-family="sans-serif" font-size="10">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="6" '
+        'markerHeight="6" orient="auto"><path d="M0,0L10,5L0,10z" fill="#555"/></marker></defs>',
+        '<g stroke="#555" stroke-width="1">'
+    ]
+    marker = ' marker-end="url(#arrow)"' if G.is_directed() else ''
+    for u, v in G.edges():
+        (x1, y1), (x2, y2) = coords[u], coords[v]
+        # Stop the edge at the target's border so the arrow head stays visible
+        dx, dy = x2 - x1, y2 - y1
+        length = (dx * dx + dy * dy) ** 0.5 or 1.0
+        x2 -= dx / length * SVG_NODE_RADIUS
+        y2 -= dy / length * SVG_NODE_RADIUS
+        parts.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}"{marker}/>')
+    parts.append('</g><g text-anchor="middle" dominant-baseline="central">')
+    for node, data in G.nodes(data=True):
+        x, y = coords[node]
+        color = NODE_COLORS.get(data.get('type', 'default'), NODE_COLORS['default'])
+        label = escape(str(data.get('label', node)))
+        parts.append(
+            f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{SVG_NODE_RADIUS}" fill="{color}"/>'
+            f'<text x="{x:.1f}" y="{y:.1f}">{label}</text>'
+        )
+    parts.append('</g></svg>')
+
+    svg = ''.join(parts)
+    return f"data:image/svg+xml;base64,{base64.b64encode(svg.encode()).decode()}"
+
+
+def graph_to_png(G: 'nx.Graph', pos: Dict[Any, Tuple[float, float]]) -> str:
+    import networkx as nx
+    figure = _figure()
+
+    # Color nodes by type
+    node_colors = [
+        NODE_COLORS.get(G.nodes[node].get('type', 'default'), NODE_COLORS['default'])
+        for node in G.nodes()
+    ]
+
+    # Save to base64
+    buffer = io.BytesIO()
+    try:
+        # What nx.draw does, on this figure instead of pyplot's current one
+        figure.set_facecolor('w')
+        ax = figure.add_axes((0, 0, 1, 1))
+        with metrics.span('draw'):
+            nx.draw_networkx(G, pos, ax=ax, with_labels=True, node_color=node_colors,
+                             node_size=2000, font_size=10, font_weight='bold',
+                             arrows=True)
+            ax.set_axis_off()
+        with metrics.span('savefig'):
+            figure.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+    finally:
+        figure.clear()
+    with metrics.span('base64'):
+        image_base64 = base64.b64encode(buffer.getvalue()).decode()
+
+    return f"data:image/png;base64,{image_base64}"
@@ -0,0 +1,44 @@
+import json
+from typing import Any
+
+from utils.records import RecordTable
+from utils.source import SourceSpan
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Wire encodings of an analysis response: JSON rows, JSON columns, MessagePack columns
+ENCODINGS = ('json', 'columns', 'msgpack')
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'columns': 'application/json',
+    'msgpack': 'application/msgpack'
+}
+
+
+def json_default(o: Any) -> Any:
+    # Source spans are materialized only when the response is encoded
+    if isinstance(o, SourceSpan):
+        return str(o)
+    if isinstance(o, RecordTable):
+        return list(o)
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+def dumps(payload: Any) -> bytes:
+    # Matches the Flask JSON provider settings so cached and fresh bodies are identical
+    return json.dumps(payload, default=json_default, sort_keys=True,
+                      separators=(',', ':')).encode()
+
+
+def packb(payload: Any) -> bytes:
+    if msgpack is None:
+        raise RuntimeError('MessagePack encoding requires the msgpack package')
+    return msgpack.packb(payload, default=json_default)
+
+
+def encode(payload: Any, encoding: str = 'json') -> bytes:
+    return packb(payload) if encoding == 'msgpack' else dumps(payload)
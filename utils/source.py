@@ -0,0 +1,44 @@
+from typing import List, Union
+
+
+class SourceBuffer:
+    __slots__ = ('lines',)
+
+    def __init__(self, code: str):
+        self.lines: List[str] = code.split('\n')
+
+    def text(self, start: int, end: int) -> str:
+        return '\n'.join(self.lines[start-1:end])
+
+    def span(self, start: int, end: int) -> Union[str, 'SourceSpan']:
+        # Single lines are shared with the buffer, longer ranges stay lazy
+        if start == end and 0 < start <= len(self.lines):
+            return self.lines[start-1]
+        return SourceSpan(self, start, end)
+
+
+class SourceSpan:
+    # A (start_line, end_line) slice of a shared SourceBuffer; the text is only
+    # built when the span is converted to a string, e.g. during serialization
+    __slots__ = ('buffer', 'start', 'end')
+
+    def __init__(self, buffer: SourceBuffer, start: int, end: int):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+
+    def __str__(self) -> str:
+        return self.buffer.text(self.start, self.end)
+
+    def __repr__(self) -> str:
+        return f'SourceSpan({self.start}, {self.end})'
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, SourceSpan):
+            return str(self) == str(other)
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(str(self))
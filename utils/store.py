@@ -0,0 +1,339 @@
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import records, serialization
+from utils.cache import LRUCache
+from utils.intervals import IntervalIndex
+
+# Categories a stored summary is built from, parsed even when not returned
+SUMMARY_FIELDS = ('functions', 'classes', 'calls', 'metrics')
+
+# Bumped when the tables change; a store with another schema is rebuilt, as
+# everything in it is derived from submissions
+SCHEMA_VERSION = 2
+
+_SCHEMA = '''
+CREATE TABLE snippets (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    language TEXT NOT NULL,
+    version TEXT NOT NULL,
+    lines INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    error TEXT,
+    submissions INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX snippets_language ON snippets (language, last_seen);
+CREATE INDEX snippets_last_seen ON snippets (last_seen);
+CREATE TABLE functions (
+    snippet INTEGER NOT NULL REFERENCES snippets (id),
+    language TEXT NOT NULL,
+    name TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    complexity INTEGER NOT NULL,
+    nesting INTEGER NOT NULL,
+    fan_in INTEGER NOT NULL,
+    fan_out INTEGER NOT NULL
+);
+CREATE INDEX functions_snippet ON functions (snippet);
+CREATE INDEX functions_name ON functions (name);
+CREATE INDEX functions_length ON functions (length);
+CREATE INDEX functions_language_length ON functions (language, length);
+CREATE INDEX functions_complexity ON functions (complexity);
+CREATE INDEX functions_language_complexity ON functions (language, complexity);
+CREATE INDEX functions_nesting ON functions (nesting);
+CREATE INDEX functions_language_nesting ON functions (language, nesting);
+CREATE INDEX functions_fan_in ON functions (fan_in);
+CREATE INDEX functions_language_fan_in ON functions (language, fan_in);
+CREATE INDEX functions_fan_out ON functions (fan_out);
+CREATE INDEX functions_language_fan_out ON functions (language, fan_out);
+CREATE TABLE classes (
+    snippet INTEGER NOT NULL REFERENCES snippets (id),
+    name TEXT NOT NULL,
+    line INTEGER NOT NULL
+);
+CREATE INDEX classes_snippet ON classes (snippet);
+CREATE INDEX classes_name ON classes (name);
+CREATE TABLE calls (
+    snippet INTEGER NOT NULL REFERENCES snippets (id),
+    caller TEXT NOT NULL,
+    function TEXT NOT NULL,
+    line INTEGER NOT NULL
+);
+CREATE INDEX calls_snippet ON calls (snippet);
+CREATE INDEX calls_function ON calls (function);
+'''
+_TABLES = ('calls', 'classes', 'functions', 'snippets')
+
+# Function orderings offered by queries, by column; each has an index
+FUNCTION_ORDERS = {'length': 'f.length', 'complexity': 'f.complexity', 'nesting': 'f.nesting',
+                   'fan_in': 'f.fan_in', 'fan_out': 'f.fan_out'}
+# Code metrics stored per function, in summary order
+_FUNCTION_METRICS = ('complexity', 'nesting', 'fan_in', 'fan_out')
+
+_SNIPPET_COLUMNS = 'digest, language, version, lines, bytes, error, submissions, first_seen, last_seen'
+
+
+def digest(language: str, code: str) -> str:
+    hasher = hashlib.sha256(language.encode())
+    hasher.update(b'\0')
+    hasher.update(code.encode('utf-8', 'surrogatepass'))
+    return hasher.hexdigest()
+
+
+def summarize(code: str, analysis: Dict[str, Any]) -> bytes:
+    # Runs in the analysis worker: the rows the store indexes, as JSON
+    summary = {'lines': code.count('\n') + 1, 'bytes': len(code.encode('utf-8', 'surrogatepass'))}
+    if 'error' in analysis:
+        summary['error'] = analysis['error']
+        return serialization.dumps(summary)
+
+    functions = analysis.get('functions', [])
+    names = records.column(functions, 'name')
+    scopes = [scope or '' for scope in records.column(functions, 'scope')]
+    lines = records.column(functions, 'line')
+    end_lines = [end_line or line for line, end_line in zip(lines, records.column(functions, 'end_line'))]
+    # Metrics rows follow the functions one to one
+    table = analysis.get('metrics')
+    values = [records.column(table, name) if table is not None else [0] * len(names)
+              for name in _FUNCTION_METRICS]
+    summary['functions'] = [list(row) for row in zip(names, scopes, lines, end_lines, *values)]
+    # Calls are attributed to the innermost function around them
+    callers = IntervalIndex(zip(lines, end_lines, (f'{scope}.{name}' if scope else name
+                                                   for scope, name in zip(scopes, names))))
+    calls = analysis.get('calls', [])
+    summary['calls'] = [[callers.find(line, ''), function, line] for function, line in
+                        zip(records.column(calls, 'function'), records.column(calls, 'line'))
+                        if function]
+    classes = analysis.get('classes', [])
+    summary['classes'] = [list(row) for row in zip(records.column(classes, 'name'),
+                                                   records.column(classes, 'line'))]
+    return serialization.dumps(summary)
+
+
+class AnalysisStore:
+    # Summaries of past submissions in SQLite, keyed by content hash. Writes
+    # are queued and committed by one background thread in batches, so
+    # requests never wait on the disk; reads use B-tree indexes.
+    def __init__(self, path: str, version: str = '', batch_size: int = 256,
+                 flush_interval: float = 1.0, max_pending: int = 10000):
+        self.path = path
+        self.version = version
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue: 'queue.Queue[Optional[Tuple[str, str, Optional[bytes]]]]' = queue.Queue(max_pending)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Digests known to be stored under this version
+        self._seen = LRUCache(65536, sizeof=lambda value: 1)
+        self._reader = self._connect()
+        self._migrate(self._reader)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        # Readers are not blocked by the writer's transactions
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _migrate(self, connection: sqlite3.Connection) -> None:
+        with connection:
+            if connection.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION:
+                return
+            for table in _TABLES:
+                connection.execute(f'DROP TABLE IF EXISTS {table}')
+            connection.executescript(_SCHEMA)
+            connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def contains(self, key: str) -> bool:
+        # Whether the digest has a summary from this analysis version
+        if key in self._seen:
+            return True
+        with self._lock:
+            row = self._reader.execute('SELECT 1 FROM snippets WHERE digest = ? AND version = ?',
+                                       (key, self.version)).fetchone()
+        if row is not None:
+            self._seen.put(key, True)
+        return row is not None
+
+    def record(self, key: str, language: str, summary: Optional[bytes] = None) -> None:
+        # Counts a submission; the summary is only needed for new code.
+        # Records are dropped rather than blocking when the writer falls behind.
+        self._start()
+        try:
+            self._queue.put_nowait((key, language, summary))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        # Waits until everything recorded so far is committed
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+
+    def _start(self) -> None:
+        # Started on first use, like the render pool
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name='analysis-store', daemon=True)
+                self._writer.start()
+
+    def _run(self) -> None:
+        connection = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    self._queue.task_done()
+                    return
+                batch = [item]
+                closing = False
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+                try:
+                    self._write(connection, batch)
+                    self.written += len(batch)
+                except sqlite3.Error:
+                    self.errors += 1
+                for _ in range(len(batch) + closing):
+                    self._queue.task_done()
+                if closing:
+                    return
+        finally:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, batch: List[Tuple[str, str, Optional[bytes]]]) -> None:
+        # One transaction per batch
+        now = time.time()
+        with connection:
+            for key, language, summary in batch:
+                row = connection.execute('SELECT id, version FROM snippets WHERE digest = ?', (key,)).fetchone()
+                if row is not None and (summary is None or row['version'] == self.version):
+                    connection.execute('UPDATE snippets SET submissions = submissions + 1, last_seen = ? '
+                                       'WHERE id = ?', (now, row['id']))
+                    continue
+                if summary is None:
+                    # A cached result for code that was never summarized
+                    continue
+                data = json.loads(summary)
+                values = (language, self.version, data['lines'], data['bytes'], data.get('error'))
+                if row is None:
+                    snippet = connection.execute(
+                        'INSERT INTO snippets (language, version, lines, bytes, error, digest, submissions, '
+                        'first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)',
+                        values + (key, now, now)).lastrowid
+                else:
+                    # Summarized by an older version: its rows are replaced
+                    snippet = row['id']
+                    for table in ('functions', 'classes', 'calls'):
+                        connection.execute(f'DELETE FROM {table} WHERE snippet = ?', (snippet,))
+                    connection.execute(
+                        'UPDATE snippets SET language = ?, version = ?, lines = ?, bytes = ?, error = ?, '
+                        'submissions = submissions + 1, last_seen = ? WHERE id = ?',
+                        values + (now, snippet))
+                connection.executemany(
+                    'INSERT INTO functions (snippet, language, name, scope, line, end_line, length, '
+                    'complexity, nesting, fan_in, fan_out) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    ((snippet, language, name, scope, line, end_line, end_line - line + 1, *values)
+                     for name, scope, line, end_line, *values in data.get('functions', ())))
+                connection.executemany('INSERT INTO classes (snippet, name, line) VALUES (?, ?, ?)',
+                                       ((snippet, name, line) for name, line in data.get('classes', ())))
+                connection.executemany('INSERT INTO calls (snippet, caller, function, line) VALUES (?, ?, ?, ?)',
+                                       ((snippet, caller, function, line)
+                                        for caller, function, line in data.get('calls', ())))
+
+    def _query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._reader.execute(sql, params)]
+
+    def snippets(self, language: Optional[str] = None, calls: Optional[str] = None,
+                 function: Optional[str] = None, class_name: Optional[str] = None,
+                 limit: int = 50) -> List[Dict[str, Any]]:
+        # Most recently submitted first. Each filter is an index lookup.
+        clauses, params = [], []
+        if language is not None:
+            clauses.append('language = ?')
+            params.append(language)
+        for table, column, value in (('calls', 'function', calls), ('functions', 'name', function),
+                                     ('classes', 'name', class_name)):
+            if value is not None:
+                clauses.append(f'id IN (SELECT snippet FROM {table} WHERE {column} = ?)')
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._query(f'SELECT {_SNIPPET_COLUMNS} FROM snippets {where} '
+                           f'ORDER BY last_seen DESC LIMIT ?', (*params, limit))
+
+    def snippet(self, key: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(f'SELECT id, {_SNIPPET_COLUMNS} FROM snippets WHERE digest = ?', (key,))
+        if not rows:
+            return None
+        result = rows[0]
+        snippet = result.pop('id')
+        result['functions'] = self._query('SELECT name, scope, line, end_line, length, complexity, nesting, '
+                                          'fan_in, fan_out FROM functions WHERE snippet = ? ORDER BY line',
+                                          (snippet,))
+        result['classes'] = self._query('SELECT name, line FROM classes WHERE snippet = ? ORDER BY line',
+                                        (snippet,))
+        result['calls'] = self._query('SELECT caller, function, line FROM calls WHERE snippet = ? '
+                                      'ORDER BY line', (snippet,))
+        return result
+
+    def functions(self, name: Optional[str] = None, language: Optional[str] = None,
+                  order: str = 'length', limit: int = 50) -> List[Dict[str, Any]]:
+        # Highest first in the given order, largest by default, read in index order
+        if order not in FUNCTION_ORDERS:
+            raise ValueError(f'Unknown order: {order}')
+        clauses, params = [], []
+        if name is not None:
+            clauses.append('f.name = ?')
+            params.append(name)
+        if language is not None:
+            clauses.append('f.language = ?')
+            params.append(language)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._query(
+            'SELECT s.digest, f.language, f.name, f.scope, f.line, f.end_line, f.length, f.complexity, '
+            'f.nesting, f.fan_in, f.fan_out '
+            f'FROM functions f JOIN snippets s ON s.id = f.snippet {where} '
+            f'ORDER BY {FUNCTION_ORDERS[order]} DESC LIMIT ?', (*params, limit))
+
+    def stats(self) -> Dict[str, Any]:
+        languages = self._query('SELECT language, COUNT(*) AS snippets, SUM(submissions) AS submissions, '
+                                'SUM(lines) AS lines FROM snippets GROUP BY language')
+        return {
+            'languages': {row.pop('language'): row for row in languages},
+            'pending': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
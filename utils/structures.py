@@ -0,0 +1,822 @@
+import ast
+import math
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from utils import limits
+
+# Data structures found by a static pass over the parsed tree: self-referential
+# classes (lists, trees, graphs) and containers with the way they are accessed.
+# Parsers feed nodes to an inference object during their own walk, and rows()
+# classifies what was seen once the walk is done.
+COLUMNS = ('name', 'kind', 'line', 'scope', 'layout')
+
+# Literal elements, keys or edges kept per structure
+MAX_CELLS = 32
+# Non-link fields listed per node class
+MAX_FIELDS = 16
+# Nested subscripts followed to count the dimensions of an access
+MAX_DIMENSIONS = 3
+
+# Link fields that point back to the previous node or up to the parent
+_BACK_LINKS = {'prev', 'previous', 'back', 'before'}
+_PARENT_LINKS = {'parent', 'up'}
+# Names that make a collection of nodes, or of lists, a graph rather than a tree
+_GRAPH_NAMES = {'adj', 'adjacency', 'adjacent', 'graph', 'edges', 'neighbors', 'neighbours',
+                'links', 'connections', 'successors', 'predecessors', 'outgoing', 'incoming'}
+# Untyped collection fields that hold child nodes
+_CHILD_NAMES = {'children', 'kids', 'subtrees', 'branches', 'nodes'} | _GRAPH_NAMES
+
+# Container kinds drawn as rows of cells, everything else as a key table
+_CELL_KINDS = {'array', 'matrix', 'stack', 'queue', 'heap', 'tuple', 'set'}
+# Structures whose nodes are classes, by the shape they are drawn in
+_NODE_SHAPES = {'linked_list': 'chain', 'doubly_linked_list': 'chain', 'binary_tree': 'tree',
+                'tree': 'tree', 'graph': 'graph'}
+
+
+class _Container:
+    __slots__ = ('kind', 'line', 'dimensions', 'values', 'length', 'keys', 'edges', 'ops', 'declared')
+
+    def __init__(self, line: int = 0):
+        self.kind = None
+        self.line = line
+        self.dimensions = 1
+        self.values = None
+        self.length = None
+        self.keys = None
+        self.edges = None
+        self.ops: Set[str] = set()
+        self.declared = False
+
+
+class _NodeClass:
+    __slots__ = ('name', 'line', 'links', 'fields')
+
+    def __init__(self, name: str, line: int):
+        self.name = name
+        self.line = line
+        # Link field -> True when it holds many nodes
+        self.links: Dict[str, bool] = {}
+        self.fields: Dict[str, None] = {}
+
+
+class Inference:
+    # State shared by the Python and Java passes. Containers are keyed by
+    # (scope, name); a name used in a scope without being declared there is
+    # resolved to the closest enclosing scope that declares it.
+    def __init__(self):
+        self.classes: Dict[str, _NodeClass] = {}
+        self.containers: Dict[Tuple[str, str], _Container] = {}
+
+    def container(self, scope: str, name: str, line: int = 0) -> _Container:
+        entry = self.containers.get((scope, name))
+        if entry is None:
+            entry = self.containers[(scope, name)] = _Container(line)
+        return entry
+
+    def declare(self, scope: str, name: str, kind: str, line: int, dimensions: int = 1) -> _Container:
+        entry = self.container(scope, name, line)
+        if not entry.declared:
+            entry.kind, entry.line, entry.declared = kind, line, True
+        entry.dimensions = max(entry.dimensions, dimensions)
+        return entry
+
+    def use(self, scope: str, name: str, op: str, line: int, dimensions: int = 1) -> None:
+        entry = self.container(scope, name, line)
+        entry.ops.add(op)
+        entry.dimensions = max(entry.dimensions, dimensions)
+
+    def link(self, class_scope: str, field: str, many: bool) -> None:
+        node = self.classes.get(class_scope)
+        if node is not None:
+            node.links[field] = node.links.get(field, False) or many
+
+    def _resolve(self) -> None:
+        # Uses in inner scopes join the declaration they refer to
+        for (scope, name), entry in list(self.containers.items()):
+            if entry.declared or not scope or self._bound(scope, name):
+                continue
+            outer = scope
+            while outer:
+                outer = outer.rpartition('.')[0]
+                target = self.containers.get((outer, name))
+                if target is not None and target.declared:
+                    target.ops |= entry.ops
+                    target.dimensions = max(target.dimensions, entry.dimensions)
+                    del self.containers[(scope, name)]
+                    break
+
+    def _bound(self, scope: str, name: str) -> bool:
+        # Whether the name is a parameter of the scope, shadowing outer ones
+        return False
+
+    def _known(self, entry: _Container) -> bool:
+        return entry.declared
+
+    def rows(self) -> List[Dict[str, Any]]:
+        self._resolve()
+        rows = []
+        for scope, node in self.classes.items():
+            kind = _classify_node(node)
+            if kind is None:
+                continue
+            rows.append({
+                'name': node.name,
+                'kind': kind,
+                'line': node.line,
+                'scope': scope.rpartition('.')[0],
+                'layout': {
+                    'shape': _NODE_SHAPES[kind],
+                    'node': node.name,
+                    'links': [{'field': field, 'many': many} for field, many in node.links.items()],
+                    'fields': list(node.fields)[:MAX_FIELDS]
+                }
+            })
+        for (scope, name), entry in self.containers.items():
+            if scope in self.classes and name in self.classes[scope].links:
+                continue
+            if not self._known(entry):
+                continue
+            kind = _classify_container(name, entry)
+            rows.append({
+                'name': name,
+                'kind': kind,
+                'line': entry.line,
+                'scope': scope,
+                'layout': _container_layout(kind, entry)
+            })
+        rows.sort(key=lambda row: row['line'])
+        return rows
+
+
+def _classify_node(node: _NodeClass) -> Optional[str]:
+    if not node.links:
+        return None
+    names = {field.lower(): many for field, many in node.links.items()}
+    if any(names.values()):
+        return 'graph' if _GRAPH_NAMES.intersection(names) else 'tree'
+    forward = [name for name in names if name not in _PARENT_LINKS]
+    if len(forward) == 1:
+        return 'linked_list'
+    if len(forward) == 2:
+        return 'doubly_linked_list' if _BACK_LINKS.intersection(forward) else 'binary_tree'
+    return 'tree' if forward else 'linked_list'
+
+
+def _classify_container(name: str, entry: _Container) -> str:
+    ops = entry.ops
+    kind = entry.kind
+    if kind is None:
+        # Known only from how a parameter is used
+        if name.lower() in _GRAPH_NAMES:
+            return 'graph'
+        kind = 'dict' if 'key' in ops else 'list'
+    if kind == 'heap' or 'heap' in ops:
+        return 'heap'
+    if kind == 'stack':
+        return 'stack'
+    if kind in ('deque', 'queue'):
+        if 'pop' in ops and 'pop_front' not in ops and kind == 'deque':
+            return 'stack'
+        return 'queue'
+    if kind == 'dict':
+        if entry.edges or 'adjacency' in ops or (entry.dimensions > 1 and name.lower() in _GRAPH_NAMES):
+            return 'graph'
+        return 'map'
+    if kind in ('set', 'tuple'):
+        return kind
+    # Lists and arrays
+    if entry.dimensions > 1:
+        return 'graph' if 'adjacency' in ops or name.lower() in _GRAPH_NAMES else 'matrix'
+    if 'pop_front' in ops:
+        return 'queue'
+    if 'pop' in ops and 'push' in ops and not ops.intersection(('index', 'index_store', 'slice')):
+        return 'stack'
+    return 'array'
+
+
+def _container_layout(kind: str, entry: _Container) -> Dict[str, Any]:
+    ops = entry.ops
+    if entry.kind == 'dict':
+        # Maps are looked up by key, whatever the key expression
+        ops = {'key' if op in ('index', 'index_store') else op for op in ops}
+    if kind == 'graph':
+        layout = {'shape': 'graph'}
+        if entry.edges:
+            layout['edges'] = entry.edges
+    elif kind in _CELL_KINDS:
+        layout = {'shape': 'cells', 'dimensions': entry.dimensions}
+        if entry.length is not None:
+            layout['length'] = entry.length
+        if entry.values is not None:
+            layout['values'] = entry.values
+    else:
+        layout = {'shape': 'table'}
+        if entry.length is not None:
+            layout['length'] = entry.length
+        if entry.keys is not None:
+            layout['keys'] = entry.keys
+    layout['access'] = sorted(ops)
+    return layout
+
+
+_LABELS = {
+    'linked_list': 'Linked list', 'doubly_linked_list': 'Doubly linked list', 'binary_tree': 'Binary tree',
+    'tree': 'Tree', 'graph': 'Graph', 'array': 'Array', 'matrix': 'Matrix', 'stack': 'Stack',
+    'queue': 'Queue', 'heap': 'Heap', 'map': 'Map', 'set': 'Set', 'tuple': 'Tuple'
+}
+
+
+def describe(row: Dict[str, Any]) -> str:
+    # One line summary of a row for clients that do not draw the layout
+    layout = row['layout']
+    label = _LABELS.get(row['kind'], row['kind'])
+    links = layout.get('links')
+    if links is not None:
+        fields = ', '.join(link['field'] for link in links)
+        return f"{label} of {layout['node']} nodes linked by {fields}"
+    if layout.get('dimensions', 1) > 1:
+        label = f"{layout['dimensions']}-D {label.lower()}"
+    label += f" {row['name']}"
+    if 'length' in layout:
+        label += f" of {layout['length']} elements"
+    access = [op for op in layout['access'] if op != 'iterate']
+    return label + (f" ({', '.join(access)})" if access else '')
+
+
+def _literal(value: Any) -> Any:
+    # JSON safe element values
+    if isinstance(value, str):
+        return limits.clip(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return repr(value)
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return repr(value)
+
+
+# Python
+
+# Constructors and annotations by the container kind they make
+_PY_KINDS = {
+    'list': 'list', 'List': 'list', 'Sequence': 'list', 'MutableSequence': 'list',
+    'tuple': 'tuple', 'Tuple': 'tuple',
+    'dict': 'dict', 'Dict': 'dict', 'defaultdict': 'dict', 'DefaultDict': 'dict', 'OrderedDict': 'dict',
+    'Counter': 'dict', 'Mapping': 'dict', 'MutableMapping': 'dict',
+    'set': 'set', 'Set': 'set', 'frozenset': 'set', 'FrozenSet': 'set',
+    'deque': 'deque', 'Deque': 'deque', 'Queue': 'queue', 'LifoQueue': 'stack',
+    'PriorityQueue': 'heap', 'array': 'array', 'ndarray': 'array'
+}
+# numpy constructors whose first argument is a shape
+_NUMPY_SHAPED = {'zeros', 'ones', 'empty', 'full'}
+_NUMPY_MODULES = {'np', 'numpy'}
+# Methods by the access they stand for; pop takes its argument into account
+_PY_METHODS = {
+    'append': 'push', 'extend': 'push', 'add': 'push', 'put': 'push', 'appendleft': 'push_front',
+    'insert': 'insert', 'pop': 'pop', 'popleft': 'pop_front', 'get': 'key', 'setdefault': 'key',
+    'remove': 'remove', 'discard': 'remove', 'update': 'update', 'sort': 'sort',
+    'keys': 'iterate', 'values': 'iterate', 'items': 'iterate'
+}
+_HEAP_FUNCTIONS = {'heappush', 'heappop', 'heapify', 'heappushpop', 'heapreplace'}
+_WORD = re.compile(r'\w+')
+
+
+def _py_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _py_same(a: ast.AST, b: ast.AST) -> bool:
+    # name, or name.attribute
+    if isinstance(a, ast.Name) and isinstance(b, ast.Name):
+        return a.id == b.id
+    if isinstance(a, ast.Attribute) and isinstance(b, ast.Attribute):
+        return a.attr == b.attr and _py_same(a.value, b.value)
+    return False
+
+
+def _py_mentions(annotation: ast.AST, name: str, budget: int = 16) -> Optional[bool]:
+    # None when the annotation does not mention the class, otherwise whether
+    # it holds many of them. Annotations are small, and the walk is bounded.
+    stack = [(annotation, False)]
+    while stack and budget:
+        budget -= 1
+        node, many = stack.pop()
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            words = set(_WORD.findall(node.value))
+            if name in words:
+                return many or any(_PY_KINDS.get(word) not in (None, 'tuple') for word in words)
+        elif isinstance(node, (ast.Name, ast.Attribute)):
+            if _py_name(node) == name:
+                return many
+        elif isinstance(node, ast.Subscript):
+            inner = many or _PY_KINDS.get(_py_name(node.value)) not in (None, 'tuple')
+            stack.append((node.slice, inner))
+        elif isinstance(node, ast.Tuple):
+            stack.extend((element, many) for element in node.elts)
+        elif isinstance(node, ast.BinOp):
+            stack.extend(((node.left, many), (node.right, many)))
+    return None
+
+
+def _py_annotation_kind(annotation: ast.AST) -> Tuple[Optional[str], int]:
+    # (container kind, dimensions) of List[List[int]], np.ndarray, ...
+    if isinstance(annotation, ast.Subscript):
+        kind = _PY_KINDS.get(_py_name(annotation.value))
+        if kind in ('list', 'array'):
+            element = annotation.slice
+            inner, dimensions = _py_annotation_kind(element)
+            return kind, dimensions + 1 if inner in ('list', 'array') else 1
+        if kind == 'dict' and isinstance(annotation.slice, ast.Tuple) and len(annotation.slice.elts) == 2:
+            inner, _ = _py_annotation_kind(annotation.slice.elts[1])
+            return kind, 2 if inner in ('list', 'set') else 1
+        return kind, 1
+    if isinstance(annotation, (ast.Name, ast.Attribute)):
+        return _PY_KINDS.get(_py_name(annotation)), 1
+    return None, 1
+
+
+class PythonInference(Inference):
+    def __init__(self):
+        super().__init__()
+        # Method scope -> (class scope, name of self)
+        self.methods: Dict[str, Tuple[str, str]] = {}
+        # Function scope -> parameter annotations
+        self.parameters: Dict[str, Dict[str, Optional[ast.AST]]] = {}
+        # Attributes followed as in node = node.next
+        self.traversed: Set[str] = set()
+        # (attribute, class name) from obj.attribute = ClassName(...)
+        self.assigned: Set[Tuple[str, str]] = set()
+        # Subscripts within annotations, which are types rather than accesses
+        self.annotations: Set[int] = set()
+        self.handlers = {
+            ast.ClassDef: self.class_def,
+            ast.FunctionDef: self.function_def,
+            ast.AsyncFunctionDef: self.function_def,
+            ast.Assign: self.assign,
+            ast.AnnAssign: self.ann_assign,
+            ast.Subscript: self.subscript,
+            ast.Call: self.call,
+            ast.For: self.for_loop
+        }
+
+    def _bound(self, scope: str, name: str) -> bool:
+        return name in self.parameters.get(scope, ())
+
+    def _known(self, entry: _Container) -> bool:
+        # Parameters count once they are indexed like a container
+        return entry.declared or bool(entry.ops.intersection(('index', 'index_store', 'slice', 'key')))
+
+    def _target(self, node: ast.AST, scope: str) -> Optional[Tuple[str, str]]:
+        # The (scope, name) a name or self.attribute refers to
+        if isinstance(node, ast.Name):
+            return scope, node.id
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+            method = self.methods.get(scope)
+            if method is not None and node.value.id == method[1]:
+                return method[0], node.attr
+        return None
+
+    def class_def(self, node: ast.ClassDef, scopes: List[str]) -> None:
+        scope = '.'.join(scopes + [node.name])
+        self.classes[scope] = _NodeClass(node.name, node.lineno)
+
+    def function_def(self, node: ast.FunctionDef, scopes: List[str]) -> None:
+        owner = '.'.join(scopes)
+        scope = f'{owner}.{node.name}' if owner else node.name
+        arguments = node.args.posonlyargs + node.args.args
+        annotations = {arg.arg: arg.annotation for arg in arguments + node.args.kwonlyargs}
+        self.parameters[scope] = annotations
+        if owner in self.classes and arguments and not any(
+                _py_name(decorator) == 'staticmethod' for decorator in node.decorator_list):
+            self.methods[scope] = (owner, arguments[0].arg)
+        self._skip_annotation(node.returns)
+        for name, annotation in annotations.items():
+            self._skip_annotation(annotation)
+            if annotation is not None:
+                kind, dimensions = _py_annotation_kind(annotation)
+                if kind is not None:
+                    self.declare(scope, name, kind, node.lineno, dimensions)
+
+    def _skip_annotation(self, annotation: Optional[ast.AST]) -> None:
+        # Annotation subscripts nest rarely more than a few levels
+        stack = [annotation]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.Subscript):
+                self.annotations.add(id(node))
+                stack.append(node.slice)
+            elif isinstance(node, ast.Tuple):
+                stack.extend(node.elts)
+            elif isinstance(node, ast.BinOp):
+                stack.extend((node.left, node.right))
+
+    def assign(self, node: ast.Assign, scopes: List[str]) -> None:
+        scope = '.'.join(scopes)
+        for target in node.targets:
+            self._assign(target, node.value, None, node.lineno, scope)
+
+    def ann_assign(self, node: ast.AnnAssign, scopes: List[str]) -> None:
+        self._skip_annotation(node.annotation)
+        self._assign(node.target, node.value, node.annotation, node.lineno, '.'.join(scopes))
+
+    def _assign(self, target: ast.AST, value: Optional[ast.AST], annotation: Optional[ast.AST],
+                line: int, scope: str) -> None:
+        if isinstance(value, ast.Attribute) and _py_same(target, value.value):
+            self.traversed.add(value.attr)
+        if isinstance(target, ast.Subscript):
+            return
+        key = self._target(target, scope)
+        if key is None:
+            # obj.attribute = ClassName(...) on some other object
+            if isinstance(target, ast.Attribute) and isinstance(value, ast.Call):
+                name = _py_name(value.func)
+                if name is not None:
+                    self.assigned.add((target.attr, name))
+            return
+
+        node = self.classes.get(key[0])
+        if node is not None:
+            # A field, assigned in a method or in the class body
+            self._field(node, key, value, annotation, scope)
+            if key[1] in node.links:
+                return
+        if annotation is not None:
+            kind, dimensions = _py_annotation_kind(annotation)
+            if kind is not None:
+                entry = self.declare(key[0], key[1], kind, line, dimensions)
+                if value is not None:
+                    self._shape(entry, value)
+                return
+        if value is not None:
+            self._construct(key, value, line)
+
+    def _field(self, node: _NodeClass, key: Tuple[str, str], value: Optional[ast.AST],
+               annotation: Optional[ast.AST], scope: str) -> None:
+        field = key[1]
+        many = None
+        if annotation is not None:
+            many = _py_mentions(annotation, node.name)
+        if many is None and isinstance(value, ast.Call) and _py_name(value.func) == node.name:
+            many = False
+        if many is None and isinstance(value, ast.Name):
+            # self.next = node, with node annotated as the class
+            annotation = self.parameters.get(scope, {}).get(value.id)
+            if annotation is not None:
+                many = _py_mentions(annotation, node.name)
+        if many is None and isinstance(value, (ast.List, ast.ListComp)) and field.lower() in _CHILD_NAMES:
+            many = True
+        if many is not None:
+            self.link(key[0], field, many)
+        else:
+            node.fields.setdefault(field, None)
+
+    def _construct(self, key: Tuple[str, str], value: ast.AST, line: int) -> None:
+        kind, dimensions = None, 1
+        if isinstance(value, (ast.List, ast.ListComp)):
+            kind = 'list'
+            element = value.elts[0] if isinstance(value, ast.List) and value.elts else getattr(value, 'elt', None)
+            if isinstance(element, (ast.List, ast.ListComp)) or (
+                    isinstance(element, ast.BinOp) and isinstance(element.left, ast.List)):
+                dimensions = 2
+        elif isinstance(value, ast.Tuple):
+            kind = 'tuple'
+        elif isinstance(value, (ast.Dict, ast.DictComp)):
+            kind = 'dict'
+        elif isinstance(value, (ast.Set, ast.SetComp)):
+            kind = 'set'
+        elif isinstance(value, ast.BinOp) and isinstance(value.op, ast.Mult):
+            # [0] * n and [[0] * m for ...]
+            if isinstance(value.left, ast.List):
+                kind = 'list'
+                if value.left.elts and isinstance(value.left.elts[0], (ast.List, ast.ListComp)):
+                    dimensions = 2
+        elif isinstance(value, ast.Call):
+            func = value.func
+            name = _py_name(func)
+            module = func.value.id if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) else None
+            if module in _NUMPY_MODULES:
+                if name in _NUMPY_SHAPED or name in ('array', 'asarray', 'arange'):
+                    kind = 'array'
+                    if name in _NUMPY_SHAPED and value.args and isinstance(value.args[0], (ast.Tuple, ast.List)):
+                        dimensions = max(1, len(value.args[0].elts))
+                    elif name in ('array', 'asarray') and value.args:
+                        element = value.args[0]
+                        if isinstance(element, ast.List) and element.elts and isinstance(element.elts[0], ast.List):
+                            dimensions = 2
+            elif name in _PY_KINDS and name not in ('Sequence', 'Mapping', 'MutableMapping', 'MutableSequence'):
+                kind = _PY_KINDS[name]
+                if name == 'defaultdict' and value.args and _py_name(value.args[0]) in ('list', 'set'):
+                    dimensions = 2
+        if kind is None:
+            return
+        entry = self.declare(key[0], key[1], kind, line, dimensions)
+        self._shape(entry, value)
+
+    def _shape(self, entry: _Container, value: ast.AST) -> None:
+        # Lengths and literal contents of displays
+        if isinstance(value, ast.Call) and value.args and _py_name(value.func) in ('array', 'asarray', 'deque'):
+            value = value.args[0]
+        if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Mult) and isinstance(value.left, ast.List) \
+                and isinstance(value.right, ast.Constant) and isinstance(value.right.value, int):
+            entry.length = len(value.left.elts) * value.right.value
+            return
+        if isinstance(value, (ast.List, ast.Tuple, ast.Set)) and value.elts:
+            entry.length = len(value.elts)
+            entry.values = self._values(value.elts)
+        elif isinstance(value, ast.Dict) and value.keys:
+            entry.length = len(value.keys)
+            keys = value.keys[:MAX_CELLS]
+            entry.keys = [_literal(k.value) if isinstance(k, ast.Constant) else '...' for k in keys]
+            if value.values and all(isinstance(v, (ast.List, ast.Set, ast.Tuple)) for v in value.values):
+                entry.edges = [
+                    [source, _literal(target.value)]
+                    for source, v in zip(entry.keys, value.values)
+                    for target in v.elts if isinstance(target, ast.Constant)
+                ][:MAX_CELLS]
+
+    def _values(self, elements: List[ast.AST]) -> List[Any]:
+        values = []
+        for element in elements[:MAX_CELLS]:
+            if isinstance(element, ast.Constant):
+                values.append(_literal(element.value))
+            elif isinstance(element, (ast.List, ast.Tuple)):
+                values.append([_literal(e.value) if isinstance(e, ast.Constant) else '...'
+                               for e in element.elts[:MAX_CELLS]])
+            else:
+                values.append('...')
+        return values
+
+    def subscript(self, node: ast.Subscript, scopes: List[str]) -> None:
+        if id(node) in self.annotations:
+            return
+        base, dimensions = node.value, 1
+        while isinstance(base, ast.Subscript) and dimensions < MAX_DIMENSIONS:
+            base, dimensions = base.value, dimensions + 1
+        key = self._target(base, '.'.join(scopes))
+        if key is None:
+            return
+        index = node.slice
+        if isinstance(index, ast.Slice):
+            op = 'slice'
+        elif isinstance(index, ast.Constant) and isinstance(index.value, str):
+            op = 'key'
+        else:
+            op = 'index_store' if isinstance(node.ctx, ast.Store) else 'index'
+        self.use(key[0], key[1], op, node.lineno, dimensions)
+
+    def call(self, node: ast.Call, scopes: List[str]) -> None:
+        func = node.func
+        if _py_name(func) in _HEAP_FUNCTIONS:
+            if node.args:
+                key = self._target(node.args[0], '.'.join(scopes))
+                if key is not None:
+                    self.use(key[0], key[1], 'heap', node.lineno)
+            return
+        if not isinstance(func, ast.Attribute):
+            return
+        op = _PY_METHODS.get(func.attr)
+        if op is None:
+            return
+        scope = '.'.join(scopes)
+        target = func.value
+        if isinstance(target, ast.Subscript) and op == 'push':
+            # graph[u].append(v)
+            key = self._target(target.value, scope)
+            if key is not None:
+                self.use(key[0], key[1], 'adjacency', node.lineno, 2)
+            return
+        key = self._target(target, scope)
+        if key is None:
+            return
+        if op == 'pop' and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == 0:
+            op = 'pop_front'
+        self.use(key[0], key[1], op, node.lineno)
+        # self.children.append(Node(...)) links the class to its own instances
+        node_class = self.classes.get(key[0])
+        if op == 'push' and node_class is not None and node.args and isinstance(node.args[0], ast.Call) \
+                and _py_name(node.args[0].func) == node_class.name:
+            self.link(key[0], key[1], True)
+
+    def for_loop(self, node: ast.For, scopes: List[str]) -> None:
+        scope = '.'.join(scopes)
+        iterated = node.iter
+        op = 'iterate'
+        # for i in range(len(items))
+        if isinstance(iterated, ast.Call) and _py_name(iterated.func) == 'range' and iterated.args:
+            bound = iterated.args[-1] if len(iterated.args) < 3 else iterated.args[1]
+            if isinstance(bound, ast.Call) and _py_name(bound.func) == 'len' and bound.args:
+                iterated, op = bound.args[0], 'index_loop'
+            else:
+                return
+        key = self._target(iterated, scope)
+        if key is not None:
+            self.use(key[0], key[1], op, node.lineno)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        # Untyped links: fields walked as in node = node.next, or assigned a
+        # new instance of their own class
+        for scope, node in self.classes.items():
+            for field in node.fields:
+                if field in self.traversed or (field, node.name) in self.assigned:
+                    entry = self.containers.get((scope, field))
+                    many = entry is not None and entry.kind in ('list', 'set', 'dict')
+                    node.links.setdefault(field, many)
+            for field in node.links:
+                node.fields.pop(field, None)
+        return super().rows()
+
+
+# Java
+
+# Declared types by the container kind they make
+_JAVA_KINDS = {
+    'List': 'list', 'ArrayList': 'list', 'LinkedList': 'list', 'Vector': 'list', 'Collection': 'list',
+    'Map': 'dict', 'HashMap': 'dict', 'TreeMap': 'dict', 'LinkedHashMap': 'dict', 'SortedMap': 'dict',
+    'Set': 'set', 'HashSet': 'set', 'TreeSet': 'set', 'LinkedHashSet': 'set', 'SortedSet': 'set',
+    'Queue': 'queue', 'Deque': 'deque', 'ArrayDeque': 'deque', 'Stack': 'stack', 'PriorityQueue': 'heap'
+}
+_JAVA_METHODS = {
+    'add': 'push', 'addAll': 'push', 'addLast': 'push', 'offer': 'push', 'offerLast': 'push', 'push': 'push',
+    'addFirst': 'push_front', 'offerFirst': 'push_front', 'pop': 'pop', 'removeLast': 'pop',
+    'pollLast': 'pop', 'poll': 'pop_front', 'pollFirst': 'pop_front', 'removeFirst': 'pop_front',
+    'get': 'index', 'set': 'index_store', 'put': 'key', 'putIfAbsent': 'key', 'containsKey': 'key',
+    'getOrDefault': 'key', 'computeIfAbsent': 'key', 'remove': 'remove', 'sort': 'sort', 'peek': 'peek'
+}
+_JAVA_INTEGER = re.compile(r'\d+')
+
+
+def _java_literal(node: Any) -> Any:
+    value = getattr(node, 'value', None)
+    if not isinstance(value, str):
+        return '...'
+    if _JAVA_INTEGER.fullmatch(value):
+        return int(value)
+    if len(value) > 1 and value[0] == value[-1] == '"':
+        return limits.clip(value[1:-1])
+    return limits.clip(value)
+
+
+def _java_line(node: Any) -> int:
+    position = getattr(node, 'position', None)
+    return position.line if position else 0
+
+
+def _java_simple(type_node: Any) -> Any:
+    # java.util.List is a chain of sub types ending in List
+    while getattr(type_node, 'sub_type', None) is not None:
+        type_node = type_node.sub_type
+    return type_node
+
+
+def _java_arguments(type_node: Any) -> List[Any]:
+    return [argument.type for argument in getattr(_java_simple(type_node), 'arguments', None) or []
+            if getattr(argument, 'type', None) is not None]
+
+
+def _java_mentions(type_node: Any, name: str, dimensions: int = 0) -> Optional[bool]:
+    # None when the type does not mention the class, otherwise whether it
+    # holds many of them: arrays and generic arguments do
+    if type_node is None:
+        return None
+    if _java_simple(type_node).name == name:
+        return bool(dimensions or type_node.dimensions)
+    stack = _java_arguments(type_node)
+    budget = 16
+    while stack and budget:
+        budget -= 1
+        argument = stack.pop()
+        if _java_simple(argument).name == name:
+            return True
+        stack.extend(_java_arguments(argument))
+    return None
+
+
+def _java_kind(type_node: Any, dimensions: int = 0) -> Tuple[Optional[str], int]:
+    # (container kind, dimensions) of int[][], List<List<Integer>>, ...
+    dimensions += len(getattr(type_node, 'dimensions', None) or [])
+    if dimensions:
+        return 'array', dimensions
+    kind = _JAVA_KINDS.get(getattr(_java_simple(type_node), 'name', None))
+    if kind is None:
+        return None, 1
+    arguments = _java_arguments(type_node)
+    element = arguments[-1] if arguments else None
+    if element is not None and (_java_kind(element)[0] in ('list', 'set', 'array', 'deque')):
+        return kind, 2
+    return kind, 1
+
+
+class JavaInference(Inference):
+    # Handlers take (node, scope, owner): the enclosing type declarations and
+    # the qualified name of the enclosing method, if any
+    def __init__(self):
+        super().__init__()
+        self.handlers = _java_handlers(self)
+
+    def class_declaration(self, node: Any, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        qualified = '.'.join(scope + (node.name,))
+        record = self.classes[qualified] = _NodeClass(node.name, _java_line(node))
+        for field in node.fields or []:
+            for declarator in field.declarators:
+                dimensions = len(declarator.dimensions or [])
+                many = _java_mentions(field.type, node.name, dimensions)
+                if many is not None:
+                    self.link(qualified, declarator.name, many)
+                    continue
+                record.fields.setdefault(declarator.name, None)
+                self._declare(qualified, field.type, declarator, _java_line(field))
+
+    def method(self, node: Any, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        # Parameters belong to the method itself, not to the one enclosing it
+        owner = '.'.join(scope + (node.name,))
+        for parameter in node.parameters or []:
+            kind, dimensions = _java_kind(parameter.type)
+            if kind is not None:
+                self.declare(owner, parameter.name, kind, _java_line(parameter) or _java_line(node), dimensions)
+
+    def local(self, node: Any, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        for declarator in node.declarators:
+            self._declare(owner or '.'.join(scope), node.type, declarator, _java_line(node))
+
+    def _declare(self, scope: str, type_node: Any, declarator: Any, line: int) -> None:
+        kind, dimensions = _java_kind(type_node, len(declarator.dimensions or []))
+        if kind is None:
+            return
+        entry = self.declare(scope, declarator.name, kind, line, dimensions)
+        initializer = declarator.initializer
+        if initializer is not None and type(initializer).__name__ == 'ArrayCreator':
+            size = (initializer.dimensions or [None])[0]
+            if size is not None and isinstance(_java_literal(size), int):
+                entry.length = _java_literal(size)
+            initializer = initializer.initializer
+        if initializer is not None and type(initializer).__name__ == 'ArrayInitializer':
+            elements = initializer.initializers or []
+            entry.length = len(elements)
+            entry.values = [
+                [_java_literal(e) for e in (element.initializers or [])[:MAX_CELLS]]
+                if type(element).__name__ == 'ArrayInitializer' else _java_literal(element)
+                for element in elements[:MAX_CELLS]
+            ]
+
+    def member_reference(self, node: Any, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        # arr[i][j]
+        if node.selectors and not node.qualifier:
+            self._selected(owner or '.'.join(scope), node.member, node.selectors, _java_line(node))
+
+    def invocation(self, node: Any, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        # list.add(x), with no further qualification
+        if node.qualifier and '.' not in node.qualifier:
+            self._invoked(owner or '.'.join(scope), node.qualifier, node, _java_line(node))
+
+    def this(self, node: Any, scope: Tuple[str, ...], owner: Optional[str]) -> None:
+        # this.items[i] and this.items.add(x) name the field directly
+        selectors = node.selectors or []
+        if len(selectors) > 1 and type(selectors[0]).__name__ == 'MemberReference':
+            self._selected('.'.join(scope), selectors[0].member, selectors[1:], _java_line(node))
+
+    def _selected(self, scope: str, name: str, selectors: List[Any], line: int) -> None:
+        dimensions = 0
+        for selector in selectors[:MAX_DIMENSIONS]:
+            if type(selector).__name__ != 'ArraySelector':
+                break
+            dimensions += 1
+        if dimensions:
+            self.use(scope, name, 'index', line, dimensions)
+        elif type(selectors[0]).__name__ == 'MethodInvocation':
+            self._invoked(scope, name, selectors[0], line)
+
+    def _invoked(self, scope: str, name: str, node: Any, line: int) -> None:
+        op = _JAVA_METHODS.get(node.member)
+        if op is None:
+            return
+        selectors = node.selectors or []
+        # graph.get(u).add(v) and graph.computeIfAbsent(u, ...).add(v)
+        if node.member in ('get', 'computeIfAbsent') and selectors \
+                and _JAVA_METHODS.get(getattr(selectors[0], 'member', None)) == 'push':
+            self.use(scope, name, 'adjacency', line, 2)
+            return
+        self.use(scope, name, op, line)
+
+
+_JAVA_HANDLERS = None
+
+
+def _java_handlers(inference: JavaInference) -> Dict[type, Any]:
+    # javalang is only imported once Java code is analyzed
+    global _JAVA_HANDLERS
+    if _JAVA_HANDLERS is None:
+        import javalang.tree as tree
+        _JAVA_HANDLERS = {
+            tree.ClassDeclaration: 'class_declaration',
+            tree.MethodDeclaration: 'method',
+            tree.ConstructorDeclaration: 'method',
+            tree.LocalVariableDeclaration: 'local',
+            tree.MemberReference: 'member_reference',
+            tree.MethodInvocation: 'invocation',
+            tree.This: 'this'
+        }
+    return {node_type: getattr(inference, name) for node_type, name in _JAVA_HANDLERS.items()}
@@ -0,0 +1,409 @@
+import json
+import os
+import reprlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# This module is also the traced child process: `python -I -S tracer.py ...`
+# reads the snippet from stdin and writes one JSON event per line to a pipe
+# whose fd is passed on the command line; its stdout and stderr go to
+# /dev/null. The snippet can still find that pipe, so the parent bounds and
+# checks every line it reads.
+# The child only uses the standard library and never imports the app. The app
+# starts it inside a bubblewrap sandbox, see sandbox_command.
+
+SNIPPET = '<snippet>'
+
+# Every line is recorded this many times, then only on its 2nd, 4th, 8th... hit
+LINE_BUDGET = 32
+# Tracing stops after this many line events, bounding the overhead on hot loops
+MAX_EVENTS = 200000
+MAX_VARIABLES = 50
+OUTPUT_LIMIT = 64 * 1024
+BATCH_STEPS = 50
+BATCH_SECONDS = 0.05
+# Longest event line, and most bytes read from one trace, before the child is killed
+MAX_EVENT_BYTES = 1024 * 1024
+MAX_TRACE_BYTES = 16 * 1024 * 1024
+
+
+class TraceTimeout(Exception):
+    pass
+
+
+class TraceError(Exception):
+    pass
+
+
+class SandboxUnavailable(TraceError):
+    pass
+
+
+# Where the tracer is mounted inside the sandbox
+_SANDBOX_TRACER = '/trace/tracer.py'
+# Directories holding the system's shared libraries, mounted when present
+_SYSTEM_DIRS = ('/usr', '/lib', '/lib64', '/lib32', '/etc/ld.so.cache')
+# The overflow uid and gid, which own nothing
+_NOBODY = '65534'
+
+
+def sandbox_command(bwrap: str = 'bwrap') -> List[str]:
+    # The bubblewrap command line that runs the child with nothing of the host
+    # but a read-only interpreter: new user, pid, network, ipc, uts and cgroup
+    # namespaces, so no network but loopback and no view of other processes;
+    # the nobody uid without capabilities; an empty read-only root with only
+    # the Python installation, the system libraries and this file mounted
+    # read-only. The child dies with the app.
+    path = shutil.which(bwrap)
+    if path is None:
+        raise SandboxUnavailable(f'Tracing requires bubblewrap, and {bwrap!r} was not found')
+    command = [path, '--unshare-all', '--die-with-parent', '--new-session', '--clearenv',
+               '--uid', _NOBODY, '--gid', _NOBODY, '--cap-drop', 'ALL', '--hostname', 'trace']
+    mounted = set()
+    for directory in _SYSTEM_DIRS + (sys.base_prefix, sys.prefix,
+                                     os.path.dirname(os.path.realpath(sys.executable))):
+        if os.path.exists(directory) and directory not in mounted:
+            mounted.add(directory)
+            command += ['--ro-bind', directory, directory]
+    command += ['--ro-bind', os.path.abspath(__file__), _SANDBOX_TRACER,
+                '--dev', '/dev', '--chdir', '/', '--remount-ro', '/']
+    return command
+
+
+def _repr():
+    short = reprlib.Repr()
+    short.maxstring = 60
+    short.maxother = 60
+    short.maxlist = short.maxtuple = short.maxset = short.maxdict = 10
+    short.maxlevel = 3
+    return short.repr
+
+
+# Values whose repr cannot change while the binding stays the same object
+_IMMUTABLE = (int, float, complex, str, bytes, bool, type(None), frozenset)
+
+# Definitions are not shown as variables
+_HIDDEN = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, type)
+
+
+class _Recorder:
+    def __init__(self, emit, max_steps: int):
+        self.emit = emit
+        self.max_steps = max_steps
+        self.repr = _repr()
+        # Steps and output waiting to be sent, in the order they happened
+        self.pending: List[Dict[str, Any]] = []
+        self.batched = 0
+        self.recorded = 0
+        self.events = 0
+        self.depth = 0
+        self.truncated = False
+        self.hits: Dict[tuple, int] = {}
+        # Last recorded (object, repr) per variable, per live frame
+        self.snapshots: Dict[int, Dict[str, tuple]] = {}
+        self.flushed_at = time.monotonic()
+
+    def trace_calls(self, frame, event, arg):
+        if event != 'call' or frame.f_code.co_filename != SNIPPET or self.truncated:
+            return None
+        self.depth += 1
+        return self.trace_lines
+
+    def trace_lines(self, frame, event, arg):
+        if event == 'line':
+            self.line(frame)
+        elif event == 'return':
+            self.depth -= 1
+            self.snapshots.pop(id(frame), None)
+        return None if self.truncated else self.trace_lines
+
+    def line(self, frame) -> None:
+        self.events += 1
+        key = (frame.f_code, frame.f_lineno)
+        count = self.hits.get(key, 0) + 1
+        self.hits[key] = count
+        # Hot loops are sampled instead of recorded on every iteration
+        if count > LINE_BUDGET and count & (count - 1):
+            if self.events >= MAX_EVENTS:
+                self.stop(frame)
+            return
+
+        previous = self.snapshots.get(id(frame), {})
+        current, changes = {}, {}
+        for name, value in frame.f_locals.items():
+            if name.startswith('__') or len(current) >= MAX_VARIABLES:
+                continue
+            kind = type(value)
+            if isinstance(value, _HIDDEN):
+                continue
+            old = previous.get(name)
+            if old is not None and old[0] is value and kind in _IMMUTABLE:
+                current[name] = old
+                continue
+            text = self.repr(value)
+            current[name] = (value, text)
+            if old is None or old[1] != text:
+                changes[name] = text
+        self.snapshots[id(frame)] = current
+
+        step = {'step': self.recorded + 1, 'line': frame.f_lineno,
+                'function': frame.f_code.co_name, 'depth': self.depth, 'changes': changes}
+        removed = [name for name in previous if name not in current]
+        if removed:
+            step['removed'] = removed
+        if count > LINE_BUDGET:
+            step['hits'] = count
+        if self.pending and self.pending[-1]['event'] == 'steps':
+            self.pending[-1]['data'].append(step)
+        else:
+            self.pending.append({'event': 'steps', 'data': [step]})
+        self.batched += 1
+        self.recorded += 1
+
+        if self.recorded >= self.max_steps or self.events >= MAX_EVENTS:
+            self.stop(frame)
+        else:
+            self.flush_due()
+
+    def output(self, text: str) -> None:
+        # Printed text is batched with the steps, so it keeps its place among them
+        if self.pending and self.pending[-1]['event'] == 'output':
+            self.pending[-1]['text'] += text
+        else:
+            self.pending.append({'event': 'output', 'text': text})
+        self.batched += 1
+        self.flush_due()
+
+    def flush_due(self) -> None:
+        if self.batched >= BATCH_STEPS or time.monotonic() - self.flushed_at > BATCH_SECONDS:
+            self.flush()
+
+    def stop(self, frame) -> None:
+        # Past the caps the snippet keeps running untraced
+        self.truncated = True
+        sys.settrace(None)
+        while frame is not None:
+            frame.f_trace = None
+            frame = frame.f_back
+        self.flush()
+
+    def flush(self) -> None:
+        for event in self.pending:
+            self.emit(event)
+        self.pending = []
+        self.batched = 0
+        self.flushed_at = time.monotonic()
+
+
+class _Output:
+    # Stands in for sys.stdout in the child; keeps at most OUTPUT_LIMIT characters
+    def __init__(self, recorder: _Recorder):
+        self.recorder = recorder
+        self.remaining = OUTPUT_LIMIT
+
+    def write(self, text: str) -> int:
+        if self.remaining > 0 and text:
+            chunk = text[:self.remaining]
+            self.remaining -= len(chunk)
+            self.recorder.output(chunk)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _limit(cpu_seconds: int, memory_bytes: int) -> None:
+    if resource is None:
+        return
+    limits = [
+        (resource.RLIMIT_CPU, cpu_seconds or None),
+        (resource.RLIMIT_AS, memory_bytes or None),
+        # No files and no child processes, on top of the sandbox
+        (resource.RLIMIT_FSIZE, 0),
+        (getattr(resource, 'RLIMIT_NPROC', None), 0)
+    ]
+    for limit, value in limits:
+        if limit is not None and value is not None:
+            try:
+                resource.setrlimit(limit, (value, value))
+            except (ValueError, OSError):
+                pass
+
+
+def _child(max_steps: int, cpu_seconds: int, memory_bytes: int, channel_fd: int) -> None:
+    code = sys.stdin.read()
+    channel = os.fdopen(channel_fd, 'w')
+
+    def emit(event: Dict[str, Any]) -> None:
+        channel.write(json.dumps(event, separators=(',', ':')) + '\n')
+        channel.flush()
+
+    _limit(cpu_seconds, memory_bytes)
+    recorder = _Recorder(emit, max_steps)
+    sys.stdout = sys.stderr = _Output(recorder)
+    result = {'event': 'result', 'status': 'ok'}
+    try:
+        compiled = compile(code, SNIPPET, 'exec')
+        sys.settrace(recorder.trace_calls)
+        try:
+            exec(compiled, {'__name__': '__main__'})
+        finally:
+            sys.settrace(None)
+    except MemoryError:
+        result = {'event': 'result', 'status': 'memory', 'error': 'Trace exceeded the memory limit'}
+    except BaseException as e:
+        line = None
+        tb = e.__traceback__
+        while tb is not None:
+            if tb.tb_frame.f_code.co_filename == SNIPPET:
+                line = tb.tb_lineno
+            tb = tb.tb_next
+        result = {'event': 'result', 'status': 'error', 'error': f'{type(e).__name__}: {e}',
+                  'line': getattr(e, 'lineno', None) if isinstance(e, SyntaxError) else line}
+    recorder.flush()
+    result.update(steps=recorder.recorded, events=recorder.events, truncated=recorder.truncated)
+    emit(result)
+
+
+_STEP_TYPES = {'step': int, 'line': int, 'function': str, 'depth': int, 'changes': dict,
+               'removed': list, 'hits': int}
+_RESULT_TYPES = {'status': str, 'error': str, 'line': (int, type(None)), 'steps': int,
+                 'events': int, 'truncated': bool}
+
+
+def _typed(values: Dict[str, Any], types: Dict[str, Any], required: Sequence[str]) -> bool:
+    if not all(name in values for name in required):
+        return False
+    for name, value in values.items():
+        expected = types.get(name)
+        if expected is None or not isinstance(value, expected):
+            return False
+        # bool is an int, but never a valid line or count
+        if isinstance(value, bool) and expected is not bool:
+            return False
+    return True
+
+
+def _valid(event: Any) -> bool:
+    # Whether a line from the child is an event this module writes
+    if not isinstance(event, dict):
+        return False
+    kind = event.get('event')
+    values = {name: value for name, value in event.items() if name != 'event'}
+    if kind == 'steps':
+        data = event.get('data')
+        return (list(values) == ['data'] and isinstance(data, list) and all(
+            isinstance(step, dict)
+            and _typed(step, _STEP_TYPES, ('step', 'line', 'function', 'depth', 'changes'))
+            and all(isinstance(name, str) and isinstance(text, str)
+                    for name, text in step['changes'].items())
+            and all(isinstance(name, str) for name in step.get('removed', ()))
+            for step in data))
+    if kind == 'output':
+        return list(values) == ['text'] and isinstance(values['text'], str)
+    if kind == 'result':
+        return (_typed(values, _RESULT_TYPES, ('status', 'steps', 'events', 'truncated')) and
+                values['status'] in ('ok', 'error', 'memory'))
+    return False
+
+
+def iter_trace(code: str, max_steps: int = 1000, timeout: float = 10.0, cpu_seconds: int = 5,
+               memory_bytes: Optional[int] = 256 * 1024 * 1024, *,
+               sandbox: Optional[Sequence[str]], max_bytes: int = MAX_TRACE_BYTES) -> Iterator[bytes]:
+    # Runs the snippet in a fresh interpreter and yields its JSON events as
+    # they arrive, re-encoded after checking them. The last one is a 'result'
+    # event. sandbox is the command from sandbox_command; None runs the child
+    # with only the resource limits, for trusted code such as the benchmarks.
+    # Over max_bytes in total, or a line over MAX_EVENT_BYTES, kills the child.
+    read_fd, write_fd = os.pipe()
+    limits = [str(max_steps), str(cpu_seconds), str(memory_bytes or 0), str(write_fd)]
+    python = os.path.realpath(sys.executable)
+    if sandbox is None:
+        command = [python, '-I', '-S', os.path.abspath(__file__)] + limits
+    else:
+        command = list(sandbox) + ['--', python, '-I', '-S', _SANDBOX_TRACER] + limits
+    channel = os.fdopen(read_fd, 'rb')
+    try:
+        with tempfile.TemporaryDirectory(prefix='trace-') as workdir:
+            try:
+                process = subprocess.Popen(
+                    command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    cwd=workdir, env={}, pass_fds=(write_fd,)
+                )
+            finally:
+                # Only the child may hold the write end, so its exit ends the stream
+                os.close(write_fd)
+            yield from _read_events(process, channel, code, timeout, cpu_seconds, max_bytes)
+    finally:
+        channel.close()
+
+
+def _read_events(process: subprocess.Popen, channel, code: str, timeout: float, cpu_seconds: int,
+                 max_bytes: int) -> Iterator[bytes]:
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, expire)
+    timer.start()
+    finished = False
+    total = 0
+    try:
+        try:
+            process.stdin.write(code.encode())
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        while not finished:
+            line = channel.readline(MAX_EVENT_BYTES + 1)
+            if not line:
+                break
+            total += len(line)
+            if total > max_bytes:
+                raise TraceError(f'Trace output exceeded {max_bytes} bytes')
+            if not line.endswith(b'\n'):
+                if len(line) > MAX_EVENT_BYTES:
+                    raise TraceError(f'Trace event exceeded {MAX_EVENT_BYTES} bytes')
+                break
+            try:
+                event = json.loads(line)
+            except ValueError:
+                event = None
+            if not _valid(event):
+                raise TraceError('Trace process sent an invalid event')
+            # Nothing after the result is read
+            finished = event['event'] == 'result'
+            yield json.dumps(event, separators=(',', ':')).encode()
+        if finished:
+            process.kill()
+        process.wait()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    if not finished:
+        if timed_out.is_set():
+            raise TraceTimeout(f'Trace exceeded {timeout:g}s')
+        # Killed by SIGXCPU or SIGKILL, directly or as reported by bubblewrap
+        if process.returncode in (-24, -9, 128 + 24, 128 + 9):
+            raise TraceTimeout(f'Trace exceeded {cpu_seconds}s of CPU time')
+        raise TraceError(f'Trace process exited with status {process.returncode}')
+
+
+if __name__ == '__main__':
+    _child(*(int(arg) for arg in sys.argv[1:5]))
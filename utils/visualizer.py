@@ -1,169 +1,216 @@
-import networkx as nx
-import matplotlib.pyplot as plt
-import io
-import base64
-from typing import Dict, List, Any
-import ast
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple, Union
+from utils import cfg, limits, metrics, records, renderers, structures
+from utils.intervals import IntervalIndex
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# PNG views of one analysis are drawn on up to this many threads per process;
+# 0 draws them one after another. SVG and JSON are always built in turn, as
+# they are pure Python and would only contend for the GIL.
+RENDER_THREADS = int(os.environ.get('RENDER_THREADS', min(3, (os.cpu_count() or 1) - 1)))
+
+_render_pool: Optional[ThreadPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+
+def render_pool() -> ThreadPoolExecutor:
+    # Started on first use, so the fork server that preloads this module
+    # never has threads to lose when it forks
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(RENDER_THREADS, thread_name_prefix='render')
+    return _render_pool
+
+class ViewSpec:
+    def __init__(self, name: str, method: Callable, requires: Tuple[str, ...], cost: int):
+        self.name = name
+        self.method = method
+        self.requires = requires
+        self.cost = cost
+
+# Registered views by name; each declares the analysis fields it reads
+VIEWS: Dict[str, ViewSpec] = {}
+
+def register_view(name: str, requires: Iterable[str] = (), cost: int = 0):
+    def decorator(method: Callable) -> Callable:
+        VIEWS[name] = ViewSpec(name, method, tuple(requires), cost)
+        return method
+    return decorator
+
+def required_fields(views: Optional[Iterable[str]] = None) -> set:
+    names = VIEWS if views is None else views
+    return {field for name in names for field in VIEWS[name].requires}
 
 class CodeVisualizer:
-    def generate_visualization(self, analysis: Dict[str, Any], language: str) -> Dict[str, Any]:
-        visualizations = {}
-        
-        # Control flow graph
-        visualizations['control_flow'] = self._generate_control_flow(analysis)
-        
-        # Call graph
-        visualizations['call_graph'] = self._generate_call_graph(analysis)
-        
-        # Data structures visualization
-        visualizations['data_structures'] = self._visualize_data_structures(analysis)
-        
-        # Execution steps for algorithms
-        visualizations['execution_steps'] = self._generate_execution_steps(analysis, language)
-        
-        # Code structure tree
-        visualizations['code_structure'] = self._generate_code_structure(analysis)
-        
-        return visualizations
+    # Bump whenever parser or visualizer output changes so cached results are invalidated
+    VERSION = '1.12.2'
+    FORMATS = ('png', 'svg', 'json')
+
+    def __init__(self, output_format: str = 'png'):
+        if output_format not in self.FORMATS:
+            raise ValueError(f'Unsupported format: {output_format}')
+        self.output_format = output_format
+
+    def generate_visualization(self, analysis: Dict[str, Any], language: str,
+                               views: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        return dict(self.iter_visualization(analysis, language, views))
+
+    def iter_visualization(self, analysis: Dict[str, Any], language: str,
+                           views: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Any]]:
+        if views is None:
+            selected = list(VIEWS.values())
+        else:
+            unknown = [name for name in views if name not in VIEWS]
+            if unknown:
+                raise ValueError(f"Unknown view: {', '.join(unknown)}")
+            selected = [VIEWS[name] for name in views]
+        
+        # Cheapest views first so streaming clients get something to show early
+        selected = sorted(selected, key=lambda spec: spec.cost)
+        if self.output_format != 'png' or not RENDER_THREADS or len(selected) < 2:
+            for spec in selected:
+                yield spec.name, self._run_view(spec, analysis, language)
+            return
+
+        # Each view runs in a copy of the caller's context, so its timings are
+        # still collected for this analysis. Truncation notes are passed on in
+        # view order, whichever view finishes first.
+        pool = render_pool()
+        futures = [pool.submit(contextvars.copy_context().run, self._run_view_noted, spec, analysis,
+                               language)
+                   for spec in selected]
+        try:
+            for spec, future in zip(selected, futures):
+                data, notes = future.result()
+                for info in notes:
+                    limits.note(**info)
+                yield spec.name, data
+        finally:
+            for future in futures:
+                future.cancel()
 
-    def _generate_control_flow(self, analysis: Dict[str, Any]) -> str:
+    def _run_view(self, spec: ViewSpec, analysis: Dict[str, Any], language: str) -> Any:
+        with metrics.span('view', view=spec.name), limits.context(view=spec.name):
+            return spec.method(self, analysis, language)
+
+    def _run_view_noted(self, spec: ViewSpec, analysis: Dict[str, Any],
+                        language: str) -> Tuple[Any, List[Dict[str, Any]]]:
+        with limits.collect() as notes:
+            return self._run_view(spec, analysis, language), notes
+
+    @register_view('control_flow', requires=('cfg',), cost=3)
+    def _generate_control_flow(self, analysis: Dict[str, Any], language: str) -> Union[str, Dict[str, Any]]:
+        import networkx as nx
         G = nx.DiGraph()
         
-        # Add nodes for functions, loops, conditionals
-        for func in analysis.get('functions', []):
-            G.add_node(f"func_{func['name']}", type='function', label=func['name'])
-        
-        for loop in analysis.get('loops', []):
-            G.add_node(f"loop_{loop['line']}", type='loop', label=f"Loop L{loop['line']}")
-        
-        for conditional in analysis.get('conditionals', []):
-            G.add_node(f"cond_{conditional['line']}", type='conditional', 
-                      label=f"If L{conditional['line']}")
+        # One node per basic block, one edge per successor
+        blocks = analysis.get('cfg', [])
+        for function, block, kind, line, end_line, successors in zip(
+                *(records.column(blocks, name) for name in cfg.COLUMNS)):
+            G.add_node(f'{function}:{block}', type=kind, group=function,
+                       label=self._block_label(function, kind, line, end_line))
+            for target, edge in successors:
+                G.add_edge(f'{function}:{block}', f'{function}:{target}', label=edge)
         
-        # Create simple connections (this would be more sophisticated in production)
-        nodes = list(G.nodes())
-        for i in range(len(nodes) - 1):
-            G.add_edge(nodes[i], nodes[i + 1])
-        
-        return self._graph_to_base64(G)
+        return self.render_graph(G, 'layered')
 
-    def _generate_call_graph(self, analysis: Dict[str, Any]) -> str:
+    @register_view('call_graph', requires=('functions', 'calls'), cost=2)
+    def _generate_call_graph(self, analysis: Dict[str, Any], language: str) -> Union[str, Dict[str, Any]]:
+        import networkx as nx
         G = nx.DiGraph()
         
         # Add function nodes
         for func in analysis.get('functions', []):
             G.add_node(func['name'], type='function')
         
-        # Add method calls
-        for call in analysis.get('calls', []):
-            if 'function' in call:
-                caller = self._find_caller(call['line'], analysis)
-                if caller:
-                    G.add_edge(caller, call['function'])
+        # Add calls, attributed to the innermost function whose span contains them
+        calls = analysis.get('calls', [])
+        callers = self._caller_index(analysis)
+        for function, line in zip(records.column(calls, 'function'), records.column(calls, 'line')):
+            if function:
+                G.add_edge(callers.find(line, 'main'), function)
         
-        return self._graph_to_base64(G)
+        return self.render_graph(G, 'layered')
 
-    def _visualize_data_structures(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-        structures = []
-        
-        # Detect arrays/lists
-        variables = analysis.get('variables', [])
-        for var in variables:
-            if '[]' in str(var.get('type', '')) or 'list' in str(var.get('type', '')):
-                structures.append({
-                    'type': 'array',
-                    'name': var['name'],
-                    'visualization': self._create_array_visualization(var)
-                })
-        
-        # Detect linked lists
-        for cls in analysis.get('classes', []):
-            if any('next' in method.lower() for method in cls.get('methods', [])):
-                structures.append({
-                    'type': 'linked_list',
-                    'name': cls['name'],
-                    'visualization': self._create_linked_list_visualization()
-                })
-        
-        return structures
+    @register_view('data_structures', requires=('data_structures',), cost=0)
+    def _visualize_data_structures(self, analysis: Dict[str, Any], language: str) -> List[Dict[str, Any]]:
+        # The parsers infer the structures; each comes with a layout for the
+        # frontend to draw and a one line summary
+        return [{
+            'type': row['kind'],
+            'name': row['name'],
+            'line': row['line'],
+            'scope': row['scope'],
+            'layout': row['layout'],
+            'visualization': structures.describe(row)
+        } for row in analysis.get('data_structures', [])]
 
-    def _generate_execution_steps(self, analysis: Dict[str, Any], language: str) -> List[Dict[str, Any]]:
-        steps = []
-        
-        # For sorting algorithms
-        if any('sort' in func.get('name', '').lower() for func in analysis.get('functions', [])):
-            steps = self._simulate_sorting_steps()
-        
-        # For search algorithms
-        elif any('search' in func.get('name', '').lower() for func in analysis.get('functions', [])):
-            steps = self._simulate_search_steps()
-        
-        return steps
+    @register_view('execution_steps', cost=0)
+    def _generate_execution_steps(self, analysis: Dict[str, Any], language: str) -> Dict[str, Any]:
+        # Steps come from running the code, which static analysis never does;
+        # the name stays registered so clients asking for it get this marker
+        return {'disabled': 'Execution steps are recorded by POST /traces, '
+                            'which the server only serves when TRACE_ENABLED is set'}
 
-    def _generate_code_structure(self, analysis: Dict[str, Any]) -> str:
+    @register_view('code_structure', requires=('code_structure',), cost=4)
+    def _generate_code_structure(self, analysis: Dict[str, Any], language: str) -> Union[str, Dict[str, Any]]:
+        import networkx as nx
         G = nx.DiGraph()
         
-        if 'code_structure' in analysis:
-            for item in analysis['code_structure']:
-                node_id = f"{item['type']}_{item['line']}"
-                G.add_node(node_id, label=item['type'], line=item['line'])
-        
-        return self._graph_to_base64(G)
+        # Rebuild the tree from the depth-first depth stream
+        structure = analysis.get('code_structure', [])
+        parents = []
+        for index, (node_type, depth, line) in enumerate(zip(
+                records.column(structure, 'type'), records.column(structure, 'depth'),
+                records.column(structure, 'line'))):
+            G.add_node(index, label=node_type, line=line)
+            del parents[depth:]
+            if parents:
+                G.add_edge(parents[-1], index)
+            parents.append(index)
+        
+        return self.render_graph(G, 'tree')
 
-    def _graph_to_base64(self, G: nx.Graph) -> str:
-        plt.figure(figsize=(10, 8))
-        pos = nx.spring_layout(G)
-        
-        # Color nodes by type
-        node_colors = []
-        for node in G.nodes():
-            node_type = G.nodes[node].get('type', 'default')
-            colors = {
-                'function': 'lightblue',
-                'loop': 'lightgreen',
-                'conditional': 'lightcoral',
-                'default': 'lightgray'
-            }
-            node_colors.append(colors.get(node_type, 'lightgray'))
-        
-        nx.draw(G, pos, with_labels=True, node_color=node_colors, 
-                node_size=2000, font_size=10, font_weight='bold',
-                arrows=True)
-        
-        # Save to base64
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-        
-        return f"data:image/png;base64,{image_base64}"
+    def render_graph(self, G: 'nx.Graph', layout: str = None) -> Union[str, Dict[str, Any]]:
+        # networkx, numpy and the layout code load with the first graph view
+        from utils.layout import compute_layout
+        from utils.reduce import reduce_graph
+        nodes, edges = G.number_of_nodes(), G.number_of_edges()
+        metrics.observe('graph_nodes', nodes)
+        metrics.observe('graph_edges', edges)
+        
+        # Oversized graphs are shrunk before layout, and the response says how
+        with metrics.span('reduce'):
+            G, method = reduce_graph(G, limits.MAX_GRAPH_NODES)
+        if method is not None:
+            limits.note(limit='graph_nodes', max=limits.MAX_GRAPH_NODES, nodes=nodes, edges=edges,
+                        shown=G.number_of_nodes(), method=method)
+        with metrics.span('layout'):
+            pos = compute_layout(G, layout)
+        with metrics.span('render'):
+            if self.output_format == 'json':
+                return renderers.graph_to_json(G, pos)
+            if self.output_format == 'svg':
+                return renderers.graph_to_svg(G, pos)
+            return renderers.graph_to_png(G, pos)
 
-    def _find_caller(self, line_number: int, analysis: Dict[str, Any]) -> str:
-        for func in analysis.get('functions', []):
-            if func['line'] <= line_number:
-                # Simple heuristic: last function before the call
-                return func['name']
-        return 'main'
-
-    def _create_array_visualization(self, variable: Dict[str, Any]) -> str:
-        # Create a simple array visualization
-        return f"Array: {variable['name']} with dynamic size"
-
-    def _create_linked_list_visualization(self) -> str:
-        return "Linked list with node connections"
-
-    def _simulate_sorting_steps(self) -> List[Dict[str, Any]]:
-        return [
-            {'step': 1, 'description': 'Initialize array', 'state': [5, 2, 8, 1, 9]},
-            {'step': 2, 'description': 'Compare elements', 'state': [2, 5, 8, 1, 9]},
-            {'step': 3, 'description': 'Swap if needed', 'state': [1, 2, 5, 8, 9]},
-            {'step': 4, 'description': 'Sorted array', 'state': [1, 2, 5, 8, 9]}
-        ]
-
-    def _simulate_search_steps(self) -> List[Dict[str, Any]]:
-        return [
-            {'step': 1, 'description': 'Initialize search', 'state': 'low=0, high=4'},
-            {'step': 2, 'description': 'Calculate mid', 'state': 'mid=2'},
-            {'step': 3, 'description': 'Compare with target', 'state': 'found at index 2'}
-        ]
\ No newline at end of file
+    def _block_label(self, function: str, kind: str, line: int, end_line: int) -> str:
+        if kind == 'entry':
+            return function
+        if kind == 'exit':
+            return 'exit'
+        lines = f'L{line}' if end_line <= line else f'L{line}-{end_line}'
+        prefix = {'conditional': 'if ', 'loop': 'loop ', 'handler': 'except ', 'collapsed': '... '}
+        return prefix.get(kind, '') + lines if line else ''
+
+    def _caller_index(self, analysis: Dict[str, Any]) -> IntervalIndex:
+        functions = analysis.get('functions', [])
+        return IntervalIndex(zip(records.column(functions, 'line'),
+                                 records.column(functions, 'end_line'),
+                                 records.column(functions, 'name')))